@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from database_setup import Employee, Route, RouteCost
+from migrations import VERSIONED_TABLES
+
+# رقم شكل الملفات؛ يُزاد عند تغيير الأعمدة حتى لا تُقرأ نسخة قديمة بشكل مختلف
+SNAPSHOT_FORMAT = 1
+
+# أعمدة الموظفين والخطوط كأرقام صحيحة تشير إلى قوائم التصنيفات في meta.json
+EMPLOYEE_CATEGORIES = {'department': 'employee_department', 'station': 'employee_station'}
+ROUTE_CATEGORIES = {'contractor': 'route_contractor', 'supervisor': 'route_supervisor',
+                    'vehicle_type': 'route_vehicle_type'}
+BREAKDOWNS = ('department', 'station', 'contractor', 'supervisor', 'vehicle_type', 'route')
+
+# آخر نسخة محملة لكل مجلد، فلا يُقرأ شيء من القرص ما دام رقم إصدار البيانات لم يتغير
+_loaded = {}
+_lock = threading.Lock()
+
+
+def data_versions(db):
+    """أرقام إصدار بيانات الجداول من data_versions، أو None إذا لم يُطبق ترحيلها بعد."""
+    try:
+        versions = dict(db.execute(text("SELECT table_name, version FROM data_versions")).all())
+    except OperationalError:
+        return None
+    return {name: versions.get(name, 0) for name in VERSIONED_TABLES}
+
+
+def version_tag(versions):
+    return f"v{SNAPSHOT_FORMAT}-" + '-'.join(f"{name}{versions[name]}" for name in VERSIONED_TABLES)
+
+
+def default_directory(db):
+    """مجلد النسخة بجوار ملف قاعدة البيانات، أو None لقاعدة في الذاكرة."""
+    database = db.get_bind().url.database
+    if not database or database == ':memory:' or database.startswith('file:'):
+        return None
+    return os.path.splitext(os.path.abspath(database))[0] + '_analytics'
+
+
+def _encode(values):
+    """ترميز عمود نصي كأرقام int32 وقائمة تصنيفات؛ القيم الفارغة تأخذ آخر رقم (تصنيف None)."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    categories = uniques.tolist()
+    codes = codes.astype(np.int32)
+    if (codes < 0).any():
+        codes[codes < 0] = len(categories)
+        categories.append(None)
+    return codes, categories
+
+
+@dataclass
+class AnalyticsSnapshot:
+    """
+    نسخة عمودية مضغوطة من الموظفين وخطوط السير وتكلفتها: كل عمود نصي مرمز كأرقام صحيحة،
+    فتُحسب التجميعات بـ np.bincount دون SQL ولا كائنات Python لكل صف.
+
+    Attributes:
+        versions: أرقام إصدار البيانات التي بُنيت منها النسخة.
+        categories: {اسم التصنيف: قائمة القيم} (department، station، contractor، supervisor، vehicle_type، route).
+        columns: {اسم العمود: مصفوفة numpy}؛ employee_route رقم الخط في categories['route'] أو -1.
+    """
+    versions: dict
+    categories: dict = field(default_factory=dict)
+    columns: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, db, versions=None):
+        """بناء النسخة باستعلامين: خطوط السير مع تكلفتها، وأعمدة الموظفين."""
+        routes = pd.DataFrame(db.execute(
+            select(Route.route_code, Route.contractor_name, Route.supervisor_name, Route.vehicle_type,
+                   RouteCost.vehicle_capacity, RouteCost.cost_5_days)
+            .outerjoin(RouteCost, Route.route_code == RouteCost.route_code)
+            .order_by(Route.route_code)).all(),
+            columns=['route_code', 'contractor', 'supervisor', 'vehicle_type', 'capacity', 'cost_5_days'])
+        employees = pd.DataFrame(db.execute(
+            select(Employee.department, Employee.station, Employee.route_code)
+            .order_by(Employee.employee_id)).all(),
+            columns=['department', 'station', 'route_code'])
+
+        snapshot = cls(versions=versions, categories={'route': routes['route_code'].tolist()})
+        for name, column in EMPLOYEE_CATEGORIES.items():
+            snapshot.columns[column], snapshot.categories[name] = _encode(employees[name])
+        for name, column in ROUTE_CATEGORIES.items():
+            snapshot.columns[column], snapshot.categories[name] = _encode(routes[name])
+        # الموظف بخط غير موجود في جدول الخطوط يُعامل كبدون خط، كما في التقرير اليومي
+        snapshot.columns['employee_route'] = pd.Index(routes['route_code']).get_indexer(
+            employees['route_code']).astype(np.int32)
+        snapshot.columns['route_capacity'] = pd.to_numeric(routes['capacity']).to_numpy(dtype=np.float64)
+        snapshot.columns['route_cost_5_days'] = pd.to_numeric(routes['cost_5_days']).to_numpy(dtype=np.float64)
+        return snapshot
+
+    def save(self, directory):
+        """
+        حفظ الأعمدة كملفات .npy والتصنيفات في meta.json داخل مجلد باسم رقم الإصدار،
+        بالكتابة في مجلد مؤقت ثم إعادة تسميته حتى لا يقرأ أحد نسخة ناقصة.
+        """
+        tag = version_tag(self.versions)
+        target = os.path.join(directory, tag)
+        temporary = f"{target}.tmp-{os.getpid()}"
+        os.makedirs(temporary, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), values)
+        with open(os.path.join(temporary, 'meta.json'), 'w', encoding='utf-8') as meta:
+            json.dump({'versions': self.versions, 'categories': self.categories}, meta, ensure_ascii=False)
+        try:
+            os.replace(temporary, target)
+        except OSError:
+            # عملية أخرى حفظت نفس الإصدار أولاً
+            shutil.rmtree(temporary, ignore_errors=True)
+        # حذف الإصدارات القديمة (قد يفشل على Windows إذا كانت ما زالت مفتوحة، فتُحذف في مرة لاحقة)
+        for entry in os.listdir(directory):
+            if entry != tag and not entry.startswith(f"{tag}.tmp-"):
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+        return target
+
+    @classmethod
+    def open(cls, directory, versions):
+        """فتح نسخة محفوظة كملفات مربوطة بالذاكرة (mmap)، أو None إذا لم تُحفظ نسخة بهذا الإصدار."""
+        path = os.path.join(directory, version_tag(versions))
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as meta:
+                meta = json.load(meta)
+        except (OSError, ValueError):
+            return None
+        columns = {os.path.splitext(entry)[0]: np.load(os.path.join(path, entry), mmap_mode='r')
+                   for entry in os.listdir(path) if entry.endswith('.npy')}
+        return cls(versions=meta['versions'], categories=meta['categories'], columns=columns)
+
+    @property
+    def employee_count(self):
+        return len(self.columns['employee_route'])
+
+    @cached_property
+    def route_passengers(self):
+        routes = self.columns['employee_route']
+        return np.bincount(routes[routes >= 0], minlength=len(self.categories['route']))
+
+    @cached_property
+    def route_vehicles(self):
+        """سيارات كل خط لكل الموظفين المسجلين عليه: ceil(الركاب / السعة)، وسيارة واحدة إذا لم تُعرف السعة."""
+        passengers = self.route_passengers
+        capacity = np.nan_to_num(self.columns['route_capacity'])
+        vehicles = np.ceil(passengers / np.where(capacity > 0, capacity, 1))
+        return np.where(capacity > 0, vehicles, passengers > 0).astype(np.int64)
+
+    @cached_property
+    def route_cost(self):
+        """تكلفة يوم كل خط بسعر الأسبوع الكامل (cost_5_days × عدد السيارات)."""
+        return np.nan_to_num(self.columns['route_cost_5_days']) * self.route_vehicles
+
+    @cached_property
+    def employee_cost_share(self):
+        """نصيب كل موظف من تكلفة خطه بالتساوي بين ركاب الخط (صفر لمن ليس له خط)."""
+        routes = self.columns['employee_route']
+        has_route = routes >= 0
+        share = np.zeros(len(routes))
+        share[has_route] = (self.route_cost / np.maximum(self.route_passengers, 1))[routes[has_route]]
+        return share
+
+    def breakdown(self, by='department'):
+        """
+        تجميع الموظفين والخطوط والتكلفة اليومية حسب القسم أو المحطة أو المتعاقد أو المشرف
+        أو نوع المركبة أو خط السير.
+
+        Returns:
+            pd.DataFrame: فهرسه قيم التصنيف، وأعمدته employees وroutes وvehicles وcost،
+            مرتب تنازلياً بالتكلفة. القسم والمحطة يشملان الموظفين بدون خط بتكلفة صفر؛
+            vehicles للقسم والمحطة عدد سيارات الخطوط التي يستخدمها موظفوه (قد تُحسب السيارة لأكثر من قسم).
+        """
+        if by not in BREAKDOWNS:
+            raise ValueError(f"unknown breakdown {by!r}, expected one of {', '.join(BREAKDOWNS)}")
+        labels = self.categories[by]
+        size = len(labels)
+        if by in EMPLOYEE_CATEGORIES:
+            codes = self.columns[EMPLOYEE_CATEGORIES[by]]
+            routes = self.columns['employee_route']
+            has_route = routes >= 0
+            employees = np.bincount(codes, minlength=size)
+            cost = np.bincount(codes, weights=self.employee_cost_share, minlength=size)
+            # الخطوط المختلفة لكل تصنيف: أزواج (تصنيف، خط) بلا تكرار
+            route_total = max(len(self.categories['route']), 1)
+            pairs = np.unique(codes[has_route].astype(np.int64) * route_total + routes[has_route])
+            pair_codes = pairs // route_total
+            route_count = np.bincount(pair_codes, minlength=size)
+            vehicles = np.bincount(pair_codes, weights=self.route_vehicles[pairs % route_total], minlength=size)
+        else:
+            codes = (np.arange(size, dtype=np.int32) if by == 'route'
+                     else np.asarray(self.columns[ROUTE_CATEGORIES[by]]))
+            used = self.route_passengers > 0
+            employees = np.bincount(codes, weights=self.route_passengers, minlength=size)
+            route_count = np.bincount(codes, weights=used, minlength=size)
+            vehicles = np.bincount(codes, weights=self.route_vehicles, minlength=size)
+            cost = np.bincount(codes, weights=self.route_cost, minlength=size)
+        result = pd.DataFrame({'employees': employees.astype(np.int64), 'routes': route_count.astype(np.int64),
+                               'vehicles': vehicles.astype(np.int64), 'cost': cost},
+                              index=pd.Index(labels, dtype=object, name=by))
+        return result[result['employees'] > 0].sort_values('cost', ascending=False, kind='stable')
+
+
+def load_snapshot(db, directory=None):
+    """
+    النسخة الحالية من الذاكرة أو من القرص، وإعادة بنائها فقط إذا تغير رقم إصدار
+    بيانات الموظفين أو الخطوط أو التكلفة منذ آخر بناء.
+
+    Args:
+        directory: مجلد الحفظ (الافتراضي بجوار ملف قاعدة البيانات).
+    """
+    versions = data_versions(db)
+    if versions is None:
+        # قاعدة بلا جدول data_versions: لا يمكن معرفة التغيير فتُبنى النسخة في كل مرة دون حفظ
+        return AnalyticsSnapshot.build(db)
+    directory = directory or default_directory(db)
+    key = directory or id(db.get_bind())
+    snapshot = _loaded.get(key)
+    if snapshot is not None and snapshot.versions == versions:
+        return snapshot
+    with _lock:  # خيوط خدمة التقارير تنتظر بناءً واحداً بدلاً من تكراره
+        snapshot = _loaded.get(key)
+        if snapshot is not None and snapshot.versions == versions:
+            return snapshot
+        snapshot = AnalyticsSnapshot.open(directory, versions) if directory else None
+        if snapshot is None:
+            snapshot = AnalyticsSnapshot.build(db, versions)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                snapshot.save(directory)
+        _loaded[key] = snapshot
+    return snapshot
+
+
+def cost_breakdown(db, by='department', directory=None):
+    """تجميع التكلفة اليومية لكل الموظفين المسجلين حسب by من النسخة العمودية (انظر AnalyticsSnapshot.breakdown)."""
+    return load_snapshot(db, directory).breakdown(by)
+
+
+def main(argv=None):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database_setup import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Build the columnar analytics snapshot and time the cost breakdowns.")
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    parser.add_argument('--by', nargs='+', choices=BREAKDOWNS, default=['department', 'contractor'])
+    parser.add_argument('--repeat', type=int, default=20, help="timed repetitions of each breakdown")
+    parser.add_argument('--top', type=int, default=10, help="rows to print for each breakdown")
+    args = parser.parse_args(argv)
+
+    db = sessionmaker(bind=create_engine(args.database_url))()
+    started = time.perf_counter()
+    snapshot = load_snapshot(db)
+    print(f"Snapshot: {snapshot.employee_count} employees, {len(snapshot.categories['route'])} routes "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    for by in args.by:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            result = cost_breakdown(db, by)
+        elapsed = (time.perf_counter() - started) / max(args.repeat, 1)
+        print(f"\nCost by {by} ({elapsed * 1000:.2f} ms per query):")
+        print(result.head(args.top).to_string())
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
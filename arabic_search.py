@@ -0,0 +1,49 @@
+import re
+
+# توحيد الحروف المتشابهة في الكتابة العربية حتى يطابق البحث كل أشكال الاسم
+_ARABIC_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # أشكال الألف والهمزة
+    'ؤ': 'و', 'ئ': 'ي',
+    'ة': 'ه',  # التاء المربوطة
+    'ى': 'ي',  # الألف المقصورة
+})
+
+# التشكيل (الفتحة والضمة والكسرة والتنوين والشدة والسكون والألف الخنجرية) والتطويل
+_TASHKEEL = re.compile('[\u064B-\u0652\u0670\u0640]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_arabic(text):
+    """تطبيع نص عربي للبحث: حذف التشكيل، توحيد الألف والهمزة والتاء المربوطة والألف المقصورة والمسافات."""
+    text = _TASHKEEL.sub('', text or '')
+    text = text.translate(_ARABIC_VARIANTS).lower()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class EmployeeSearchIndex:
+    """
+    فهرس بحث مبني مرة واحدة على أسماء الموظفين بعد تطبيعها.
+
+    البحث تزايدي: إذا كان النص الجديد امتداداً للنص السابق يُبحث فقط داخل
+    نتائج البحث السابق بدلاً من القائمة كاملة.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.normalized = [normalize_arabic(name) for name in self.names]
+        self._last_query = ''
+        self._last_rows = range(len(self.names))
+
+    def search(self, text):
+        """Returns: أرقام صفوف الأسماء المطابقة بترتيبها الأصلي."""
+        query = normalize_arabic(text)
+        if not query:
+            rows = range(len(self.names))
+        elif self._last_query and query.startswith(self._last_query):
+            normalized = self.normalized
+            rows = [row for row in self._last_rows if query in normalized[row]]
+        else:
+            rows = [row for row, name in enumerate(self.normalized) if query in name]
+        self._last_query = query
+        self._last_rows = rows
+        return rows
@@ -0,0 +1,96 @@
+from datetime import date, datetime
+
+from sqlalchemy import delete, func, insert, select
+from database_setup import AttendanceRecord, DailyReport, DailyRouteSummary
+
+
+def as_date(value):
+    """قبول التاريخ كنص 'YYYY-MM-DD' أو كائن date."""
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def daily_route_summaries(report):
+    """
+    حساب ملخص اليوم لكل (قسم، خط سير) من تقرير النقل: عدد الركاب ونصيب القسم
+    من تكلفة الخط بنسبة عدد ركابه.
+    """
+    passengers = {}
+    for row in report.employees:
+        if row.route_code in report.routes:
+            key = (row.department, row.route_code)
+            passengers[key] = passengers.get(key, 0) + 1
+
+    summaries = []
+    for (department, route_code), count in passengers.items():
+        route = report.routes[route_code]
+        summaries.append({
+            'department': department,
+            'route_code': route_code,
+            'passengers': count,
+            'cost_share': route.cost * count / len(route.passengers),
+        })
+    return summaries
+
+
+def save_daily_attendance(db, report):
+    """
+    حفظ حضور يوم التقرير وتقريره وملخصاته داخل معاملة واحدة.
+
+    يُستبدل ما سبق حفظه لنفس اليوم فقط، فتبقى تكلفة التحديث متناسبة مع حضور
+    ذلك اليوم وليس مع تاريخ الحضور كاملاً.
+    """
+    report_date = as_date(report.date)
+    try:
+        db.execute(delete(AttendanceRecord).where(AttendanceRecord.attendance_date == report_date))
+        db.execute(delete(DailyRouteSummary).where(DailyRouteSummary.summary_date == report_date))
+        db.execute(delete(DailyReport).where(DailyReport.report_date == report_date))
+
+        records = {}
+        for row in report.employees:
+            records.setdefault(row.employee_id, {
+                'attendance_date': report_date,
+                'employee_id': row.employee_id,
+                'employee_name': row.employee_name,
+                'department': row.department,
+                'station': row.station,
+                'route_code': row.route_code,
+            })
+        if records:
+            db.execute(insert(AttendanceRecord), list(records.values()))
+
+        summaries = [dict(summary, summary_date=report_date) for summary in daily_route_summaries(report)]
+        if summaries:
+            db.execute(insert(DailyRouteSummary), summaries)
+
+        db.execute(insert(DailyReport), [{
+            'report_date': report_date,
+            'generated_at': datetime.now(),
+            'employee_count': len(records),
+            'route_count': len(report.routes),
+            'total_cost': report.total_cost,
+        }])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def department_cost_summary_query(start_date, end_date, department_filter=None):
+    query = (select(DailyRouteSummary.department,
+                    func.count(func.distinct(DailyRouteSummary.summary_date)),
+                    func.sum(DailyRouteSummary.passengers),
+                    func.sum(DailyRouteSummary.cost_share))
+             .where(DailyRouteSummary.summary_date.between(as_date(start_date), as_date(end_date))))
+    if department_filter:
+        query = query.where(DailyRouteSummary.department == department_filter)
+    return query.group_by(DailyRouteSummary.department)
+
+
+def department_cost_summary(db, start_date, end_date, department_filter=None):
+    """
+    تحليل التكلفة حسب القسم لفترة زمنية من الملخصات اليومية (وليس من سجلات الحضور).
+
+    Returns:
+        list: صفوف (القسم، عدد أيام الحضور، إجمالي الركاب، إجمالي التكلفة).
+    """
+    return db.execute(department_cost_summary_query(start_date, end_date, department_filter)).all()
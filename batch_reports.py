@@ -0,0 +1,267 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from report_export import export_reports
+
+DATABASE_PATH = 'transport_management.db'
+# أسماء الأعمدة المقبولة في ملف الحضور (إنجليزية أو عربية)
+DATE_COLUMNS = ('attendance_date', 'date', 'التاريخ')
+NAME_COLUMNS = ('employee_name', 'name', 'اسم الموظف', 'الاسم')
+
+# جلسة القراءة الخاصة بكل عملية عاملة (تُنشأ في _init_worker)
+_worker_session = None
+
+
+@dataclass
+class DaySummary:
+    """ملخص تقرير يوم واحد كما يعود من العملية العاملة."""
+    date: str
+    attendees: int
+    passengers: int
+    routes: int
+    vehicles: int
+    total_cost: float
+    missing_names: int
+    without_route: int
+    output_path: str = None
+
+
+@dataclass
+class BatchSummary:
+    """نتيجة تشغيل الدفعة: ملخص كل يوم والإجماليات."""
+    days: list = field(default_factory=list)
+    output_paths: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def total_cost(self):
+        return sum(day.total_cost for day in self.days)
+
+    @property
+    def total_passengers(self):
+        return sum(day.passengers for day in self.days)
+
+    @property
+    def total_vehicles(self):
+        return sum(day.vehicles for day in self.days)
+
+    @property
+    def missing_names(self):
+        return sum(day.missing_names for day in self.days)
+
+
+def _date_text(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(str(value).strip()[:10]).isoformat()
+
+
+def _column_index(header, candidates, path):
+    normalized = [str(value).strip().lower() if value is not None else '' for value in header]
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized.index(candidate)
+    raise ValueError(f"{path}: missing column, expected one of {', '.join(candidates)}")
+
+
+def _read_rows(path):
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as source:
+            yield from csv.reader(source)
+        return
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_attendance(path, start_date=None, end_date=None):
+    """
+    قراءة ملف حضور (xlsx أو csv) فيه عمود للتاريخ وعمود لاسم الموظف، بصف لكل حضور.
+
+    Returns:
+        dict: {التاريخ 'YYYY-MM-DD': قائمة الأسماء بترتيبها في الملف} مرتب بالتاريخ.
+    """
+    rows = _read_rows(path)
+    header = next(rows, None)
+    if header is None:
+        return {}
+    date_index = _column_index(header, DATE_COLUMNS, path)
+    name_index = _column_index(header, NAME_COLUMNS, path)
+
+    days = {}
+    for line, row in enumerate(rows, 2):
+        if len(row) <= max(date_index, name_index) or row[date_index] in (None, ''):
+            continue
+        name = row[name_index]
+        if name is None or not str(name).strip():
+            continue
+        try:
+            day = _date_text(row[date_index])
+        except ValueError:
+            raise ValueError(f"{path}, row {line}: invalid date {row[date_index]!r}")
+        if (start_date and day < start_date) or (end_date and day > end_date):
+            continue
+        days.setdefault(day, []).append(str(name).strip())
+    return dict(sorted(days.items()))
+
+
+def read_only_url(database_path):
+    """رابط SQLite للقراءة فقط، فلا تستطيع العمليات العاملة تعديل قاعدة البيانات أو قفلها للكتابة."""
+    return f"sqlite:///file:{os.path.abspath(database_path)}?mode=ro&uri=true"
+
+
+def _init_worker(database_url):
+    global _worker_session
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    _worker_session = sessionmaker(bind=create_engine(database_url))()
+
+
+def summarize(report, output_path=None):
+    return DaySummary(date=report.date, attendees=len(report.employees), passengers=report.total_passengers,
+                      routes=len(report.routes), vehicles=report.vehicle_count, total_cost=report.total_cost,
+                      missing_names=len(report.missing_names), without_route=len(report.without_route),
+                      output_path=output_path)
+
+
+def _build_day(job):
+    """
+    بناء تقرير يوم في العملية العاملة. في وضع ملف لكل يوم تكتب العملية الملف بنفسها؛
+    ولا يُعاد التقرير كاملاً إلا إذا احتاجته العملية الرئيسية (ملف مجمع أو حفظ).
+    """
+    from report_engine import build_transport_report
+    day, names, output_path, return_report = job
+    report = build_transport_report(_worker_session, day, names)
+    _worker_session.rollback()  # إنهاء معاملة القراءة حتى لا تبقى لقطة قديمة مفتوحة
+    if output_path:
+        export_reports([report], output_path)
+    return summarize(report, output_path), report if return_report else None
+
+
+def run_batch(attendance, database_path=DATABASE_PATH, output_dir=None, combined_path=None,
+              extension='.xlsx', workers=None, save=False, progress_callback=None):
+    """
+    بناء تقرير كل يوم في attendance على مجموعة عمليات، لكل منها اتصال قراءة فقط.
+
+    Args:
+        attendance: {التاريخ: أسماء الحضور} كما تعيده read_attendance.
+        output_dir: مجلد لملف مستقل لكل يوم (report_YYYY-MM-DD.xlsx).
+        combined_path: ملف واحد لكل الأيام (يُحدد نوعه بالامتداد).
+        save: حفظ الحضور والملخصات اليومية في قاعدة البيانات (في العملية الرئيسية فقط).
+        progress_callback: progress_callback(done, total) بعد كل يوم.
+
+    Returns:
+        BatchSummary
+    """
+    started = time.perf_counter()
+    summary = BatchSummary()
+    total = len(attendance)
+    workers = max(1, min(workers or os.cpu_count() or 1, total or 1))
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return_reports = bool(combined_path or save)
+    jobs = [(day, names, os.path.join(output_dir, f"report_{day}{extension}") if output_dir else None,
+             return_reports) for day, names in attendance.items()]
+
+    from sqlalchemy import create_engine
+    from migrations import migrate
+    # العمليات العاملة للقراءة فقط، فتُطبق الترحيلات (جداول السجل بتاريخ سريان) قبل تشغيلها
+    engine = create_engine(f"sqlite:///{database_path}")
+    migrate(engine)
+
+    save_session = None
+    if save:
+        from sqlalchemy.orm import sessionmaker
+        from attendance_store import save_daily_attendance
+        save_session = sessionmaker(bind=engine)()
+
+    def collect(results):
+        # النتائج تصل بترتيب التاريخ؛ الحفظ يتم هنا لأن العمليات العاملة للقراءة فقط
+        for done, (day, report) in enumerate(results, 1):
+            summary.days.append(day)
+            if save_session is not None:
+                save_daily_attendance(save_session, report)
+            if progress_callback:
+                progress_callback(done, total)
+            yield report
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(read_only_url(database_path),)) as executor:
+            reports = collect(executor.map(_build_day, jobs, chunksize=max(1, total // (workers * 4))))
+            if combined_path:
+                export_reports(reports, combined_path)
+            else:
+                for _ in reports:
+                    pass
+    finally:
+        if save_session is not None:
+            save_session.close()
+        engine.dispose()
+
+    if combined_path:
+        summary.output_paths = [combined_path]
+    else:
+        summary.output_paths = [day.output_path for day in summary.days if day.output_path]
+    summary.seconds = time.perf_counter() - started
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'Date':<12}{'Attendees':>10}{'Routes':>8}{'Vehicles':>10}{'Cost':>14}{'Missing':>9}")
+    for day in summary.days:
+        print(f"{day.date:<12}{day.attendees:>10}{day.routes:>8}{day.vehicles:>10}"
+              f"{day.total_cost:>14.2f}{day.missing_names:>9}")
+    print(f"Days: {len(summary.days)}, Passenger trips: {summary.total_passengers}, "
+          f"Vehicles: {summary.total_vehicles}, Total Cost: {summary.total_cost:.2f}, "
+          f"Missing names: {summary.missing_names}")
+    if summary.output_paths:
+        print(f"Wrote {len(summary.output_paths)} file(s) in {summary.seconds:.2f}s")
+    else:
+        print(f"Done in {summary.seconds:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate daily transport reports for every date in an attendance file.")
+    parser.add_argument('attendance_file', help="xlsx or csv with a date column and an employee_name column")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--output-dir', help="write one file per day into this directory")
+    output.add_argument('--combined', help="write all days into one file (.xlsx, .csv or .parquet)")
+    parser.add_argument('--format', choices=('xlsx', 'csv', 'parquet'), default='xlsx',
+                        help="file type for --output-dir")
+    parser.add_argument('--start', help="first date to include (YYYY-MM-DD)")
+    parser.add_argument('--end', help="last date to include (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--save', action='store_true',
+                        help="also store each day's attendance and summaries in the database")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        parser.error(f"database not found: {args.database}")
+    started = time.perf_counter()
+    attendance = read_attendance(args.attendance_file, args.start, args.end)
+    if not attendance:
+        print("No attendance rows found.")
+        return 1
+    rows = sum(len(names) for names in attendance.values())
+    print(f"Read {rows} attendance rows for {len(attendance)} day(s) in {time.perf_counter() - started:.2f}s")
+    summary = run_batch(attendance, args.database, output_dir=args.output_dir, combined_path=args.combined,
+                        extension=f".{args.format}", workers=args.workers, save=args.save)
+    print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# قياس زمن المسارات الأساسية على بيانات عشوائية ثابتة (نفس البذرة تعطي نفس البيانات)،
+# وحفظ النتائج في ملف JSON ومقارنتها بنتائج أساس محفوظة لاكتشاف أي تراجع في الأداء.
+
+FIRST_NAMES = ('محمد', 'أحمد', 'محمود', 'مصطفى', 'علي', 'حسن', 'إبراهيم', 'يوسف', 'عمر', 'خالد',
+               'مينا', 'بيتر', 'جرجس', 'ريمون', 'مايكل', 'فاطمة', 'مريم', 'سارة', 'نورا', 'هبة',
+               'ياسمين', 'إيمان', 'دينا', 'مارينا', 'كريستينا', 'سعيد', 'طارق', 'وائل', 'شريف', 'عادل')
+FAMILY_NAMES = ('عبد الله', 'عبد الرحمن', 'السيد', 'عزيز', 'إدوارد', 'فخري', 'بخيت', 'شحاتة', 'منصور',
+                'جاد', 'حنا', 'عوض', 'سليمان', 'فرج', 'رزق', 'صبحي', 'زكي', 'نصيف', 'رشدي', 'الشافعي')
+DEPARTMENTS = ('الموارد البشرية', 'الحسابات', 'المشتريات', 'المخازن', 'الإنتاج', 'الجودة', 'الصيانة',
+               'تكنولوجيا المعلومات', 'الأمن', 'المبيعات', 'الشؤون القانونية', 'النقل والحركة')
+PLACES = ('شبرا', 'إمبابة', 'المطرية', 'عين شمس', 'حلوان', 'المعادي', 'الهرم', 'فيصل', 'مدينة نصر',
+          'الزيتون', 'حدائق القبة', 'السلام', 'المرج', 'بولاق', 'الوراق', 'الخصوص', 'أبو صير', 'الدقي')
+LANDMARKS = ('موقف', 'مترو', 'كوبري', 'ميدان', 'مزلقان', 'دائري', 'شارع', 'مسجد', 'كنيسة', 'مدرسة')
+CONTRACTORS = ('نور', 'فتحي', 'هاني', 'عادل', 'سعد', 'شركة النيل', 'شركة الأمل')
+# (نوع المركبة، السعة، سعر اليوم لأسبوع 5 أيام)
+VEHICLES = (('ميكروباص', 14, 1250.0), ('ميني باص', 28, 1600.0), ('أتوبيس', 50, 2400.0))
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_TOLERANCE = 0.25
+# أقصى عدد استعلامات SQL مسموح به لبناء تقرير يومي (أول مرة، قبل امتلاء ذاكرة خطوط السير)
+REPORT_QUERY_BUDGET = 5
+
+
+def generate_roster(employee_count, seed=0):
+    """
+    إنشاء بيانات عشوائية ثابتة بنفس شكل ملف الاستيراد.
+
+    Returns:
+        dict: {'Sheet1': صفوف الموظفين، 'Sheet2': صفوف الخطوط، 'Sheet3': صفوف التكلفة} كقوائم tuples.
+    """
+    rng = random.Random(seed)
+    route_count = max(10, employee_count // 25)
+    station_pool = [f"{rng.choice(LANDMARKS)} {place} {number}"
+                    for number in range(1, max(2, route_count // len(PLACES) * 2) + 1) for place in PLACES]
+
+    routes, costs, route_stations = [], [], []
+    for index in range(route_count):
+        route_code = f"ca-{index + 1:05d}"
+        vehicle_type, capacity, rate = rng.choice(VEHICLES)
+        stations = rng.sample(station_pool, min(len(station_pool), rng.randint(4, 10)))
+        route_stations.append((route_code, stations))
+        routes.append((route_code, f"خط {stations[0]}", vehicle_type, rng.choice(CONTRACTORS),
+                       rng.choice(FIRST_NAMES), ','.join(stations)))
+        rate = round(rate * rng.uniform(0.85, 1.15))
+        costs.append((route_code, capacity, rate, round(rate * 1.14), round(rate * 1.25)))
+
+    employees = []
+    for index in range(employee_count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(FAMILY_NAMES)}"
+        if rng.random() < 0.03:
+            employees.append((name, rng.choice(DEPARTMENTS), None, None, 'لايوجد', None))
+            continue
+        route_code, stations = route_stations[rng.randrange(route_count)]
+        employees.append((name, rng.choice(DEPARTMENTS), rng.choice(stations), None, route_code, None))
+    return {'Sheet1': employees, 'Sheet2': routes, 'Sheet3': costs}
+
+
+SHEET_HEADERS = {
+    'Sheet1': ('employee_name', 'department', 'station', 'route_name', 'route_code', 'notes'),
+    'Sheet2': ('route_code', 'route_name', 'vehicle_type', 'contractor_name', 'supervisor_name',
+               'route_stations'),
+    'Sheet3': ('route_code', 'vehicle_capacity', 'cost_5_days', 'cost_4_days', 'cost_3_days'),
+}
+
+
+def write_roster_workbook(roster, path):
+    """كتابة البيانات العشوائية إلى ملف Excel بنفس أوراق ملف الاستيراد (وضع الكتابة فقط)."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name in ('Sheet1', 'Sheet2', 'Sheet3'):
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(SHEET_HEADERS[sheet_name])
+        for row in roster[sheet_name]:
+            sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def timed(function, repeat=1):
+    """Returns: (أقل زمن بالثواني من عدة تكرارات، نتيجة آخر تشغيل)."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_size(employee_count, seed, workdir, repeat=3, attendance_ratio=0.2):
+    """
+    تشغيل كل القياسات لحجم واحد داخل مجلد مؤقت فيه قاعدة بيانات جديدة.
+
+    Returns:
+        dict: {اسم القياس: الزمن بالثواني}
+    """
+    results = {}
+    roster = generate_roster(employee_count, seed)
+    workbook_path = os.path.join(workdir, 'roster.xlsx')
+    results['generate_roster_workbook'], _ = timed(lambda: write_roster_workbook(roster, workbook_path))
+
+    # وحدات المشروع تستخدم transport_management.db في المجلد الحالي (كل حجم يُشغل في عملية
+    # مستقلة داخل مجلده، انظر main)
+    import data_import
+    import database_setup
+    from database_operations import (SessionLocal, analyze_cost_by_department, analyze_roster_cost,
+                                     generate_transport_report)
+    from instrumentation import assert_query_budget, instrument_engine
+    from report_engine import build_transport_report
+
+    database_setup.create_tables()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['import_data_from_excel'], _ = timed(
+            lambda: data_import.import_data_from_excel(workbook_path, skip_invalid=True))
+
+    rng = random.Random(seed)
+    names = [row[0] for row in roster['Sheet1']]
+    attendees = rng.sample(names, max(1, int(len(names) * attendance_ratio)))
+    first_day = date(2025, 4, 1)
+    db = SessionLocal()
+    instrument_engine(db.get_bind())
+    try:
+        # يفشل القياس إذا عاد التقرير لتنفيذ استعلامات لكل موظف أو لكل خط سير
+        with assert_query_budget(REPORT_QUERY_BUDGET, 'build_transport_report'):
+            build_transport_report(db, first_day.isoformat(), attendees)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results['generate_transport_report'], _ = timed(
+                lambda: generate_transport_report(db, first_day.isoformat(), attendees), repeat)
+            # بقية أيام الشهر حتى يكون لتحليل التكلفة بيانات حقيقية
+            for offset in range(1, 20):
+                day = first_day + timedelta(days=offset)
+                generate_transport_report(db, day.isoformat(), rng.sample(names, len(attendees)))
+        results['analyze_cost_by_department'], _ = timed(
+            lambda: analyze_cost_by_department(db, '2025-04-01', '2025-04-30'), repeat)
+        # أول مرة تُبنى النسخة العمودية وتُحفظ، وبعدها تُقرأ من الذاكرة ما دامت البيانات لم تتغير
+        results['roster_snapshot_build'], _ = timed(lambda: analyze_roster_cost(db, 'department'))
+        results['roster_cost_breakdowns'], _ = timed(
+            lambda: [analyze_roster_cost(db, by) for by in ('department', 'contractor', 'supervisor', 'station')],
+            repeat)
+    finally:
+        db.close()
+
+    results.update(run_gui_paths(os.path.join(workdir, 'transport_management.db'), names, attendees, repeat))
+    return results
+
+
+def run_gui_paths(database_path, names, attendees, repeat):
+    """قياس مسارات الواجهة بدون نافذة: حساب التقرير، تحميل الجدول، والبحث في الأسماء."""
+    try:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtCore import QCoreApplication
+        import main_app2
+    except ImportError as e:
+        print(f"Skipping GUI benchmarks: {e}")
+        return {}
+    from arabic_search import EmployeeSearchIndex
+    from database_setup import Employee
+    from table_model import LazyTableModel
+
+    application = QCoreApplication.instance() or QCoreApplication([])
+    main_app2.init_app(f"sqlite:///{database_path}")
+    results = {}
+    results['gui_compute_attendance_report'], _ = timed(
+        lambda: main_app2.compute_attendance_report(lambda done, total: True, attendees, '2025-05-01'), repeat)
+
+    def load_table():
+        model = LazyTableModel(main_app2.session, Employee)
+        for _ in range(10):  # أول عشر صفحات كما عند التمرير
+            model.fetchMore()
+        return model
+    results['table_first_page'], _ = timed(lambda: LazyTableModel(main_app2.session, Employee), repeat)
+    results['table_ten_pages'], _ = timed(load_table, repeat)
+
+    results['search_index_build'], index = timed(lambda: EmployeeSearchIndex(names), repeat)
+    query = names[len(names) // 2]
+
+    def type_query():
+        index.search('')
+        for length in range(1, len(query) + 1):
+            index.search(query[:length])
+    keystrokes, _ = timed(type_query, repeat)
+    results['search_per_keystroke'] = keystrokes / (len(query) + 1)
+    main_app2.session.close()
+    del application
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    مقارنة النتائج بنتائج الأساس.
+
+    Returns:
+        list: صفوف (الحجم، القياس، الأساس، الحالي، النسبة، هل هو تراجع).
+    """
+    rows = []
+    for size, measurements in results.items():
+        for name, seconds in measurements.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous:
+                ratio = seconds / previous
+                rows.append((size, name, previous, seconds, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the import, report, analysis, table and search paths.")
+    parser.add_argument('--employees', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="roster sizes to benchmark (1000 to 1000000)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="repeat fast measurements and keep the best")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="previous results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a result counts as a regression (0.25 = 25%%)")
+    parser.add_argument('--run-size', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_size:
+        # عملية فرعية لحجم واحد: المجلد الحالي هو مجلد القياس المؤقت
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        results = run_size(args.employees[0], args.seed, os.getcwd(), args.repeat)
+        with open(args.run_size, 'w', encoding='utf-8') as file:
+            json.dump(results, file)
+        return 0
+
+    output = os.path.abspath(args.output)
+    results = {}
+    for employee_count in args.employees:
+        # كل حجم في عملية ومجلد مستقلين حتى لا تتأثر القياسات بذاكرة أو اتصالات الحجم السابق
+        with tempfile.TemporaryDirectory() as workdir:
+            print(f"Benchmarking {employee_count} employees...")
+            result_path = os.path.join(workdir, 'results.json')
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--employees', str(employee_count),
+                            '--seed', str(args.seed), '--repeat', str(args.repeat), '--run-size', result_path],
+                           cwd=workdir, check=True)
+            with open(result_path, encoding='utf-8') as file:
+                results[str(employee_count)] = json.load(file)
+        for name, seconds in results[str(employee_count)].items():
+            print(f"  {name}: {seconds * 1000:.2f} ms")
+
+    document = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(document, file, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        rows = compare(results, baseline, args.tolerance)
+        regressions = [row for row in rows if row[-1]]
+        for size, name, previous, seconds, ratio, regressed in rows:
+            flag = "REGRESSION" if regressed else "ok"
+            print(f"{size:>8} {name:<32} {previous * 1000:9.2f} ms -> {seconds * 1000:9.2f} ms "
+                  f"({ratio:5.2f}x) {flag}")
+        if regressions:
+            print(f"{len(regressions)} measurements are slower than the baseline by more than "
+                  f"{args.tolerance:.0%}.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, func, insert, select, update
+from database_setup import AttendanceRecord, Employee, Route, RouteCost, RouteStation
+from station_index import clean_station, join_stations, replace_route_stations, split_stations
+
+# عدد المفاتيح في كل شرط IN (أقل من حد المتغيرات في إصدارات SQLite القديمة)
+KEY_BATCH_SIZE = 900
+# عدد أسباب الرفض التي تُعرض للمستخدم عند فشل التحقق
+MAX_REPORTED_ERRORS = 10
+
+# الورقة التي تحمل قواعد التحقق لكل جدول في import_validation.SHEET_RULES
+MODEL_SHEETS = {Route: 'Sheet2', RouteCost: 'Sheet3', Employee: 'Sheet1'}
+
+
+class BulkValidationError(ValueError):
+    """رفض العملية كاملة قبل الكتابة؛ errors قائمة أسباب الرفض."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        shown = self.errors[:MAX_REPORTED_ERRORS]
+        more = len(self.errors) - len(shown)
+        super().__init__('\n'.join(shown) + (f"\n... and {more} more" if more > 0 else ''))
+
+
+@dataclass
+class BulkResult:
+    """نتيجة عملية جماعية: عدد الصفوف ومفاتيحها لتحديث عرض الجدول."""
+    rows: int = 0
+    keys: list = field(default_factory=list)
+
+
+def primary_key_column(model):
+    return model.__table__.primary_key.columns.values()[0]
+
+
+def _batches(keys, size=KEY_BATCH_SIZE):
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), size):
+        yield keys[start:start + size]
+
+
+def _existing_route_codes(db, codes):
+    found = set()
+    for batch in _batches(code for code in codes if code is not None):
+        found.update(db.execute(select(Route.route_code).where(Route.route_code.in_(batch))).scalars())
+    return found
+
+
+def validate_value(db, model, column, value):
+    """
+    التحقق من قيمة عمود واحد قبل تطبيقها على صفوف متعددة، بنفس قواعد الاستيراد.
+
+    Returns:
+        القيمة بعد التنظيف والتحويل (None للقيمة الفارغة).
+
+    Raises:
+        BulkValidationError
+    """
+    from import_validation import NO_ROUTE_VALUES, SHEET_RULES
+
+    rules = SHEET_RULES[MODEL_SHEETS[model]]
+    if column == primary_key_column(model).key:
+        raise BulkValidationError([f"{column} is the primary key and cannot be set on several rows"])
+    if column not in model.__table__.columns:
+        raise BulkValidationError([f"unknown column {column}"])
+
+    text = '' if value is None else str(value).strip()
+    if column == 'station':
+        text = clean_station(text) or ''
+    elif column == 'route_stations':
+        text = join_stations(split_stations(text))
+    if column == 'route_code' and text in NO_ROUTE_VALUES:
+        text = ''
+    if not text:
+        if column in rules['required']:
+            raise BulkValidationError([f"{column} is required"])
+        return None
+
+    if column in rules['numeric']:
+        try:
+            number = float(text)
+        except ValueError:
+            raise BulkValidationError([f"{column} is not a number"])
+        if number < 0:
+            raise BulkValidationError([f"{column} is negative"])
+        if column in rules['integer']:
+            if number != int(number):
+                raise BulkValidationError([f"{column} is not a whole number"])
+            return int(number)
+        return number
+
+    if column == 'route_code' and rules['route_reference'] and not _existing_route_codes(db, [text]):
+        raise BulkValidationError([f"route_code {text} not found in routes"])
+    return text
+
+
+def bulk_update(db, model, keys, column, value):
+    """
+    تعيين قيمة عمود واحد لكل الصفوف المحددة بعبارة UPDATE واحدة لكل دفعة مفاتيح، في معاملة واحدة.
+    """
+    value = validate_value(db, model, column, value)
+    key_column = primary_key_column(model)
+    result = BulkResult(keys=list(dict.fromkeys(keys)))
+    try:
+        for batch in _batches(result.keys):
+            result.rows += db.execute(update(model).where(key_column.in_(batch))
+                                      .values({column: value})).rowcount
+        if model is Route and column == 'route_stations':
+            replace_route_stations(db, {code: value for code in result.keys})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
+def _delete_blockers(db, model, keys):
+    """أسباب منع الحذف: خطوط سير ما زال موظفون أو تكاليف يشيرون إليها، وموظفون لهم سجلات حضور."""
+    errors = []
+    if model is Route:
+        for referencing, label in ((Employee, 'employees'), (RouteCost, 'route costs')):
+            for batch in _batches(keys):
+                query = (select(referencing.route_code, func.count())
+                         .where(referencing.route_code.in_(batch)).group_by(referencing.route_code))
+                errors.extend(f"route {code} is still used by {count} {label}" for code, count in db.execute(query))
+    elif model is Employee:
+        for batch in _batches(keys):
+            query = (select(AttendanceRecord.employee_id, func.count())
+                     .where(AttendanceRecord.employee_id.in_(batch)).group_by(AttendanceRecord.employee_id))
+            errors.extend(f"employee {employee_id} has {count} attendance records"
+                          for employee_id, count in db.execute(query))
+    return errors
+
+
+def bulk_delete(db, model, keys):
+    """حذف الصفوف المحددة بعبارة DELETE واحدة لكل دفعة مفاتيح، في معاملة واحدة بعد التحقق من المراجع."""
+    key_column = primary_key_column(model)
+    result = BulkResult(keys=list(dict.fromkeys(keys)))
+    errors = _delete_blockers(db, model, result.keys)
+    if errors:
+        raise BulkValidationError(errors)
+    try:
+        for batch in _batches(result.keys):
+            if model is Route:
+                db.execute(delete(RouteStation).where(RouteStation.route_code.in_(batch)))
+            result.rows += db.execute(delete(model).where(key_column.in_(batch))).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
+def parse_clipboard(text, columns):
+    """
+    تحويل نص منسوخ من جدول أو Excel (أعمدة مفصولة بـ Tab وصف في كل سطر) إلى صفوف.
+
+    إذا كان السطر الأول أسماء أعمدة من columns يُستخدم كعناوين، وإلا تُقرأ الأعمدة
+    بترتيب columns.
+
+    Returns:
+        tuple: (أسماء الأعمدة، قائمة الصفوف)
+    """
+    lines = [line for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n') if line.strip()]
+    rows = [[cell.strip() for cell in line.split('\t')] for line in lines]
+    if not rows:
+        return list(columns), []
+    header = rows[0]
+    if all(cell in columns for cell in header if cell) and any(header):
+        return header, rows[1:]
+    width = max(len(row) for row in rows)
+    if width > len(columns):
+        raise BulkValidationError([f"pasted rows have {width} columns, the table accepts {len(columns)}"])
+    return list(columns[:width]), rows
+
+
+def bulk_insert_rows(db, model, text):
+    """
+    لصق صفوف جديدة من الحافظة: التحقق من كل الصفوف بقواعد الاستيراد نفسها، ثم إدخالها
+    كلها بعبارة INSERT واحدة في معاملة واحدة. أي صف مرفوض يلغي العملية كاملة.
+    """
+    import pandas as pd
+    from data_import import SHEET_MAPPING, frame_to_records
+    from import_validation import SHEET_RULES, unique_row_keys, validate_sheet
+
+    sheet_name = MODEL_SHEETS[model]
+    columns = next(columns for sheet, mapped, columns in SHEET_MAPPING if mapped is model)
+    header, rows = parse_clipboard(text, columns)
+    if not rows:
+        raise BulkValidationError(["the clipboard has no rows to paste"])
+    frame = pd.DataFrame([row + [''] * (len(header) - len(row)) for row in rows], columns=header)
+    frame = frame.where(frame.ne(''), None).reindex(columns=columns)
+
+    # المفاتيح الموجودة في قاعدة البيانات لاكتشاف التكرار (للمفاتيح الواردة في اللصق فقط)
+    unique = SHEET_RULES[sheet_name]['unique']
+    first = getattr(model, unique[0])
+    existing = set()
+    for batch in _batches(value for value in frame[unique[0]].dropna()):
+        query = select(*(getattr(model, column) for column in unique)).where(first.in_(batch))
+        stored = pd.DataFrame(db.execute(query).all(), columns=list(unique))
+        existing.update(unique_row_keys(sheet_name, stored).tolist())
+    route_codes = None
+    if model is not Route:
+        route_codes = _existing_route_codes(db, frame['route_code'].dropna())
+
+    valid, rejected = validate_sheet(sheet_name, frame, route_codes, existing)
+    if len(rejected):
+        raise BulkValidationError(f"row {row.excel_row - 1}: {row.reason}" for row in rejected.itertuples())
+
+    records = frame_to_records(valid, columns)
+    key_column = primary_key_column(model)
+    try:
+        keys = db.execute(insert(model).returning(key_column), records).scalars().all()
+        if model is Route:
+            replace_route_stations(db, {record['route_code']: record['route_stations'] for record in records})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return BulkResult(rows=len(records), keys=keys)
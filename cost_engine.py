@@ -0,0 +1,220 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from attendance_store import as_date
+from database_setup import AttendanceRecord
+from reference_cache import reference_cache
+
+# أسعار RouteCost لكل يوم تشغيل وتختلف حسب عدد أيام تشغيل السيارة في الأسبوع:
+# 5 أيام أو أكثر -> cost_5_days، 4 أيام -> cost_4_days، 3 أيام أو أقل -> cost_3_days
+TIER_COLUMNS = ('cost_5_days', 'cost_4_days', 'cost_3_days')
+
+
+@dataclass
+class WeeklyCost:
+    """تكلفة أسبوع (أو عدة أسابيع) موزعة على خطوط السير والأقسام والمتعاقدين."""
+    routes: pd.DataFrame
+    departments: pd.Series
+    contractors: pd.Series
+
+    @property
+    def total(self):
+        return float(self.routes['cost'].sum())
+
+
+def tier_rates(days_needed, costs):
+    """
+    سعر اليوم المطبق لكل خط حسب عدد أيام الحاجة للسيارة (مصفوفة بنفس شكل days_needed).
+
+    Args:
+        days_needed: مصفوفة أعداد صحيحة، آخر بُعد فيها يطابق ترتيب صفوف costs.
+        costs: DataFrame فيه أعمدة TIER_COLUMNS، أو قاموس مصفوفات بالشكل (أسابيع، خطوط)
+            لسعر مختلف في كل أسبوع.
+    """
+    cost_5, cost_4, cost_3 = (np.asarray(costs[column], dtype=float) for column in TIER_COLUMNS)
+    return np.select([days_needed >= 5, days_needed == 4, days_needed >= 1],
+                     [cost_5, cost_4, cost_3], default=0.0)
+
+
+def route_vehicle_days(riders, costs):
+    """
+    مجموع (يوم × سيارة) لكل خط في كل أسبوع: سيارات اليوم = ceil(الركاب / السعة)،
+    وسيارة واحدة لكل يوم تشغيل إذا لم تكن السعة معروفة.
+    """
+    running = riders > 0
+    if 'vehicle_capacity' not in costs:
+        return running.sum(axis=2)
+    capacity = np.asarray(costs['vehicle_capacity'], dtype=float)[..., np.newaxis]
+    vehicles = np.where(capacity > 0, np.ceil(riders / np.where(capacity > 0, capacity, 1)), running)
+    return np.where(running, vehicles, 0).sum(axis=2).astype(int)
+
+
+def _group_by_route(employees, costs):
+    """ترتيب الموظفين حسب خط السير وإرجاع الترتيب وبداية كل مجموعة وبيانات تكلفة كل خط."""
+    routed = employees['route_code'].notna() & employees['route_code'].isin(costs.index)
+    route_codes = employees['route_code'].where(routed)
+    codes, uniques = pd.factorize(route_codes, sort=True)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0]) if len(order) else np.array([], int)
+    return order, starts, costs.loc[uniques]
+
+
+def simulate_weeks(attendance, employees, costs, week_costs=None):
+    """
+    حساب تكلفة عدة أسابيع دفعة واحدة بعمليات مصفوفات.
+
+    Args:
+        attendance: مصفوفة منطقية بالشكل (أسابيع، موظفون، أيام) أو (موظفون، أيام) لأسبوع واحد.
+        employees: DataFrame بنفس ترتيب الموظفين فيه route_code و department.
+        costs: DataFrame مفهرس بـ route_code فيه أعمدة TIER_COLUMNS و contractor_name.
+        week_costs: week_costs(route_codes) تعيد قاموس {عمود: مصفوفة (أسابيع، خطوط)} لأعمدة
+            TIER_COLUMNS و vehicle_capacity بالسعر الساري في كل أسبوع؛ بدونها يُطبق costs على كل الأسابيع.
+
+    Returns:
+        WeeklyCost: routes فيه لكل خط عدد الأيام في كل أسبوع والسعر والتكلفة الإجمالية.
+    """
+    attendance = np.asarray(attendance, dtype=bool)
+    if attendance.ndim == 2:
+        attendance = attendance[np.newaxis]
+    order, starts, route_costs = _group_by_route(employees, costs)
+    if not len(order):
+        empty = pd.Series(dtype=float)
+        return WeeklyCost(pd.DataFrame(columns=['weeks_used', 'days_needed', 'vehicle_days', 'cost', 'rate']), empty, empty)
+
+    # عدد الركاب لكل (أسبوع، خط، يوم) ثم عدد الأيام التي احتاج فيها الخط سيارة في كل أسبوع
+    riders = np.add.reduceat(attendance[:, order, :].astype(np.int32), starts, axis=1)
+    days_needed = (riders > 0).sum(axis=2)                       # (أسابيع، خطوط)
+    rates = route_costs if week_costs is None else week_costs(route_costs.index)
+    vehicle_days = route_vehicle_days(riders, rates)
+    weekly_cost = vehicle_days * tier_rates(days_needed, rates)
+
+    routes = pd.DataFrame({
+        'weeks_used': (days_needed > 0).sum(axis=0),
+        'days_needed': days_needed.sum(axis=0),
+        'vehicle_days': vehicle_days.sum(axis=0),
+        'cost': weekly_cost.sum(axis=0),
+    }, index=route_costs.index)
+    routes['rate'] = np.divide(routes['cost'], routes['vehicle_days'],
+                               out=np.zeros(len(routes)), where=routes['vehicle_days'].to_numpy() > 0)
+    if 'contractor_name' in route_costs.columns:
+        routes['contractor_name'] = route_costs['contractor_name']
+
+    # توزيع تكلفة كل خط في كل أسبوع على ركابه بنسبة أيام ركوب كل موظف
+    employee_days = attendance.sum(axis=2)                        # (أسابيع، موظفون)
+    route_of = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))  # خط كل موظف في order
+    route_days = riders.sum(axis=2)[:, route_of]                  # (أسابيع، موظفون مرتبون)
+    share = np.zeros(employee_days.shape)
+    share[:, order] = np.divide(weekly_cost[:, route_of] * employee_days[:, order], route_days,
+                                out=np.zeros(route_days.shape), where=route_days > 0)
+    departments = pd.Series(share.sum(axis=0), index=employees.index).groupby(
+        employees['department'].to_numpy()).sum()
+
+    contractors = (routes.groupby('contractor_name')['cost'].sum()
+                   if 'contractor_name' in routes.columns else pd.Series(dtype=float))
+    return WeeklyCost(routes, departments, contractors)
+
+
+def attendance_tensor(records, employees, dates_column='attendance_date'):
+    """
+    تحويل سجلات الحضور (employee_id، التاريخ) إلى مصفوفة (أسابيع، موظفون، أيام الأسبوع).
+
+    الأسبوع يبدأ يوم السبت. employees مفهرس بـ employee_id ويحدد ترتيب الموظفين.
+
+    Returns:
+        tuple: (المصفوفة، قائمة بداية كل أسبوع)
+    """
+    dates = pd.to_datetime(records[dates_column])
+    weeks = dates.dt.to_period('W-FRI')
+    week_codes, week_starts = pd.factorize(weeks, sort=True)
+    day_codes = ((dates.dt.dayofweek + 2) % 7).to_numpy()          # السبت = 0
+    employee_codes = employees.index.get_indexer(records['employee_id'])
+    known = employee_codes >= 0
+
+    tensor = np.zeros((len(week_starts), len(employees), 7), dtype=bool)
+    tensor[week_codes[known], employee_codes[known], day_codes[known]] = True
+    return tensor, [period.start_time.date() for period in week_starts]
+
+
+def load_cost_inputs(db, start_date, end_date):
+    """
+    قراءة سجلات الحضور للفترة وبيانات الموظفين كـ DataFrames، وأسعار الخطوط من الذاكرة المؤقتة.
+
+    Returns:
+        tuple: (سجلات الحضور، الموظفون مفهرسون بـ employee_id، الأسعار مفهرسة بـ route_code)
+    """
+    records = pd.DataFrame(db.execute(
+        select(AttendanceRecord.employee_id, AttendanceRecord.attendance_date,
+               AttendanceRecord.route_code, AttendanceRecord.department)
+        .where(AttendanceRecord.attendance_date.between(as_date(start_date), as_date(end_date)))).all(),
+        columns=['employee_id', 'attendance_date', 'route_code', 'department'])
+    # خط السير والقسم كما سُجلا يوم الحضور (آخر قيمة في الفترة لكل موظف)
+    employees = records.drop_duplicates('employee_id', keep='last').set_index('employee_id')[
+        ['route_code', 'department']]
+    costs = pd.DataFrame([(reference.route_code, reference.cost_5_days, reference.cost_4_days,
+                           reference.cost_3_days, reference.vehicle_capacity, reference.contractor_name)
+                          for reference in reference_cache.routes(db).values()],
+                         columns=['route_code', *TIER_COLUMNS, 'vehicle_capacity', 'contractor_name']
+                         ).set_index('route_code')
+    return records, employees, costs
+
+
+def dated_week_costs(db, week_starts):
+    """
+    دالة week_costs لـ simulate_weeks: سعر وسعة كل خط الساريان في أول يوم من كل أسبوع
+    (من فهرس سجل الأسعار في الذاكرة المؤقتة، تاريخ لكل أسبوع وليس لكل يوم).
+    """
+    def week_costs(route_codes):
+        columns = (*TIER_COLUMNS, 'vehicle_capacity')
+        values = {column: np.empty((len(week_starts), len(route_codes))) for column in columns}
+        for week, start in enumerate(week_starts):
+            routes = reference_cache.routes(db, as_of=start)
+            for column in columns:
+                values[column][week] = [getattr(routes[code], column) for code in route_codes]
+        return values
+    return week_costs
+
+
+def weekly_cost_analysis(db, start_date, end_date):
+    """
+    تكلفة الفترة من سجلات الحضور المحفوظة بتطبيق شريحة السعر المناسبة لكل خط في كل أسبوع،
+    بالسعر الساري في أول يوم من الأسبوع.
+    """
+    records, employees, costs = load_cost_inputs(db, start_date, end_date)
+    if records.empty:
+        return simulate_weeks(np.zeros((0, 0, 7), dtype=bool), employees, costs)
+    tensor, week_starts = attendance_tensor(records, employees)
+    return simulate_weeks(tensor, employees, costs, dated_week_costs(db, week_starts))
+
+
+if __name__ == "__main__":
+    import time
+
+    # محاكاة سنة كاملة ببيانات عشوائية لقياس زمن المحرك
+    rng = np.random.default_rng(0)
+    route_count, employee_count, weeks = 4000, 20000, 52
+    route_codes = [f"R{i:04d}" for i in range(route_count)]
+    costs = pd.DataFrame({
+        'cost_5_days': rng.uniform(1000, 1500, route_count),
+        'contractor_name': rng.choice(['A', 'B', 'C', 'D'], route_count),
+    }, index=route_codes)
+    costs['cost_4_days'] = costs['cost_5_days'] * 1.15
+    costs['cost_3_days'] = costs['cost_5_days'] * 1.25
+    employees = pd.DataFrame({
+        'route_code': rng.choice(route_codes, employee_count),
+        'department': rng.choice([f"D{i}" for i in range(30)], employee_count),
+    })
+    # نظام عمل مختلط: كل موظف يحضر عدداً ثابتاً من أيام الأحد-الخميس
+    attendance = rng.random((weeks, employee_count, 5)) < rng.uniform(0.3, 1.0, employee_count)[:, None]
+
+    started = time.perf_counter()
+    result = simulate_weeks(attendance, employees, costs)
+    elapsed = time.perf_counter() - started
+    # المقارنة مع حجز السيارة 5 أيام بسعر cost_5_days في كل أسبوع استُخدم فيه الخط
+    flat = (result.routes['weeks_used'] * 5 * costs.loc[result.routes.index, 'cost_5_days']).sum()
+    print(f"{weeks} weeks x {employee_count} employees x {route_count} routes: {elapsed:.3f}s")
+    print(f"Tiered cost: {result.total:,.2f}  (5-day booking every week: {flat:,.2f})")
+    print(result.contractors.round(2).to_string())
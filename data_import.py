@@ -1,7 +1,13 @@
+import argparse
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from openpyxl import load_workbook
+from sqlalchemy import Float, Integer, String, create_engine, delete, insert, select, update
 from sqlalchemy.orm import sessionmaker
-from database_setup import Base, Employee, Route, RouteCost
+from database_setup import Base, Employee, Route, RouteCost, RouteStation
+from import_validation import (default_reject_path, unique_row_keys, validate_sheet,
+                               validate_workbook, write_reject_workbook)
+from station_index import rebuild_route_stations, replace_route_stations
 
 # تحديد قاعدة البيانات
 DATABASE_URL = "sqlite:///transport_management.db"
@@ -9,49 +15,96 @@ engine = create_engine(DATABASE_URL)
 Base.metadata.bind = engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def import_data_from_excel(excel_file_path):
+# عدد الصفوف التي تُرسل إلى قاعدة البيانات في كل دفعة إدخال
+CHUNK_SIZE = 10000
+
+# ربط أوراق ملف Excel بجداول قاعدة البيانات والأعمدة المطلوبة من كل ورقة
+# (خطوط السير أولاً ثم التكلفة ثم الموظفين حتى تكون المراجع موجودة قبل استخدامها)
+SHEET_MAPPING = (
+    ('Sheet2', Route, ['route_code', 'route_name', 'vehicle_type', 'contractor_name',
+                       'supervisor_name', 'route_stations']),
+    ('Sheet3', RouteCost, ['route_code', 'vehicle_capacity', 'cost_5_days',
+                           'cost_4_days', 'cost_3_days']),
+    ('Sheet1', Employee, ['employee_name', 'department', 'station', 'route_code', 'notes']),
+)
+
+# المفتاح الطبيعي الذي يُطابق به صف Excel مع الصف المخزن عند المزامنة
+# (employee_id تسلسلي ولا يوجد في الملف، لذلك يُطابق الموظف باسمه وترتيب تكراره)
+NATURAL_KEYS = {
+    Route: 'route_code',
+    RouteCost: 'route_code',
+    Employee: 'employee_name',
+}
+
+# الأعمدة التي لا يُقبل الصف بدونها (تُستخدم لفحص رأس الورقة في الاستيراد المتدفق)
+REQUIRED_COLUMNS = {
+    Route: ('route_code',),
+    RouteCost: ('route_code',),
+    Employee: ('employee_name',),
+}
+
+
+def frame_to_records(df, columns):
+    """تحويل DataFrame إلى قائمة قواميس جاهزة للإدخال مع استبدال القيم الفارغة (NaN) بـ None."""
+    frame = df.reindex(columns=columns).astype(object)
+    return frame.where(frame.notna(), None).to_dict('records')
+
+
+def bulk_insert(db, model, records, chunk_size=CHUNK_SIZE):
+    """إدخال السجلات على دفعات باستخدام executemany بدلاً من إنشاء كائن ORM لكل صف."""
+    for start in range(0, len(records), chunk_size):
+        db.execute(insert(model), records[start:start + chunk_size])
+    return len(records)
+
+
+def read_validated_sheets(excel_file_path, skip_invalid=False, reject_file_path=None):
+    """
+    قراءة أوراق ملف الاستيراد والتحقق منها قبل أي كتابة.
+
+    تُكتب الصفوف المرفوضة مع سبب رفض كل صف إلى ملف Excel منفصل. إذا لم يكن
+    skip_invalid مفعلاً وتوجد صفوف مرفوضة يتم إيقاف الاستيراد بإرجاع None.
+
+    Returns:
+        dict: الأوراق الصالحة {اسم الورقة: DataFrame} أو None عند الإيقاف.
+    """
+    excel_file = pd.ExcelFile(excel_file_path)
+    frames = {sheet_name: excel_file.parse(sheet_name) for sheet_name, _, _ in SHEET_MAPPING}
+    valid, rejected = validate_workbook(frames)
+    if rejected:
+        reject_file_path = reject_file_path or default_reject_path(excel_file_path)
+        write_reject_workbook(rejected, reject_file_path)
+        total = sum(len(rows) for rows in rejected.values())
+        print(f"{total} invalid rows were written to {reject_file_path}")
+        if not skip_invalid:
+            print("Import aborted before writing any data; fix the rejected rows or use --skip-invalid.")
+            return None
+    return valid
+
+
+def import_data_from_excel(excel_file_path, chunk_size=CHUNK_SIZE, skip_invalid=False,
+                           reject_file_path=None):
+    """
+    استيراد أوراق Sheet1/Sheet2/Sheet3 إلى جداول Employee/Route/RouteCost.
+
+    تُقرأ الأوراق وتُتحقق كاملة أولاً (انظر read_validated_sheets)، ثم تُرسل إلى
+    قاعدة البيانات على دفعات بحجم chunk_size داخل معاملة واحدة لكل ورقة.
+
+    Returns:
+        dict: عدد الصفوف المستوردة لكل جدول.
+    """
+    imported = {}
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        excel_file = pd.ExcelFile(excel_file_path)
-
-        # استيراد بيانات الموظفين
-        df_employees = excel_file.parse('Sheet1')
-        for index, row in df_employees.iterrows():
-            employee = Employee(
-                employee_name=row['employee_name'],
-                department=row['department'],
-                station=row['station'],
-                route_code=row['route_code'],
-                notes=row['notes']
-            )
-            db.add(employee)
-
-        # استيراد بيانات خطوط السير
-        df_routes = excel_file.parse('Sheet2')
-        for index, row in df_routes.iterrows():
-            route = Route(
-                route_code=row['route_code'],
-                route_name=row['route_name'],
-                vehicle_type=row['vehicle_type'],
-                contractor_name=row['contractor_name'],
-                supervisor_name=row['supervisor_name'],
-                route_stations=row['route_stations']
-            )
-            db.add(route)
-
-        # استيراد بيانات تكلفة خطوط السير
-        df_costs = excel_file.parse('Sheet3')
-        for index, row in df_costs.iterrows():
-            cost = RouteCost(
-                route_code=row['route_code'],
-                vehicle_capacity=row['vehicle_capacity'],
-                cost_5_days=row['cost_5_days'],
-                cost_4_days=row['cost_4_days'],
-                cost_3_days=row['cost_3_days']
-            )
-            db.add(cost)
-
-        db.commit()
+        frames = read_validated_sheets(excel_file_path, skip_invalid, reject_file_path)
+        if frames is None:
+            return imported
+        for sheet_name, model, columns in SHEET_MAPPING:
+            records = frame_to_records(frames[sheet_name], columns)
+            imported[model.__tablename__] = bulk_insert(db, model, records, chunk_size)
+            if model is Route:
+                rebuild_route_stations(db)
+            db.commit()
+
         print("Data has been imported from Excel to the database successfully.")
 
     except Exception as e:
@@ -61,6 +114,272 @@ def import_data_from_excel(excel_file_path):
     finally:
         db.close()
 
+    return imported
+
+
+def _clean_value(value):
+    """تنظيف قيمة خلية مقروءة من openpyxl: حذف المسافات الزائدة وتحويل النص الفارغ إلى None."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def iter_sheet_chunks(worksheet, model, columns, chunk_size=CHUNK_SIZE):
+    """
+    قراءة ورقة عمل مفتوحة في وضع القراءة فقط صفاً بصف وإرجاعها على دفعات.
+
+    Yields:
+        tuple: (DataFrame للدفعة مرقم بترتيب الصف في الورقة، عدد الصفوف المقروءة حتى الآن)
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    positions = {_clean_value(name): index for index, name in enumerate(header)}
+    missing = [column for column in REQUIRED_COLUMNS[model] if column not in positions]
+    if missing:
+        raise ValueError(f"Sheet '{worksheet.title}' is missing required columns: {', '.join(missing)}")
+
+    def to_frame(records, first_row):
+        return pd.DataFrame(records, columns=columns,
+                            index=pd.RangeIndex(first_row, first_row + len(records)))
+
+    chunk, read = [], 0
+    for row in rows:
+        read += 1
+        chunk.append([_clean_value(row[positions[column]])
+                      if column in positions and positions[column] < len(row) else None
+                      for column in columns])
+        if read % chunk_size == 0:
+            yield to_frame(chunk, read - len(chunk)), read
+            chunk = []
+    if chunk:
+        yield to_frame(chunk, read - len(chunk)), read
+
+
+def stream_import_from_excel(excel_file_path, chunk_size=CHUNK_SIZE, progress_callback=None,
+                             session_factory=SessionLocal, reject_file_path=None):
+    """
+    استيراد ملف Excel بذاكرة ثابتة: تُقرأ الصفوف تدريجياً في وضع القراءة فقط،
+    وتُتحقق وتُكتب على دفعات بحجم chunk_size، مع معاملة واحدة لكل ورقة.
+
+    الصفوف المرفوضة لا تُكتب إلى قاعدة البيانات وتُجمع في ملف مرفوضات في النهاية.
+    progress_callback(sheet_name, rows_done, rows_total) تُستدعى بعد كل دفعة؛
+    rows_total قد يكون None إذا لم يسجل الملف أبعاد الورقة. إذا أعادت الدالة False
+    يتم إلغاء الاستيراد والتراجع عن الورقة الحالية.
+    session_factory يسمح للواجهة بتمرير مصنع الجلسات المرتبط بقاعدة بياناتها.
+
+    Returns:
+        dict: عدد الصفوف المستوردة والمرفوضة لكل جدول.
+    """
+    summary = {}
+    rejected_rows = {}
+    route_codes = set()
+    db = session_factory()
+    workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        for sheet_name, model, columns in SHEET_MAPPING:
+            worksheet = workbook[sheet_name]
+            rows_total = worksheet.max_row - 1 if worksheet.max_row else None
+            # تُحفظ بصمة مفتاح كل صف مقبول (رقم واحد لكل صف بدل أعمدة المفتاح كاملة)
+            # لاكتشاف التكرار بين الدفعات، ومنها مفتاح الموظف ذو الأعمدة الأربعة
+            seen_keys = set()
+            imported = rejected = 0
+            for frame, rows_done in iter_sheet_chunks(worksheet, model, columns, chunk_size):
+                valid, bad = validate_sheet(sheet_name, frame,
+                                            route_codes if model is not Route else None, seen_keys)
+                if model is Route:
+                    route_codes.update(valid['route_code'])
+                seen_keys.update(unique_row_keys(sheet_name, valid).tolist())
+                if len(bad):
+                    rejected_rows.setdefault(sheet_name, []).append(bad)
+                imported += bulk_insert(db, model, frame_to_records(valid, columns), chunk_size)
+                rejected += len(bad)
+                if progress_callback and progress_callback(sheet_name, rows_done, rows_total) is False:
+                    raise InterruptedError("Import cancelled by user.")
+            if model is Route:
+                rebuild_route_stations(db)
+            db.commit()
+            summary[model.__tablename__] = {'imported': imported, 'rejected': rejected}
+
+        if rejected_rows:
+            reject_file_path = reject_file_path or default_reject_path(excel_file_path)
+            write_reject_workbook({name: pd.concat(parts) for name, parts in rejected_rows.items()},
+                                  reject_file_path)
+            print(f"Rejected rows were written to {reject_file_path}")
+        print("Data has been streamed from Excel to the database successfully.")
+
+    except Exception as e:
+        db.rollback()
+        print(f"An error occurred while importing data.: {e}")
+        raise
+
+    finally:
+        workbook.close()
+        db.close()
+
+    return summary
+
+
+def _text_value(value):
+    """قيمة عمود نصي كما تُخزن: الرقم 101 (أو 101.0 من Excel) يصبح '101'، والفارغ None."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return value if isinstance(value, str) else str(value)
+
+
+def _as_stored_types(frame, model, columns):
+    """تحويل الأعمدة النصية في الجدول (ومنها المفاتيح) إلى نص حتى تُطابق القيم المخزنة."""
+    frame = frame.copy()
+    for column in columns:
+        if isinstance(model.__table__.columns[column].type, String):
+            frame[column] = frame[column].astype(object).map(_text_value)
+    return frame
+
+
+def _fingerprint(frame, model, columns):
+    """بصمة لكل صف تُحسب بنفس الطريقة للبيانات الواردة والمخزنة حتى تكون المقارنة عادلة."""
+    normalized = pd.DataFrame(index=frame.index)
+    for column in columns:
+        if isinstance(model.__table__.columns[column].type, (Integer, Float)):
+            normalized[column] = pd.to_numeric(frame[column], errors='coerce').astype('float64')
+        else:
+            values = frame[column].astype(object).map(_text_value)
+            normalized[column] = values.where(values.notna(), '').astype(str)
+    return pd.util.hash_pandas_object(normalized, index=False)
+
+
+def sync_table(db, model, columns, incoming, retire_missing=False, chunk_size=CHUNK_SIZE):
+    """
+    مزامنة جدول واحد مع بيانات واردة: إدخال الجديد وتحديث المتغير فقط،
+    وحذف الصفوف غير الموجودة في الملف إذا كان retire_missing مفعلاً.
+
+    Returns:
+        tuple: (ملخص بعدد الصفوف المضافة والمحدثة والمحذوفة وغير المتغيرة،
+                الصفوف المضافة والمحدثة كـ DataFrame، قائمة المفاتيح المحذوفة).
+    """
+    key = NATURAL_KEYS[model]
+    primary_key = model.__table__.primary_key.columns.values()[0].name
+    incoming = _as_stored_types(incoming.reindex(columns=columns), model, columns)
+    incoming = incoming[incoming[key].notna()]
+
+    stored_columns = list(dict.fromkeys([primary_key] + columns))
+    stored = pd.read_sql(select(*[model.__table__.columns[c] for c in stored_columns])
+                         .order_by(model.__table__.columns[primary_key]), db.connection())
+
+    if key == primary_key:
+        incoming = incoming.drop_duplicates(subset=key, keep='last')
+        match_on = [key]
+    else:
+        # المفتاح الطبيعي غير فريد (أسماء متكررة): يُطابق الصف رقم n بالاسم في الملف
+        # مع الصف رقم n بنفس الاسم في قاعدة البيانات حسب ترتيب الإدخال
+        incoming = incoming.assign(_occurrence=incoming.groupby(key, sort=False).cumcount())
+        stored = stored.assign(_occurrence=stored.groupby(key, sort=False).cumcount())
+        match_on = [key, '_occurrence']
+
+    incoming = incoming.assign(_fingerprint=_fingerprint(incoming, model, columns))
+    stored = stored.assign(_fingerprint=_fingerprint(stored, model, columns))
+    stored_keys = list(dict.fromkeys(match_on + [primary_key, '_fingerprint']))
+    merged = incoming.merge(stored[stored_keys], on=match_on, how='outer',
+                            suffixes=('', '_stored'), indicator=True)
+    if isinstance(model.__table__.columns[primary_key].type, Integer):
+        merged[primary_key] = merged[primary_key].astype('Int64')
+    new_rows = merged[merged['_merge'] == 'left_only']
+    both = merged[merged['_merge'] == 'both']
+    changed = both[both['_fingerprint'] != both['_fingerprint_stored']]
+    missing = merged[merged['_merge'] == 'right_only']
+
+    bulk_insert(db, model, frame_to_records(new_rows, columns), chunk_size)
+
+    update_columns = list(dict.fromkeys([primary_key] + columns))
+    updates = frame_to_records(changed, update_columns)
+    for start in range(0, len(updates), chunk_size):
+        db.execute(update(model), updates[start:start + chunk_size])
+
+    stale_keys = []
+    if retire_missing:
+        stale_keys = missing[primary_key].tolist()
+        pk_column = model.__table__.columns[primary_key]
+        for start in range(0, len(stale_keys), chunk_size):
+            db.execute(delete(model).where(pk_column.in_(stale_keys[start:start + chunk_size])))
+
+    counts = {
+        'inserted': len(new_rows),
+        'updated': len(changed),
+        'retired': len(stale_keys),
+        'unchanged': len(both) - len(changed),
+    }
+    return counts, pd.concat([new_rows, changed])[columns], stale_keys
+
+
+def sync_route_stations(db, written, retired_codes, chunk_size=CHUNK_SIZE):
+    """تحديث جدول المحطات لخطوط السير التي أُضيفت أو عُدلت أو حُذفت في المزامنة فقط."""
+    replace_route_stations(db, dict(zip(written['route_code'], written['route_stations'])))
+    for start in range(0, len(retired_codes), chunk_size):
+        db.execute(delete(RouteStation).where(
+            RouteStation.route_code.in_(retired_codes[start:start + chunk_size])))
+
+
+def sync_data_from_excel(excel_file_path, retire_missing=False, chunk_size=CHUNK_SIZE,
+                         session_factory=SessionLocal, skip_invalid=False, reject_file_path=None):
+    """
+    مزامنة تزايدية آمنة لإعادة التشغيل: تُقارن بصمة كل صف وارد بالصف المخزن
+    بنفس المفتاح الطبيعي، ولا يُكتب إلى قاعدة البيانات إلا الفرق.
+
+    Returns:
+        dict: ملخص التغييرات لكل جدول.
+    """
+    summary = {}
+    db = session_factory()
+    try:
+        frames = read_validated_sheets(excel_file_path, skip_invalid, reject_file_path)
+        if frames is None:
+            return summary
+        for sheet_name, model, columns in SHEET_MAPPING:
+            counts, written, retired_keys = sync_table(
+                db, model, columns, frames[sheet_name], retire_missing, chunk_size)
+            summary[model.__tablename__] = counts
+            if model is Route:
+                sync_route_stations(db, written, retired_keys, chunk_size)
+            db.commit()
+
+        print("Database has been synchronised with the Excel file successfully.")
+
+    except Exception as e:
+        db.rollback()
+        print(f"An error occurred while synchronising data.: {e}")
+
+    finally:
+        db.close()
+
+    return summary
+
+
 if __name__ == "__main__":
-    excel_file = '2025.xlsx'  # استبدل باسم ملف Excel الخاص بك
-    import_data_from_excel(excel_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import employees, routes and costs from an Excel workbook.")
+    parser.add_argument('excel_file', nargs='?', default='2025.xlsx')  # استبدل باسم ملف Excel الخاص بك
+    parser.add_argument('--stream', action='store_true',
+                        help="read rows lazily and write them in chunks (constant memory)")
+    parser.add_argument('--sync', action='store_true',
+                        help="insert new rows and update changed rows only (safe to re-run)")
+    parser.add_argument('--retire-missing', action='store_true',
+                        help="with --sync, delete rows that are no longer in the workbook")
+    parser.add_argument('--skip-invalid', action='store_true',
+                        help="import the valid rows even if some rows are rejected")
+    parser.add_argument('--reject-file', help="where to write rejected rows (default: <file>_rejects.xlsx)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.sync:
+        print(sync_data_from_excel(args.excel_file, args.retire_missing, args.chunk_size,
+                                   skip_invalid=args.skip_invalid, reject_file_path=args.reject_file))
+    elif args.stream:
+        def print_progress(sheet_name, rows_done, rows_total):
+            print(f"{sheet_name}: {rows_done}/{rows_total if rows_total is not None else '?'} rows")
+        print(stream_import_from_excel(args.excel_file, args.chunk_size, print_progress,
+                                       reject_file_path=args.reject_file))
+    else:
+        import_data_from_excel(args.excel_file, args.chunk_size, args.skip_invalid, args.reject_file)
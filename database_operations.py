@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine, func
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from database_setup import Base, Employee, Route, RouteCost
+from database_setup import Base, Employee
+from report_engine import build_transport_report, render_report_text
+from attendance_store import department_cost_summary, save_daily_attendance
+from cost_engine import weekly_cost_analysis
+from reference_cache import reference_cache
+from analytics_snapshot import cost_breakdown
 
 # Database URL
 DATABASE_URL = "sqlite:///transport_management.db"
@@ -18,86 +23,54 @@ def get_db():
 def get_employee_by_name(db: SessionLocal, employee_name: str):
     return db.query(Employee).filter(Employee.employee_name == employee_name).first()
 
-def generate_transport_report(db: SessionLocal, date_str: str, employee_names: list):
-    report_data = []
-    total_cost = 0
-    department_counts = {}
+def generate_transport_report(db: SessionLocal, date_str: str, employee_names: list, save: bool = True):
+    report = build_transport_report(db, date_str, employee_names)
+    print(render_report_text(report))
+    if save:
+        save_daily_attendance(db, report)  # حفظ الحضور وتحديث ملخص هذا اليوم فقط
+    return report
 
-    for name in employee_names:
-        employee = get_employee_by_name(db, name)
-        if employee:
-            report_data.append({
-                'Employee Name': employee.employee_name,
-                'Department': employee.department,
-                'Station': employee.station,
-                'Route Name': employee.route.route_name,
-                'Vehicle Type': employee.route.vehicle_type,
-                'Contractor Name': employee.route.contractor_name,
-                'Supervisor Name': employee.route.supervisor_name,
-                'Route Stations': employee.route.route_stations,
-                'Vehicle Capacity': employee.route.cost.vehicle_capacity,
-                'Cost (5 Days)': employee.route.cost.cost_5_days
-            })
-            total_cost += employee.route.cost.cost_5_days
-            department = employee.department
-            department_counts[department] = department_counts.get(department, 0) + 1
-        else:
-            print(f"Employee not found: {name}")
-
-    required_vehicles = {}
-    for item in report_data:
-        route_name = item['Route Name']
-        if route_name not in required_vehicles:
-            required_vehicles[route_name] = {
-                'Route Name': item['Route Name'],
-                'Vehicle Type': item['Vehicle Type'],
-                'Contractor Name': item['Contractor Name'],
-                'Supervisor Name': item['Supervisor Name'],
-                'Route Stations': item['Route Stations'],
-                'Passengers': [item['Employee Name']],
-                'Vehicle Capacity': item['Vehicle Capacity'],
-                'Cost': item['Cost (5 Days)']
-            }
-        else:
-            required_vehicles[route_name]['Passengers'].append(item['Employee Name'])
-
-    print(f"\nTransport Report for Date: {date_str}")
-
-    print("\nAttendance Count by Department:")
-    for department, count in department_counts.items():
-        print(f"Department: {department}, Attendance Count: {count}")
-
-    print(f"\nRequired Vehicles and Costs:")
-    for route_name, details in required_vehicles.items():
-        print(f"  Route Name: {details['Route Name']}")
-        print(f"    Vehicle Type: {details['Vehicle Type']}")
-        print(f"    Contractor Name: {details['Contractor Name']}")
-        print(f"    Supervisor Name: {details['Supervisor Name']}")
-        print(f"    Route Stations: {details['Route Stations']}")
-        print(f"    Passengers: {', '.join(details['Passengers'])}")
-        print(f"    Vehicle Capacity: {details['Vehicle Capacity']}")
-        print(f"    Cost: {details['Cost']:.2f}")
+def analyze_cost_by_department(db: SessionLocal, start_date: str, end_date: str, department_filter: str = None):
+    # القراءة من الملخصات اليومية المحفوظة، فتتناسب التكلفة مع عدد الأيام وليس عدد سجلات الحضور
+    return department_cost_summary(db, start_date, end_date, department_filter)
 
-    print(f"\nTotal Expected Cost for Required Vehicles: {total_cost:.2f}\n")
+def analyze_weekly_cost(db: SessionLocal, start_date: str, end_date: str):
+    # تكلفة الفترة بشرائح 5/4/3 أيام حسب عدد الأيام التي احتاج فيها كل خط سيارة في كل أسبوع
+    return weekly_cost_analysis(db, start_date, end_date)
 
-def analyze_cost_by_department(db: SessionLocal, start_date: str, end_date: str, department_filter: str = None):
-    query = db.query(Employee.department, func.count(Employee.employee_id), func.sum(RouteCost.cost_5_days)).\
-        join(Route, Employee.route_code == Route.route_code).\
-        join(RouteCost, Route.route_code == RouteCost.route_code)
+def analyze_roster_cost(db: SessionLocal, by: str = 'department'):
+    # التكلفة اليومية لكل الموظفين المسجلين حسب القسم أو المتعاقد أو المشرف أو المحطة،
+    # من النسخة العمودية التي لا يُعاد بناؤها إلا عند تغير بيانات الموظفين أو الخطوط
+    return cost_breakdown(db, by)
 
-    if department_filter:
-        query = query.filter(Employee.department == department_filter)
+def print_roster_cost(result, by: str = 'department'):
+    print(f"\nRoster Daily Cost by {by}:")
+    for key, row in zip(result.index, result.itertuples()):
+        print(f"{key}: Employees: {row.employees}, Routes: {row.routes}, Vehicles: {row.vehicles}, "
+              f"Total Cost: {row.cost:.2f}")
 
-    results = query.group_by(Employee.department).all()
+def print_weekly_cost(result):
+    print("\nTiered Weekly Cost by Department:")
+    for department, cost in result.departments.items():
+        print(f"Department: {department}, Total Cost: {cost:.2f}")
+    print("Tiered Weekly Cost by Contractor:")
+    for contractor, cost in result.contractors.items():
+        print(f"Contractor: {contractor}, Total Cost: {cost:.2f}")
+    print(f"Total Cost: {result.total:.2f}")
 
-    #print("\nTransport Cost Analysis by Department:")
-    #for department, employee_count, total_cost in results:
-        #print(f"Department: {department}, Number of Employees: {employee_count}, Total Cost (Estimated): {total_cost:.2f}")
+def print_cost_analysis(results):
+    print("\nTransport Cost Analysis by Department:")
+    for department, days, passengers, total_cost in results:
+        print(f"Department: {department}, Days: {days}, Passenger Trips: {passengers}, Total Cost: {total_cost:.2f}")
 
 if __name__ == "__main__":
     db = next(get_db())
     attendance_date = "2025-04-07"
     employees_attending = ["ريمون ادوارد عزيز", "سعدان فخرى اديب ", "صفوت بخيت بخيت"] # Replace with actual employee names
     generate_transport_report(db, attendance_date, employees_attending)
-    analyze_cost_by_department(db, "2025-04-01", "2025-04-30", department_filter="الموارد البشرية") # Replace with actual department
-    analyze_cost_by_department(db, "2025-04-01", "2025-04-30")
\ No newline at end of file
+    print_cost_analysis(analyze_cost_by_department(db, "2025-04-01", "2025-04-30", department_filter="الموارد البشرية")) # Replace with actual department
+    print_cost_analysis(analyze_cost_by_department(db, "2025-04-01", "2025-04-30"))
+    print_weekly_cost(analyze_weekly_cost(db, "2025-04-01", "2025-04-30"))
+    for by in ('department', 'contractor', 'supervisor', 'station'):
+        print_roster_cost(analyze_roster_cost(db, by), by)
+    print(f"Reference cache: {reference_cache.stats()}")
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey
+from sqlalchemy import (create_engine, Column, Integer, String, Float, ForeignKey, Index, Date,
+                        DateTime, UniqueConstraint)
 from sqlalchemy.orm import relationship, declarative_base
 
 # تحديد قاعدة البيانات (يمكنك تغييرها إلى PostgreSQL أو MySQL وغيرها)
@@ -15,14 +16,17 @@ class Employee(Base):
     __tablename__ = "employees"
 
     employee_id = Column(Integer, primary_key=True, index=True)
-    employee_name = Column(String, nullable=False)
+    employee_name = Column(String, nullable=False, index=True)  # البحث بالاسم في التقارير
     department = Column(String)
     station = Column(String)
-    route_code = Column(String, ForeignKey("routes.route_code"))
+    route_code = Column(String, ForeignKey("routes.route_code"), index=True)  # الربط مع خطوط السير
     notes = Column(String)  # إضافة عمود الملاحظات
 
     route = relationship("Route", back_populates="employees")
 
+    # التجميع والتصفية حسب القسم مع الربط بخط السير دون قراءة الجدول
+    __table_args__ = (Index("ix_employees_department_route_code", "department", "route_code"),)
+
 # تعريف جدول خطوط السير
 class Route(Base):
     __tablename__ = "routes"
@@ -32,10 +36,23 @@ class Route(Base):
     vehicle_type = Column(String)
     contractor_name = Column(String)
     supervisor_name = Column(String)
-    route_stations = Column(String)
+    route_stations = Column(String)  # نص المحطات كما يُدخل؛ المحطات المفهرسة في جدول route_stations
 
     employees = relationship("Employee", back_populates="route")
     cost = relationship("RouteCost", back_populates="route", uselist=False)
+    stations = relationship("RouteStation", back_populates="route", order_by="RouteStation.position",
+                            cascade="all, delete-orphan")
+
+# تعريف جدول محطات خطوط السير: محطة في كل صف بترتيبها في الخط،
+# مع فهرس على اسم المحطة لمعرفة الخطوط التي تمر بها
+class RouteStation(Base):
+    __tablename__ = "route_stations"
+
+    route_code = Column(String, ForeignKey("routes.route_code"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    station_name = Column(String, nullable=False, index=True)
+
+    route = relationship("Route", back_populates="stations")
 
 # تعريف جدول تكلفة خطوط السير
 class RouteCost(Base):
@@ -49,9 +66,74 @@ class RouteCost(Base):
 
     route = relationship("Route", back_populates="cost")
 
-# إنشاء الجداول في قاعدة البيانات
+# تعريف جدول الحضور اليومي (من حضر في أي يوم وعلى أي خط سير)
+class AttendanceRecord(Base):
+    __tablename__ = "attendance_records"
+
+    record_id = Column(Integer, primary_key=True)
+    attendance_date = Column(Date, nullable=False, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.employee_id"), nullable=False)
+    employee_name = Column(String)
+    department = Column(String)
+    station = Column(String)
+    route_code = Column(String)
+
+    __table_args__ = (UniqueConstraint("attendance_date", "employee_id"),)
+
+# تعريف جدول التقارير اليومية المحفوظة
+class DailyReport(Base):
+    __tablename__ = "daily_reports"
+
+    report_date = Column(Date, primary_key=True)
+    generated_at = Column(DateTime)
+    employee_count = Column(Integer)
+    route_count = Column(Integer)
+    total_cost = Column(Float)
+
+# ملخص يومي لكل قسم وخط سير، يُحدث عند حفظ حضور اليوم فقط
+# (تكلفة الخط في اليوم تُوزع على الأقسام بنسبة عدد ركاب كل قسم)
+class DailyRouteSummary(Base):
+    __tablename__ = "daily_route_summaries"
+
+    summary_date = Column(Date, primary_key=True)
+    department = Column(String, primary_key=True)
+    route_code = Column(String, primary_key=True)
+    passengers = Column(Integer)
+    cost_share = Column(Float)
+
+# سجل أسعار خطوط السير بتاريخ سريان: كل صف سارٍ من effective_from حتى تاريخ الصف التالي
+# لنفس الخط، فلا يضيع السعر القديم عند تغيير العقد وتُحسب التقارير القديمة بسعرها
+class RouteCostHistory(Base):
+    __tablename__ = "route_cost_history"
+
+    route_code = Column(String, primary_key=True)
+    effective_from = Column(Date, primary_key=True)
+    vehicle_capacity = Column(Integer)
+    cost_5_days = Column(Float)
+    cost_4_days = Column(Float)
+    cost_3_days = Column(Float)
+
+# سجل خط سير كل موظف بتاريخ سريان (route_code فارغ يعني بدون خط من هذا التاريخ)
+class EmployeeRouteHistory(Base):
+    __tablename__ = "employee_route_history"
+
+    employee_id = Column(Integer, primary_key=True)
+    effective_from = Column(Date, primary_key=True)
+    route_code = Column(String)
+
+# رقم إصدار بيانات كل جدول تزيده triggers في قاعدة البيانات مع كل إضافة أو تعديل أو حذف،
+# لمعرفة هل تغيرت البيانات منذ بناء نسخة التحليلات دون قراءة الجداول
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# إنشاء الجداول في قاعدة البيانات وتطبيق أي ترحيلات لم تُطبق بعد على قاعدة موجودة
 def create_tables():
+    from migrations import migrate
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
 
 if __name__ == "__main__":
     create_tables()
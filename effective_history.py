@@ -0,0 +1,294 @@
+import argparse
+import sys
+from bisect import bisect_right
+from dataclasses import replace
+from datetime import date
+
+from sqlalchemy import case, exists, insert, or_, select, update
+from attendance_store import as_date
+from database_setup import AttendanceRecord, Employee, EmployeeRouteHistory, RouteCost, RouteCostHistory
+
+# تاريخ سريان أول قيمة معروفة لكل خط أو موظف: تُطبق على كل التواريخ السابقة لأول تغيير
+SINCE_ALWAYS = date(1900, 1, 1)
+# أعمدة السعر التي يحفظها route_cost_history بنفس ترتيب RouteReference
+COST_FIELDS = ('vehicle_capacity', 'cost_5_days', 'cost_4_days', 'cost_3_days')
+
+
+class AsOfIndex:
+    """
+    فهرس فترات سريان: لكل مفتاح قائمة تواريخ بداية مرتبة وقيمها، وقيمة أي تاريخ تُوجد
+    بالبحث الثنائي (bisect) في تواريخ هذا المفتاح فقط، فلا يزيد زمن البحث مع طول السجل.
+    """
+
+    def __init__(self, rows=()):
+        self._starts = {}
+        self._values = {}
+        for key, effective_from, value in rows:
+            self.add(key, effective_from, value)
+
+    def add(self, key, effective_from, value):
+        starts = self._starts.setdefault(key, [])
+        values = self._values.setdefault(key, [])
+        position = bisect_right(starts, effective_from)
+        if position and starts[position - 1] == effective_from:
+            values[position - 1] = value
+        else:
+            starts.insert(position, effective_from)
+            values.insert(position, value)
+
+    def at(self, key, when, default=None):
+        """القيمة السارية للمفتاح في التاريخ when، أو default إذا لم يكن له سجل قبله."""
+        starts = self._starts.get(key)
+        if not starts:
+            return default
+        position = bisect_right(starts, as_date(when))
+        return self._values[key][position - 1] if position else default
+
+    def changes(self, key):
+        """(تاريخ السريان، القيمة) لكل تغيير في سجل المفتاح بالترتيب."""
+        return list(zip(self._starts.get(key, ()), self._values.get(key, ())))
+
+    def __contains__(self, key):
+        return key in self._starts
+
+    def __len__(self):
+        return len(self._starts)
+
+
+def route_cost_index(db):
+    """فهرس أسعار كل الخطوط من route_cost_history باستعلام واحد: القيمة tuple بترتيب COST_FIELDS."""
+    columns = [getattr(RouteCostHistory, name) for name in COST_FIELDS]
+    rows = db.execute(select(RouteCostHistory.route_code, RouteCostHistory.effective_from, *columns)
+                      .order_by(RouteCostHistory.route_code, RouteCostHistory.effective_from))
+    return AsOfIndex((row[0], row[1], tuple(row[2:])) for row in rows)
+
+
+def routes_as_of(routes, index, when):
+    """
+    نسخة من قاموس {route_code: RouteReference} بالسعر والسعة الساريين في when.
+    الخطوط التي لم يتغير سعرها تبقى نفس الكائنات، ويُعاد القاموس نفسه إذا لم يتغير شيء.
+    """
+    changed = {}
+    for code, reference in routes.items():
+        values = index.at(code, when)
+        if values is not None and values != tuple(getattr(reference, name) for name in COST_FIELDS):
+            changed[code] = replace(reference, **dict(zip(COST_FIELDS, values)))
+    return {**routes, **changed} if changed else routes
+
+
+def _value_as_of(history, key_column, key, column, when):
+    # آخر قيمة بتاريخ سريان <= when (بحث في فهرس المفتاح الأساسي (المفتاح، التاريخ))
+    return (select(column).where(key_column == key, history.effective_from <= when)
+            .order_by(history.effective_from.desc()).limit(1).scalar_subquery())
+
+
+def employee_route_as_of(when):
+    """
+    تعبير SQL لخط سير الموظف الساري في when، يُستخدم مكان Employee.route_code في استعلام
+    على employees. الموظف بلا سجل قبل when يأخذ خطه الحالي.
+    """
+    when = as_date(when)
+    known = exists().where(EmployeeRouteHistory.employee_id == Employee.employee_id,
+                           EmployeeRouteHistory.effective_from <= when)
+    route = _value_as_of(EmployeeRouteHistory, EmployeeRouteHistory.employee_id, Employee.employee_id,
+                         EmployeeRouteHistory.route_code, when)
+    return case((known, route), else_=Employee.route_code)
+
+
+def apply_due_changes(db, today=None):
+    """
+    مزامنة route_costs وemployees مع القيم السارية اليوم في السجل، لتطبيق التغييرات المسجلة
+    بتاريخ مستقبلي عند حلول موعدها. لا تُقرأ إلا المفاتيح التي لها تغيير بعد SINCE_ALWAYS.
+
+    Returns:
+        tuple: (عدد الخطوط المحدثة، عدد الموظفين المحدثين)
+    """
+    today = as_date(today or date.today())
+    costs = {name: _value_as_of(RouteCostHistory, RouteCostHistory.route_code, RouteCost.route_code,
+                                getattr(RouteCostHistory, name), today) for name in COST_FIELDS}
+    changed_routes = (select(RouteCostHistory.route_code)
+                      .where(RouteCostHistory.effective_from > SINCE_ALWAYS, RouteCostHistory.effective_from <= today))
+    route_rows = db.execute(
+        update(RouteCost)
+        .where(RouteCost.route_code.in_(changed_routes),
+               or_(*(getattr(RouteCost, name).is_distinct_from(value) for name, value in costs.items())))
+        .values(costs).execution_options(synchronize_session=False)).rowcount
+
+    route = _value_as_of(EmployeeRouteHistory, EmployeeRouteHistory.employee_id, Employee.employee_id,
+                         EmployeeRouteHistory.route_code, today)
+    changed_employees = (select(EmployeeRouteHistory.employee_id)
+                         .where(EmployeeRouteHistory.effective_from > SINCE_ALWAYS,
+                                EmployeeRouteHistory.effective_from <= today))
+    employee_rows = db.execute(
+        update(Employee)
+        .where(Employee.employee_id.in_(changed_employees), Employee.route_code.is_distinct_from(route))
+        .values(route_code=route).execution_options(synchronize_session=False)).rowcount
+    return route_rows, employee_rows
+
+
+def set_route_cost(db, route_code, effective_from, **values):
+    """
+    تسجيل سعر أو سعة خط ساريين من effective_from (في الماضي أو المستقبل) دون تغيير ما قبله،
+    ثم مزامنة route_costs مع القيم السارية اليوم. الأعمدة غير المذكورة في values تبقى
+    كما كانت سارية في ذلك التاريخ.
+
+    Raises:
+        ValueError: عمود غير معروف أو خط بلا صف تكلفة.
+    """
+    unknown = set(values) - set(COST_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown cost columns: {', '.join(sorted(unknown))}")
+    effective_from = as_date(effective_from)
+    if db.get(RouteCost, route_code) is None:
+        raise ValueError(f"route_code {route_code} has no row in route_costs")
+    columns = [getattr(RouteCostHistory, name) for name in COST_FIELDS]
+    previous = db.execute(select(*columns)
+                          .where(RouteCostHistory.route_code == route_code,
+                                 RouteCostHistory.effective_from <= effective_from)
+                          .order_by(RouteCostHistory.effective_from.desc()).limit(1)).first()
+    row = dict(zip(COST_FIELDS, previous or (None,) * len(COST_FIELDS)))
+    row.update(values)
+    try:
+        db.execute(insert(RouteCostHistory).prefix_with('OR REPLACE'),
+                   [dict(row, route_code=route_code, effective_from=effective_from)])
+        apply_due_changes(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def set_employee_route(db, employee_ids, route_code, effective_from):
+    """
+    نقل موظفين إلى خط سير (أو بدون خط إذا كان route_code فارغاً) من effective_from،
+    بنفس تحقق التعديل الجماعي، ثم مزامنة employees مع الخط الساري اليوم.
+
+    Returns:
+        int: عدد الموظفين الموجودين الذين سُجل لهم التغيير.
+
+    Raises:
+        BulkValidationError: رمز خط غير موجود.
+    """
+    from bulk_operations import _batches, validate_value
+
+    route_code = validate_value(db, Employee, 'route_code', route_code)
+    effective_from = as_date(effective_from)
+    existing = []
+    for batch in _batches(employee_ids):
+        existing.extend(db.execute(select(Employee.employee_id).where(Employee.employee_id.in_(batch))).scalars())
+    try:
+        if existing:
+            db.execute(insert(EmployeeRouteHistory).prefix_with('OR REPLACE'),
+                       [{'employee_id': employee_id, 'effective_from': effective_from, 'route_code': route_code}
+                        for employee_id in existing])
+        apply_due_changes(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(existing)
+
+
+def recalculate_saved_days(db, start_date, end_date, progress_callback=None):
+    """
+    إعادة بناء التقارير والملخصات المحفوظة لكل يوم في الفترة من أسماء الحضور المحفوظة،
+    بالأسعار وخطوط السير السارية في كل يوم (بعد تسجيل تغيير بتاريخ في الماضي).
+
+    Returns:
+        batch_reports.BatchSummary
+    """
+    import time
+    from attendance_store import save_daily_attendance
+    from batch_reports import BatchSummary, summarize
+    from report_engine import build_transport_report
+
+    started = time.perf_counter()
+    query = (select(AttendanceRecord.attendance_date, AttendanceRecord.employee_name)
+             .where(AttendanceRecord.attendance_date.between(as_date(start_date), as_date(end_date)))
+             .order_by(AttendanceRecord.attendance_date, AttendanceRecord.record_id))
+    days = {}
+    for day, name in db.execute(query):
+        days.setdefault(day, []).append(name)
+
+    summary = BatchSummary()
+    for done, (day, names) in enumerate(days.items(), 1):
+        report = build_transport_report(db, day.isoformat(), names)
+        save_daily_attendance(db, report)
+        summary.days.append(summarize(report))
+        if progress_callback:
+            progress_callback(done, len(days))
+    summary.seconds = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database_setup import DATABASE_URL
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Record dated route price and route assignment changes.")
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    set_cost = commands.add_parser('set-cost', help="record a route price or capacity effective from a date")
+    set_cost.add_argument('route_code')
+    set_cost.add_argument('--from', dest='effective_from', required=True, help="first day the price applies")
+    set_cost.add_argument('--capacity', type=int, dest='vehicle_capacity')
+    for days in (5, 4, 3):
+        set_cost.add_argument(f'--cost-{days}-days', type=float, dest=f'cost_{days}_days')
+
+    set_route = commands.add_parser('set-route', help="move employees to a route effective from a date")
+    set_route.add_argument('employee_ids', type=int, nargs='+')
+    set_route.add_argument('--route', required=True, help="route code, or an empty string for no route")
+    set_route.add_argument('--from', dest='effective_from', required=True, help="first day on the new route")
+
+    history = commands.add_parser('history', help="print the price history of a route")
+    history.add_argument('route_code')
+
+    recalculate = commands.add_parser('recalculate', help="rebuild saved daily reports for a date range")
+    recalculate.add_argument('start')
+    recalculate.add_argument('end')
+
+    commands.add_parser('apply-due', help="apply changes whose effective date has arrived")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    migrate(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        if args.command == 'set-cost':
+            values = {name: getattr(args, name) for name in COST_FIELDS if getattr(args, name) is not None}
+            if not values:
+                parser.error("give at least one of --capacity, --cost-5-days, --cost-4-days, --cost-3-days")
+            set_route_cost(db, args.route_code, args.effective_from, **values)
+            print(f"Recorded new values for {args.route_code} from {args.effective_from}.")
+        elif args.command == 'set-route':
+            count = set_employee_route(db, args.employee_ids, args.route, args.effective_from)
+            print(f"Recorded route {args.route or '(none)'} for {count} employee(s) from {args.effective_from}.")
+        elif args.command == 'history':
+            print(f"{'From':<12}{'Capacity':>10}{'5 days':>12}{'4 days':>12}{'3 days':>12}")
+            for effective_from, values in route_cost_index(db).changes(args.route_code):
+                label = 'always' if effective_from == SINCE_ALWAYS else effective_from.isoformat()
+                print(f"{label:<12}" + ''.join(f"{'' if value is None else value:>{width}}"
+                                               for value, width in zip(values, (10, 12, 12, 12))))
+        elif args.command == 'recalculate':
+            from batch_reports import print_summary
+            print_summary(recalculate_saved_days(db, args.start, args.end))
+        else:
+            routes, employees = apply_due_changes(db)
+            db.commit()
+            print(f"Updated {routes} route cost(s) and {employees} employee(s).")
+        if args.command in ('set-cost', 'set-route') and as_date(args.effective_from) < date.today():
+            print(f"Saved daily reports from {args.effective_from} still use the old values; "
+                  f"run 'recalculate {args.effective_from} {date.today().isoformat()}' to rebuild them.")
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+import pandas as pd
+from station_index import clean_station, join_stations, split_stations
+
+# قيم تعني أن الموظف لا يستخدم خط سير، وتُخزن كقيمة فارغة بدلاً من رمز غير موجود
+NO_ROUTE_VALUES = ('لايوجد', 'لا يوجد')
+
+# قواعد كل ورقة: الأعمدة الإلزامية، والأعمدة الرقمية، والمفتاح الذي لا يجوز تكراره،
+# وهل يجب أن يشير route_code إلى خط سير موجود
+SHEET_RULES = {
+    'Sheet2': {
+        'required': ('route_code',),
+        'numeric': (),
+        'integer': (),
+        'unique': ('route_code',),
+        'route_reference': False,
+    },
+    'Sheet3': {
+        'required': ('route_code', 'vehicle_capacity', 'cost_5_days'),
+        'numeric': ('vehicle_capacity', 'cost_5_days', 'cost_4_days', 'cost_3_days'),
+        'integer': ('vehicle_capacity',),
+        'unique': ('route_code',),
+        'route_reference': True,
+    },
+    'Sheet1': {
+        'required': ('employee_name',),
+        'numeric': (),
+        'integer': (),
+        'unique': ('employee_name', 'department', 'station', 'route_code'),
+        'route_reference': True,
+    },
+}
+
+# ترتيب التحقق: خطوط السير أولاً لأن الورقتين الأخريين تعتمدان على رموزها
+VALIDATION_ORDER = ('Sheet2', 'Sheet3', 'Sheet1')
+
+
+def _blank(series):
+    """قناع للقيم الفارغة أو النصوص المكونة من مسافات فقط."""
+    return series.isna() | series.astype(str).str.strip().eq('')
+
+
+def unique_row_keys(sheet_name, frame):
+    """بصمة المفتاح الذي لا يجوز تكراره لكل صف (القيم الفارغة متساوية كما في duplicated)."""
+    unique = [column for column in SHEET_RULES[sheet_name]['unique'] if column in frame.columns]
+    return pd.util.hash_pandas_object(frame[unique].astype(object), index=False)
+
+
+def validate_sheet(sheet_name, frame, route_codes=None, seen_keys=None):
+    """
+    التحقق من ورقة واحدة بأقنعة وعمليات ربط على مستوى العمود كاملاً (بدون حلقات على الصفوف).
+
+    Args:
+        route_codes: رموز خطوط السير الصالحة للتحقق من المراجع (للورقتين Sheet1 و Sheet3).
+        seen_keys: بصمات مفاتيح الصفوف التي سبق قبولها (unique_row_keys) عند التحقق
+            على دفعات، لاكتشاف التكرار بين الدفعات.
+
+    Returns:
+        tuple: (الصفوف الصالحة، الصفوف المرفوضة مع عمود reason ورقم الصف في Excel)
+    """
+    rules = SHEET_RULES[sheet_name]
+    original = frame
+    frame = frame.copy()
+    reasons = pd.Series('', index=frame.index, dtype=object)
+
+    def reject(mask, reason):
+        nonlocal reasons
+        reasons = reasons.where(~mask, reasons + np.where(reasons.eq(''), '', '; ') + reason)
+
+    if 'route_code' in frame.columns:
+        frame['route_code'] = frame['route_code'].where(~frame['route_code'].isin(NO_ROUTE_VALUES), None)
+    # أسماء المحطات بدون مسافات زائدة حتى تطابق محطة الموظف محطات خط السير
+    if 'station' in frame.columns:
+        frame['station'] = frame['station'].map(clean_station, na_action='ignore')
+    if 'route_stations' in frame.columns:
+        frame['route_stations'] = frame['route_stations'].map(
+            lambda text: join_stations(split_stations(text)) or None, na_action='ignore')
+
+    for column in rules['required']:
+        if column not in frame.columns:
+            reject(pd.Series(True, index=frame.index), f"missing column {column}")
+        else:
+            reject(_blank(frame[column]), f"{column} is required")
+
+    for column in rules['numeric']:
+        if column not in frame.columns:
+            continue
+        numbers = pd.to_numeric(frame[column], errors='coerce')
+        reject(numbers.isna() & ~_blank(frame[column]), f"{column} is not a number")
+        reject(numbers < 0, f"{column} is negative")
+        if column in rules['integer']:
+            reject(numbers.notna() & (numbers != np.floor(numbers)), f"{column} is not a whole number")
+        frame[column] = numbers
+
+    unique = [column for column in rules['unique'] if column in frame.columns]
+    if unique:
+        reject(frame.duplicated(subset=unique, keep='first'), f"duplicate {', '.join(unique)}")
+        if seen_keys is not None and len(seen_keys):
+            reject(unique_row_keys(sheet_name, frame).isin(seen_keys), f"duplicate {', '.join(unique)}")
+
+    if rules['route_reference'] and route_codes is not None and 'route_code' in frame.columns:
+        unknown = frame['route_code'].notna() & ~frame['route_code'].isin(route_codes)
+        reject(unknown, "route_code not found in Sheet2")
+
+    bad = reasons.ne('')
+    rejected = original[bad].assign(reason=reasons[bad], excel_row=frame.index[bad] + 2)
+    return frame[~bad], rejected
+
+
+def validate_workbook(frames):
+    """
+    التحقق المسبق من أوراق ملف الاستيراد كاملة قبل أي كتابة إلى قاعدة البيانات.
+
+    Args:
+        frames: قاموس {اسم الورقة: DataFrame}.
+
+    Returns:
+        tuple: (قاموس الأوراق بعد استبعاد الصفوف المرفوضة، قاموس الصفوف المرفوضة لكل ورقة)
+    """
+    valid, rejected = {}, {}
+    route_codes = None
+    for sheet_name in VALIDATION_ORDER:
+        valid[sheet_name], rejected[sheet_name] = validate_sheet(
+            sheet_name, frames[sheet_name], route_codes)
+        if sheet_name == 'Sheet2':
+            route_codes = valid[sheet_name]['route_code']
+    return valid, {name: rows for name, rows in rejected.items() if len(rows)}
+
+
+def write_reject_workbook(rejected, path):
+    """كتابة الصفوف المرفوضة إلى ملف Excel بورقة لكل ورقة مصدر، مع سبب الرفض لكل صف."""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet_name, rows in rejected.items():
+            columns = ['excel_row', 'reason'] + [c for c in rows.columns if c not in ('excel_row', 'reason')]
+            rows[columns].to_excel(writer, sheet_name=sheet_name, index=False)
+            writer.sheets[sheet_name].sheet_view.rightToLeft = True
+    return path
+
+
+def default_reject_path(excel_file_path):
+    """مسار ملف المرفوضات بجوار ملف الاستيراد."""
+    return f"{os.path.splitext(excel_file_path)[0]}_rejects.xlsx"
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+# حجم ملف السجل قبل تدويره وعدد النسخ القديمة المحفوظة
+LOG_MAX_BYTES = 2 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+# مستوى السجل الافتراضي، ويمكن تغييره بمتغير البيئة TRANSPORT_LOG_LEVEL (مثل DEBUG)
+DEFAULT_LOG_LEVEL = 'INFO'
+
+action_logger = logging.getLogger('transport.actions')
+
+# آخر الإجراءات المسجلة لعرضها في لوحة التشخيص
+recent_actions = deque(maxlen=200)
+
+_local = threading.local()
+
+
+@dataclass
+class ActionStats:
+    """إحصائيات إجراء واحد من إجراءات المستخدم (تحميل جدول، بحث، تقرير...)."""
+    name: str
+    statements: int = 0
+    sql_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    started_at: float = field(default_factory=time.time)
+    details: dict = field(default_factory=dict)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """كل سجل كسطر JSON واحد حتى يمكن تحليل ملف السجل آلياً."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if hasattr(record, 'action'):
+            entry['action'] = record.action
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(path='app.log', level=None, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """إعداد السجل الرئيسي: ملف بحجم محدود يُدور تلقائياً، بمستوى قابل للتغيير."""
+    level = (level or os.environ.get('TRANSPORT_LOG_LEVEL') or DEFAULT_LOG_LEVEL).upper()
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    handler.setFormatter(JsonLineFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    return handler
+
+
+def _active_actions():
+    if not hasattr(_local, 'actions'):
+        _local.actions = []
+    return _local.actions
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    # الاستعلام يُحسب لكل الإجراءات النشطة في هذا الخيط (الإجراء الداخلي والخارجي)
+    for action in _active_actions():
+        action.statements += 1
+        action.sql_seconds += elapsed
+
+
+def instrument_engine(engine):
+    """ربط أحداث المحرك لعد الاستعلامات وقياس زمنها لكل إجراء (مرة واحدة لكل محرك)."""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    return engine
+
+
+@contextmanager
+def track_action(name, level=logging.INFO, **details):
+    """
+    قياس إجراء: عدد استعلامات SQL وزمنها والزمن الكلي، ثم تسجيله في السجل ولوحة التشخيص.
+    الإجراءات المتكررة (مثل البحث مع كل حرف) تُسجل بمستوى DEBUG حتى لا يمتلئ السجل.
+
+    Example:
+        with track_action('report', names=len(names)) as stats:
+            ...
+    """
+    stats = ActionStats(name, details=details)
+    actions = _active_actions()
+    actions.append(stats)
+    started = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.wall_seconds = time.perf_counter() - started
+        actions.remove(stats)
+        recent_actions.append(stats)
+        action_logger.log(
+            level, f"{name}: {stats.statements} statements, {stats.sql_seconds * 1000:.1f} ms SQL, "
+            f"{stats.wall_seconds * 1000:.1f} ms total",
+            extra={'action': asdict(stats)})
+
+
+@contextmanager
+def assert_query_budget(max_statements, name='query budget'):
+    """
+    التحقق من أن الكود داخل الكتلة لا يُنفذ أكثر من max_statements استعلاماً
+    (يتطلب instrument_engine على المحرك المستخدم).
+
+    Example:
+        with assert_query_budget(5):
+            build_transport_report(db, date, names)
+    """
+    with track_action(name) as stats:
+        yield stats
+    if stats.statements > max_statements:
+        raise AssertionError(f"{name}: {stats.statements} SQL statements executed, "
+                             f"budget is {max_statements}")
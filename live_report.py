@@ -0,0 +1,178 @@
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from database_setup import Employee
+from effective_history import employee_route_as_of
+from reference_cache import reference_cache
+from report_engine import RouteReport, TransportReport
+from station_index import clean_station
+from vehicle_allocation import allocate, vehicles_needed
+
+
+@dataclass
+class LiveRoute:
+    """عدادات خط سير واحد أثناء اختيار الحضور."""
+    reference: object
+    passengers: dict = field(default_factory=dict)  # قاموس كمجموعة مرتبة: إضافة وحذف O(1)
+    station_counts: dict = field(default_factory=dict)
+    vehicles: int = 0
+
+    @property
+    def cost(self):
+        return float(self.reference.cost_5_days or 0) * self.vehicles
+
+
+class LiveReportState:
+    """
+    حالة تقرير النقل أثناء بناء قائمة الحضور: كل إضافة أو إزالة لموظف تحدّث عدد ركاب
+    خطه ومحطته وعدد السيارات والتكلفة الإجمالية في زمن ثابت، والتقرير النهائي يُبنى
+    من هذه الحالة مباشرة دون إعادة قراءة الموظفين.
+
+    Args:
+        employees: قاموس {اسم الموظف: صف بيانات} لأول موظف بكل اسم (كما في fetch_employee_details).
+        routes: قاموس {route_code: RouteReference} من ذاكرة خطوط السير.
+    """
+
+    def __init__(self, employees, routes):
+        self.employees = employees
+        self.route_references = routes
+        self.selected = {}
+        self.routes = {}
+        self.department_counts = {}
+        self.without_route = {}
+        self.missing_names = {}
+        self.vehicle_count = 0
+        self.total_cost = 0.0
+
+    @classmethod
+    def load(cls, db, cache=reference_cache, as_of=None):
+        """
+        تحميل بيانات كل الموظفين باستعلام واحد وخطوط السير من الذاكرة المؤقتة،
+        بخطوط السير والأسعار السارية في as_of (تاريخ التقرير) إذا حُدد.
+
+        Returns:
+            tuple: (LiveReportState، قائمة أسماء كل الموظفين بترتيب employee_id)
+        """
+        route_code = Employee.route_code if as_of is None else employee_route_as_of(as_of)
+        query = (select(Employee.employee_id, Employee.employee_name, Employee.department, Employee.station,
+                        route_code.label('route_code'))
+                 .where(Employee.employee_name.is_not(None))
+                 .order_by(Employee.employee_id))
+        rows = db.execute(query).all()
+        employees = {}
+        for row in rows:
+            employees.setdefault(row.employee_name, row)
+        return cls(employees, cache.routes(db, as_of)), [row.employee_name for row in rows]
+
+    def __contains__(self, name):
+        return name in self.selected
+
+    def __len__(self):
+        return len(self.selected)
+
+    @property
+    def passenger_count(self):
+        return len(self.selected) - len(self.without_route) - len(self.missing_names)
+
+    def add(self, name):
+        """إضافة موظف إلى الحضور. Returns: رمز خطه (أو None)، أو False إذا كان مضافاً من قبل."""
+        if name in self.selected:
+            return False
+        row = self.employees.get(name)
+        self.selected[name] = row
+        if row is None:
+            self.missing_names[name] = None
+            return None
+        self.department_counts[row.department] = self.department_counts.get(row.department, 0) + 1
+        reference = self.route_references.get(row.route_code)
+        if reference is None:
+            self.without_route[name] = None
+            return None
+        route = self.routes.get(row.route_code)
+        if route is None:
+            route = self.routes[row.route_code] = LiveRoute(reference)
+        route.passengers[name] = None
+        station = clean_station(row.station)
+        route.station_counts[station] = route.station_counts.get(station, 0) + 1
+        self._update_vehicles(row.route_code, route)
+        return row.route_code
+
+    def remove(self, name):
+        """إزالة موظف من الحضور. Returns: رمز خطه (أو None)، أو False إذا لم يكن مضافاً."""
+        if name not in self.selected:
+            return False
+        row = self.selected.pop(name)
+        if row is None:
+            del self.missing_names[name]
+            return None
+        count = self.department_counts[row.department] - 1
+        if count:
+            self.department_counts[row.department] = count
+        else:
+            del self.department_counts[row.department]
+        if name in self.without_route:
+            del self.without_route[name]
+            return None
+        route = self.routes[row.route_code]
+        del route.passengers[name]
+        station = clean_station(row.station)
+        count = route.station_counts[station] - 1
+        if count:
+            route.station_counts[station] = count
+        else:
+            del route.station_counts[station]
+        self._update_vehicles(row.route_code, route)
+        return row.route_code
+
+    def _update_vehicles(self, route_code, route):
+        # طرح مساهمة الخط القديمة ثم إضافة الجديدة حتى تبقى الإجماليات صحيحة دون إعادة الجمع
+        self.vehicle_count -= route.vehicles
+        self.total_cost -= route.cost
+        route.vehicles = vehicles_needed(len(route.passengers), route.reference.vehicle_capacity)
+        self.vehicle_count += route.vehicles
+        self.total_cost += route.cost
+        if not route.passengers:
+            del self.routes[route_code]
+
+    def route_summary(self, route_code):
+        """(عدد الركاب، السعة، عدد السيارات، التكلفة) لخط واحد، أو None إذا لم يعد له ركاب."""
+        route = self.routes.get(route_code)
+        if route is None:
+            return None
+        return len(route.passengers), route.reference.vehicle_capacity, route.vehicles, route.cost
+
+    def to_report(self, date_str):
+        """
+        التقرير النهائي من الحالة الحالية بنفس شكل build_transport_report وترتيبه
+        (الخطوط والركاب بترتيب الاختيار)، مع توزيع السيارات واقتراحات الدمج.
+        """
+        report = TransportReport(date=date_str, missing_names=list(self.missing_names),
+                                 without_route=list(self.without_route))
+        # العدادات تُنسخ بترتيب أول ظهور في قائمة الاختيار حتى يطابق التقرير build_transport_report
+        for name, row in self.selected.items():
+            if row is None:
+                continue
+            report.employees.append(row)
+            report.department_counts.setdefault(row.department, self.department_counts[row.department])
+            if name in self.without_route:
+                continue
+            live = self.routes[row.route_code]
+            route = report.routes.get(row.route_code)
+            if route is None:
+                reference = live.reference
+                route = report.routes[row.route_code] = RouteReport(
+                    route_code=row.route_code,
+                    route_name=reference.route_name,
+                    vehicle_type=reference.vehicle_type,
+                    contractor_name=reference.contractor_name,
+                    supervisor_name=reference.supervisor_name,
+                    stations=list(reference.stations),
+                    vehicle_capacity=reference.vehicle_capacity,
+                    cost_5_days=float(reference.cost_5_days or 0),
+                    cost_4_days=reference.cost_4_days,
+                    cost_3_days=reference.cost_3_days,
+                    passengers=list(live.passengers),
+                )
+            station = clean_station(row.station)
+            route.station_counts.setdefault(station, live.station_counts[station])
+        return allocate(report)
@@ -1,19 +1,53 @@
+import time
+STARTUP_STARTED = time.perf_counter()  # بداية قياس زمن التشغيل قبل أي استيراد ثقيل
+
 import sys
 import os
+from datetime import date
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QTableWidget, QTableWidgetItem, QMessageBox,
-                             QComboBox, QDialog, QFormLayout, QLineEdit, QLabel,
-                             QAbstractItemView, QFileDialog, QListWidget)
-from PyQt5.QtCore import Qt
-from sqlalchemy import create_engine, inspect
+                             QPushButton, QTableView, QMessageBox,
+                             QComboBox, QDialog, QDateEdit, QFormLayout, QLineEdit, QLabel,
+                             QAbstractItemView, QFileDialog, QListView, QListWidget, QListWidgetItem,
+                             QProgressDialog, QShortcut, QTableWidget, QTableWidgetItem)
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import Qt, QDate, QObject, QStringListModel, QThread, QTimer, pyqtSignal
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database_setup import Base, Employee, Route, RouteCost  # استيراد نماذج قاعدة البيانات
-import pandas as pd  # لتصدير التقرير إلى Excel
+from report_engine import build_transport_report
+from attendance_store import save_daily_attendance
+from reference_cache import reference_cache
+from report_export import export_reports
+from instrumentation import instrument_engine, recent_actions, setup_logging, track_action
+from report_service import service_client
+from live_report import LiveReportState
+from table_model import LazyTableModel, SearchProxyModel
+from arabic_search import EmployeeSearchIndex
+from station_index import clean_station, join_stations, replace_route_stations, split_stations
+from bulk_operations import (BulkValidationError, bulk_delete, bulk_insert_rows, bulk_update,
+                             primary_key_column)
 import logging
 
-# إعداد التسجيل لتتبع الأخطاء
-logging.basicConfig(filename='app.log', level=logging.DEBUG, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# تُهيأ في init_app() عند التشغيل وليس عند استيراد الملف
+engine = None
+SessionLocal = None
+session = None
+
+# أزمنة مراحل التشغيل بالثواني منذ STARTUP_STARTED
+STARTUP_TIMES = {}
+
+# لوحة التشخيص (عدد الاستعلامات وزمن كل إجراء) تظهر مع --diagnostics أو TRANSPORT_DIAGNOSTICS=1
+DIAGNOSTICS_ENABLED = '--diagnostics' in sys.argv or os.environ.get('TRANSPORT_DIAGNOSTICS') == '1'
+
+
+def mark_startup(stage):
+    STARTUP_TIMES[stage] = time.perf_counter() - STARTUP_STARTED
+
+
+def startup_report():
+    """نص تقرير زمن التشغيل (بالمللي ثانية) لكل مرحلة."""
+    return "\n".join(f"{stage}: {seconds * 1000:.0f} ms" for stage, seconds in STARTUP_TIMES.items())
+
 
 # دالة للحصول على المسار الصحيح سواء في وضع التنفيذ أو التطوير
 def resource_path(relative_path):
@@ -27,13 +61,23 @@ def resource_path(relative_path):
         shutil.copy(os.path.join(base_path, relative_path), target_path)
     return target_path
 
-DATABASE_URL = f"sqlite:///{resource_path('transport_management.db')}"
-# Database URL
-#DATABASE_URL = "sqlite:///transport_management.db"
-engine = create_engine(DATABASE_URL)
-Base.metadata.bind = engine
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-session = SessionLocal()
+
+def init_app(database_url=None):
+    """
+    إعداد التسجيل والاتصال بقاعدة البيانات عند التشغيل فقط (وليس عند الاستيراد)،
+    حتى لا يتأخر ظهور النافذة الأولى. الاتصال نفسه يُفتح عند أول استعلام.
+    """
+    global engine, SessionLocal, session
+    # سجل بحجم محدود ومستوى قابل للتغيير (TRANSPORT_LOG_LEVEL) بدلاً من DEBUG بلا حد
+    setup_logging('app.log')
+    # Database URL
+    #DATABASE_URL = "sqlite:///transport_management.db"
+    database_url = database_url or f"sqlite:///{resource_path('transport_management.db')}"
+    engine = instrument_engine(create_engine(database_url))  # عد الاستعلامات وزمنها لكل إجراء
+    Base.metadata.bind = engine
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+
 
 class DataEntryDialog(QDialog):
     """
@@ -101,11 +145,46 @@ class DataEntryDialog(QDialog):
             data = {}
             for key, widget in self.inputs.items():
                 data[key] = widget.text()
+            # توحيد كتابة المحطات حتى تطابق محطة الموظف محطات خط السير
+            if 'station' in data:
+                data['station'] = clean_station(data['station'])
+            if 'route_stations' in data:
+                data['route_stations'] = join_stations(split_stations(data['route_stations']))
             return data
         else:
             return None
 
 
+class BulkEditDialog(QDialog):
+    """
+    نافذة تعيين قيمة عمود واحد لكل الصفوف المحددة.
+    """
+    def __init__(self, model, row_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"تعديل {row_count} صف")
+        layout = QFormLayout(self)
+        self.column_combo = QComboBox()
+        key = primary_key_column(model).key
+        self.column_combo.addItems([column.key for column in model.__table__.columns if column.key != key])
+        self.value_input = QLineEdit()
+        self.value_input.setPlaceholderText("اتركه فارغاً لمسح القيمة")
+        layout.addRow("العمود:", self.column_combo)
+        layout.addRow("القيمة الجديدة:", self.value_input)
+        save_button = QPushButton("حفظ", self)
+        cancel_button = QPushButton("إلغاء", self)
+        layout.addRow(save_button, cancel_button)
+        save_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+
+    def get_data(self):
+        """
+        Returns:
+            tuple: (اسم العمود، القيمة) أو None إذا تم الإلغاء.
+        """
+        if self.result() != QDialog.Accepted:
+            return None
+        return self.column_combo.currentText(), self.value_input.text()
+
 
 class EmployeeAttendanceDialog(QDialog):
     def __init__(self, parent=None):
@@ -113,29 +192,58 @@ class EmployeeAttendanceDialog(QDialog):
         self.setWindowTitle("اختيار الموظفين المطلوب حضورهم")
         self.layout = QVBoxLayout(self)
         
-        # تخزين قائمة الموظفين عند التهيئة
+        # تخزين قائمة الموظفين عند التهيئة، مع حالة التقرير الحية التي تتحدث مع كل إضافة أو إزالة
+        # (في وضع العميل تبني الخدمة التقرير فلا توجد معاينة حية)
         self.all_employees = []
+        self.live_state = None
+        self.selected_names = set()
         try:
             logging.info("جاري تحميل قائمة الموظفين من قاعدة البيانات")
-            employees = session.query(Employee).all()
-            self.all_employees = [emp.employee_name for emp in employees 
-                                if emp.employee_name is not None and isinstance(emp.employee_name, str)]
+            client = service_client()
+            if client is not None:
+                names = client.employee_names()
+            else:
+                self.live_state, names = LiveReportState.load(session, as_of=date.today())
+            self.all_employees = [name for name in names if isinstance(name, str)]
             logging.info(f"تم تحميل {len(self.all_employees)} موظف بنجاح")
         except Exception as e:
             logging.error(f"خطأ أثناء تحميل الموظفين: {str(e)}")
             QMessageBox.critical(self, "خطأ", f"خطأ في تحميل الموظفين: {str(e)}")
+        # فهرس البحث يُبنى مرة واحدة مع تطبيع الأسماء العربية
+        self.search_index = EmployeeSearchIndex(self.all_employees)
+
+        # تاريخ الحضور الذي يُحفظ به التقرير
+        date_layout = QHBoxLayout()
+        date_layout.addWidget(QLabel("تاريخ الحضور:"))
+        self.date_input = QDateEdit(QDate.currentDate())
+        self.date_input.setCalendarPopup(True)
+        self.date_input.setDisplayFormat("yyyy-MM-dd")
+        # خطوط السير والأسعار في المعاينة هي السارية في تاريخ الحضور المختار
+        self.date_input.dateChanged.connect(self.reload_live_state)
+        date_layout.addWidget(self.date_input)
+        self.layout.addLayout(date_layout)
 
         # حقل البحث
         self.search_label = QLabel("ابحث عن موظف:")
         self.layout.addWidget(self.search_label)
         
         self.search_input = QLineEdit()
-        self.search_input.textChanged.connect(self.filter_employees)
+        # تأخير البحث حتى يتوقف المستخدم عن الكتابة لحظة
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(lambda: self.filter_employees(self.search_input.text()))
+        self.search_input.textChanged.connect(self.search_timer.start)
         self.layout.addWidget(self.search_input)
         
-        # قائمة الموظفين المتاحين
-        self.employee_list = QListWidget()
-        self.employee_list.addItems(self.all_employees)
+        # قائمة الموظفين المتاحين (نموذج وسيط فوق القائمة الكاملة بدلاً من إعادة بنائها)
+        self.employee_model = QStringListModel(self.all_employees, self)
+        self.employee_proxy = SearchProxyModel(self)
+        self.employee_proxy.setSourceModel(self.employee_model)
+        self.employee_list = QListView()
+        self.employee_list.setModel(self.employee_proxy)
+        self.employee_list.setUniformItemSizes(True)
+        self.employee_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.employee_list.setSelectionMode(QAbstractItemView.SingleSelection)
         self.layout.addWidget(self.employee_list)
         
@@ -145,6 +253,16 @@ class EmployeeAttendanceDialog(QDialog):
         
         self.selected_employees = QListWidget()
         self.layout.addWidget(self.selected_employees)
+
+        # معاينة حية: الإجماليات وسطر لكل خط سير (يُحدث سطر الخط المتغير فقط)
+        self.live_label = QLabel()
+        self.route_items = {}
+        self.route_summary_list = QListWidget()
+        self.route_summary_list.setMaximumHeight(120)
+        if self.live_state is not None:
+            self.layout.addWidget(self.live_label)
+            self.layout.addWidget(self.route_summary_list)
+            self.update_live_preview(None)
         
         # أزرار التحكم
         self.add_button = QPushButton("إضافة موظف")
@@ -163,17 +281,15 @@ class EmployeeAttendanceDialog(QDialog):
         self.cancel_button.clicked.connect(self.reject)
         self.layout.addWidget(self.cancel_button)
 
+        # المهمة الخلفية الجارية (إن وجدت)
+        self.task = None
+        self.task_thread = None
+
     def filter_employees(self, text):
         """تصفية قائمة الموظفين بناءً على النص المدخل"""
         try:
-            logging.info(f"جاري تصفية القائمة بناءً على النص: {text}")
-            self.employee_list.clear()
-            if not text.strip():
-                self.employee_list.addItems(self.all_employees)
-            else:
-                filtered = [name for name in self.all_employees if text.lower() in name.lower()]
-                self.employee_list.addItems(filtered)
-            logging.info("تمت التصفية بنجاح")
+            with track_action('search', level=logging.DEBUG, length=len(text)):
+                self.employee_proxy.set_rows(self.search_index.search(text))
         except Exception as e:
             logging.error(f"خطأ أثناء تصفية القائمة: {str(e)}")
             QMessageBox.critical(self, "خطأ", f"خطأ أثناء التصفية: {str(e)}")
@@ -181,15 +297,17 @@ class EmployeeAttendanceDialog(QDialog):
     def add_employee(self):
         """إضافة الموظف المختار إلى القائمة"""
         try:
-            selected_items = self.employee_list.selectedItems()
-            if not selected_items:
+            selected_indexes = self.employee_list.selectedIndexes()
+            if not selected_indexes:
                 return
-            employee_name = selected_items[0].text()
-            logging.info(f"محاولة إضافة الموظف: {employee_name}")
-            if employee_name not in [self.selected_employees.item(i).text() 
-                                   for i in range(self.selected_employees.count())]:
+            employee_name = selected_indexes[0].data()
+            logging.debug(f"محاولة إضافة الموظف: {employee_name}")
+            if employee_name not in self.selected_names:
+                self.selected_names.add(employee_name)
                 self.selected_employees.addItem(employee_name)
-                logging.info(f"تمت إضافة الموظف: {employee_name}")
+                if self.live_state is not None:
+                    self.update_live_preview(self.live_state.add(employee_name))
+                logging.debug(f"تمت إضافة الموظف: {employee_name}")
             self.search_input.clear()  # مسح حقل البحث بعد الإضافة
         except Exception as e:
             logging.error(f"خطأ أثناء إضافة الموظف: {str(e)}")
@@ -202,11 +320,54 @@ class EmployeeAttendanceDialog(QDialog):
             if current_row >= 0:
                 removed_employee = self.selected_employees.item(current_row).text()
                 self.selected_employees.takeItem(current_row)
-                logging.info(f"تمت إزالة الموظف: {removed_employee}")
+                self.selected_names.discard(removed_employee)
+                if self.live_state is not None:
+                    self.update_live_preview(self.live_state.remove(removed_employee))
+                logging.debug(f"تمت إزالة الموظف: {removed_employee}")
         except Exception as e:
             logging.error(f"خطأ أثناء إزالة الموظف: {str(e)}")
             QMessageBox.critical(self, "خطأ", f"خطأ أثناء إزالة الموظف: {str(e)}")
 
+    def reload_live_state(self):
+        """إعادة بناء المعاينة الحية بخطوط السير والأسعار السارية في التاريخ الجديد."""
+        if self.live_state is None:
+            return
+        try:
+            report_date = self.date_input.date().toString("yyyy-MM-dd")
+            self.live_state, _ = LiveReportState.load(session, as_of=report_date)
+            for name in self.get_selected_employees():
+                self.live_state.add(name)
+            self.route_summary_list.clear()
+            self.route_items = {}
+            self.update_live_preview(None)
+            for route_code in self.live_state.routes:
+                self.update_live_preview(route_code)
+        except Exception as e:
+            logging.error(f"خطأ أثناء تحديث المعاينة: {str(e)}")
+            QMessageBox.critical(self, "خطأ", f"خطأ أثناء تحديث المعاينة: {str(e)}")
+
+    def update_live_preview(self, route_code):
+        """تحديث الإجماليات وسطر خط السير المتغير فقط (route_code=None عند عدم تغير أي خط)."""
+        state = self.live_state
+        self.live_label.setText(
+            f"الركاب: {state.passenger_count} | الخطوط: {len(state.routes)} | السيارات: {state.vehicle_count} | "
+            f"التكلفة: {state.total_cost:.2f} جنيه | بدون خط سير: {len(state.without_route)}")
+        if not route_code:
+            return
+        summary = state.route_summary(route_code)
+        item = self.route_items.get(route_code)
+        if summary is None:
+            if item is not None:
+                self.route_summary_list.takeItem(self.route_summary_list.row(self.route_items.pop(route_code)))
+            return
+        passengers, capacity, vehicles, cost = summary
+        if item is None:
+            item = self.route_items[route_code] = QListWidgetItem()
+            self.route_summary_list.addItem(item)
+        item.setText(f"{route_code}: {passengers} راكب / سعة {capacity or '-'} ← {vehicles} سيارة، {cost:.2f} جنيه")
+        item.setToolTip("\n".join(f"{station}: {count}"
+                                  for station, count in state.routes[route_code].station_counts.items()))
+
     def get_selected_employees(self):
         return [self.selected_employees.item(i).text() 
                 for i in range(self.selected_employees.count())]
@@ -217,79 +378,217 @@ class EmployeeAttendanceDialog(QDialog):
             QMessageBox.warning(self, "تحذير", "يرجى اختيار موظف واحد على الأقل")
             return
 
-        # Generate report data
-        report_data = {}
-        total_cost = 0
-        
-        # قائمة لتتبع خطوط السير المستخدمة لتجنب التكرار
-        used_routes = set()
-        
-        for emp_name in selected_employees:
-            employee = session.query(Employee).filter(Employee.employee_name == emp_name).first()
-            if employee:
-                route = session.query(Route).filter(Route.route_code == employee.route_code).first()
-                cost = session.query(RouteCost).filter(RouteCost.route_code == employee.route_code).first()
-                
-                if route and cost:
-                    if route.route_code not in report_data:
-                        report_data[route.route_code] = {
-                            'vehicle_type': route.vehicle_type,
-                            'stations': route.route_stations.split(','),
-                            'station_counts': {},
-                            'cost_5_days': float(cost.cost_5_days),
-                            'vehicle_capacity': int(cost.vehicle_capacity)
-                        }
-                        # إضافة التكلفة مرة واحدة فقط لكل خط سير
-                        if route.route_code not in used_routes:
-                            total_cost += float(cost.cost_5_days)
-                            used_routes.add(route.route_code)
-                    
-                    station = employee.station
-                    report_data[route.route_code]['station_counts'][station] = \
-                        report_data[route.route_code]['station_counts'].get(station, 0) + 1
-
-        # Prepare data for Excel
-        excel_data = []
-        for route_code, data in report_data.items():
-            for station in data['stations']:
-                count = data['station_counts'].get(station, 0)
-                excel_data.append({
-                    'خط السير': route_code,
-                    'نوع المركبة': data['vehicle_type'],
-                    'المحطة': station,
-                    'عدد الركاب': count,
-                    'تكلفة السيارة (5 أيام)': data['cost_5_days']
-                })
-        excel_data.append({'خط السير': 'الإجمالي', 'تكلفة السيارة (5 أيام)': total_cost})
-
-        # Convert to DataFrame
-        df = pd.DataFrame(excel_data)
+        report_date = self.date_input.date().toString("yyyy-MM-dd")
+        if self.live_state is not None:
+            # التقرير جاهز في الحالة الحية؛ الخيط الخلفي يحفظ الحضور فقط
+            report = self.live_state.to_report(report_date)
+            self.run_task(BackgroundTask(save_attendance_report, report), "جاري حفظ التقرير...", self.show_report)
+            return
+        # حساب التقرير في خيط خلفي حتى تبقى النافذة مستجيبة
+        self.run_task(BackgroundTask(compute_attendance_report, selected_employees, report_date),
+                      "جاري إعداد التقرير...", self.show_report)
+
+    def run_task(self, task, label, on_finished):
+        """تشغيل مهمة خلفية مع نافذة تقدم قابلة للإلغاء"""
+        self.generate_button.setEnabled(False)
+        self.progress_dialog = QProgressDialog(label, "إلغاء", 0, 0, self)
+        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setMinimumDuration(300)
+        # استدعاء مباشر (lambda) لأن الخيط الخلفي مشغول ولن يعالج إشارات مؤجلة
+        self.progress_dialog.canceled.connect(lambda: task.cancel())
+        task.progress.connect(self.update_progress)
+        task.finished.connect(on_finished)
+        task.failed.connect(self.task_failed)
+        task.cancelled.connect(self.task_cancelled)
+        self.task = task
+        self.task_thread = start_background_task(self, task)
+
+    def update_progress(self, done, total):
+        self.progress_dialog.setMaximum(total)
+        self.progress_dialog.setValue(done)
+
+    def finish_task(self):
+        self.progress_dialog.reset()
+        self.generate_button.setEnabled(True)
+        self.task = None
+
+    def task_failed(self, message):
+        self.finish_task()
+        QMessageBox.critical(self, "خطأ", f"خطأ أثناء إعداد التقرير: {message}")
+
+    def task_cancelled(self):
+        self.finish_task()
+        QMessageBox.warning(self, "تحذير", "تم إلغاء العملية")
+
+    def show_report(self, report):
+        self.finish_task()
 
         # Show report summary
         report_text = "تقرير النقل اليومي\n================\n\n"
-        for route_code, data in report_data.items():
-            report_text += f"خط السير: {route_code}\nنوع المركبة: {data['vehicle_type']}\n"
+        for route in report.routes.values():
+            report_text += f"خط السير: {route.route_code}\nنوع المركبة: {route.vehicle_type}\n"
             report_text += "المحطات وعدد الركاب:\n"
-            for station in data['stations']:
-                count = data['station_counts'].get(station, 0)
+            for station, count in route.station_rows():
                 report_text += f"  - {station}: {count} راكب\n"
-            report_text += f"تكلفة السيارة (5 أيام): {data['cost_5_days']} جنيه\n----------------\n"
-        report_text += f"الإجمالي الكلي للتكلفة اليومية: {total_cost:.2f} جنيه\n"
+            report_text += f"عدد السيارات: {route.vehicles} (سعة السيارة: {route.vehicle_capacity})\n"
+            report_text += f"تكلفة السيارة (5 أيام): {route.cost_5_days} جنيه\n----------------\n"
+        report_text += f"الإجمالي الكلي للتكلفة اليومية: {report.total_cost:.2f} جنيه\n"
+        for suggestion in report.merge_suggestions:
+            report_text += (f"اقتراح: نقل {suggestion.passengers} راكب من خط {suggestion.route_code} "
+                            f"إلى خط {suggestion.into_route_code} يوفر {suggestion.saving:.2f} جنيه\n")
         QMessageBox.information(self, "التقرير", report_text)
         
         # Ask to save as Excel
         save = QMessageBox.question(self, "حفظ التقرير", 
-                                  "هل تريد حفظ التقرير كملف Excel؟",
+                                  "هل تريد حفظ التقرير في ملف (Excel أو CSV أو Parquet)؟",
                                   QMessageBox.Yes | QMessageBox.No)
         
         if save == QMessageBox.Yes:
-            file_name, _ = QFileDialog.getSaveFileName(self, "حفظ التقرير", "", "Excel Files (*.xlsx)")
+            file_name, selected_filter = QFileDialog.getSaveFileName(
+                self, "حفظ التقرير", "", "Excel Files (*.xlsx);;CSV Files (*.csv);;Parquet Files (*.parquet)")
             if file_name:
-                df.to_excel(file_name, index=False, engine='openpyxl')
-                QMessageBox.information(self, "نجاح", "تم حفظ التقرير بنجاح كملف Excel")
+                if not os.path.splitext(file_name)[1]:
+                    file_name += selected_filter[selected_filter.index('*') + 1:-1]
+                self.run_task(BackgroundTask(export_report, report, file_name),
+                              "جاري حفظ التقرير...", self.report_saved)
+                return
         
         self.accept()
-    
+
+    def report_saved(self, file_name):
+        self.finish_task()
+        QMessageBox.information(self, "نجاح", f"تم حفظ التقرير بنجاح في {file_name}")
+        self.accept()
+
+    def reject(self):
+        """إلغاء أي مهمة خلفية جارية وانتظار انتهائها قبل إغلاق النافذة"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task_thread.quit()
+            self.task_thread.wait()
+        super().reject()
+
+
+def compute_attendance_report(report_progress, employee_names, report_date=None):
+    """
+    تُنفذ داخل الخيط الخلفي بجلسة خاصة بها (لا تستخدم الجلسة العامة session).
+    يُحفظ حضور اليوم وملخصاته بعد بناء التقرير.
+    """
+    client = service_client()
+    if client is not None:
+        # وضع العميل: الخدمة تبني التقرير وتحفظه (بدون تقدم تدريجي)
+        with track_action('report', employees=len(employee_names), service=client.base_url):
+            return client.build_report(report_date or date.today().isoformat(), employee_names, save=True)
+    db = SessionLocal()
+    try:
+        with track_action('report', employees=len(employee_names)):
+            report = build_transport_report(db, report_date or date.today().isoformat(), employee_names,
+                                            progress_callback=report_progress)
+            save_daily_attendance(db, report)
+        logging.info(f"ذاكرة خطوط السير المؤقتة: {reference_cache.stats()}")
+        return report
+    finally:
+        db.close()
+
+
+def save_attendance_report(report_progress, report):
+    """حفظ حضور تقرير مبني من الحالة الحية وملخصاته (في الخيط الخلفي بجلسة خاصة)."""
+    db = SessionLocal()
+    try:
+        with track_action('report save', employees=len(report.employees)):
+            save_daily_attendance(db, report)
+        return report
+    finally:
+        db.close()
+
+
+def export_report(report_progress, report, file_name):
+    """تصدير التقرير حسب امتداد الملف (Excel متعدد الأوراق أو CSV أو Parquet) دون بناء جدول في الذاكرة."""
+    with track_action('export', file=os.path.basename(file_name)):
+        return export_reports([report], file_name, progress_callback=report_progress)
+
+
+class BackgroundTask(QObject):
+    """
+    تشغيل دالة في خيط خلفي. تستقبل الدالة report_progress(done, total) كأول معامل،
+    وتعيد report_progress القيمة False بعد طلب الإلغاء.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def report_progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self._cancelled
+
+    def run(self):
+        try:
+            result = self.function(self.report_progress, *self.args)
+        except InterruptedError:
+            self.cancelled.emit()
+        except Exception as e:
+            logging.error(f"خطأ في المهمة الخلفية: {str(e)}")
+            self.failed.emit(str(e))
+        else:
+            if self._cancelled:
+                self.cancelled.emit()
+            else:
+                self.finished.emit(result)
+
+
+def start_background_task(parent, task):
+    """نقل المهمة إلى QThread جديد وتشغيلها؛ يتوقف الخيط تلقائياً عند انتهاء المهمة."""
+    thread = QThread(parent)
+    task.moveToThread(thread)
+    thread.started.connect(task.run)
+    task.finished.connect(thread.quit)
+    task.failed.connect(thread.quit)
+    task.cancelled.connect(thread.quit)
+    thread.start()
+    return thread
+
+
+class DiagnosticsDialog(QDialog):
+    """عرض آخر الإجراءات المقاسة: عدد استعلامات SQL وزمنها والزمن الكلي."""
+
+    COLUMNS = ("الإجراء", "الاستعلامات", "زمن SQL (ms)", "الزمن الكلي (ms)", "التفاصيل")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("التشخيص")
+        self.resize(700, 400)
+        layout = QVBoxLayout()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        refresh_button = QPushButton("تحديث")
+        refresh_button.clicked.connect(self.refresh)
+        layout.addWidget(refresh_button)
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        actions = list(reversed(recent_actions))  # الأحدث أولاً
+        self.table.setRowCount(len(actions))
+        for row, action in enumerate(actions):
+            values = (action.name, action.statements, f"{action.sql_seconds * 1000:.1f}",
+                      f"{action.wall_seconds * 1000:.1f}",
+                      ", ".join(f"{key}={value}" for key, value in action.details.items()))
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(str(value)))
+        self.table.resizeColumnsToContents()
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -301,8 +600,6 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
 
-        self.inspector = inspect(engine)
-        self.table_names = self.inspector.get_table_names()
         self.model_mapping = {
             'employees': Employee,
             'routes': Route,
@@ -321,7 +618,29 @@ class MainWindow(QMainWindow):
         table_selection_layout.addWidget(self.table_combo)
         self.layout.addLayout(table_selection_layout)
 
-        self.data_table = QTableWidget()
+        # تصفية عمود داخل قاعدة البيانات
+        filter_layout = QHBoxLayout()
+        self.filter_column_combo = QComboBox()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("تصفية...")
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_input.textChanged.connect(self.filter_timer.start)
+        self.filter_column_combo.currentIndexChanged.connect(self.filter_timer.start)
+        filter_layout.addWidget(QLabel("تصفية حسب:"))
+        filter_layout.addWidget(self.filter_column_combo)
+        filter_layout.addWidget(self.filter_input)
+        self.layout.addLayout(filter_layout)
+
+        # عرض الجدول عبر نموذج يجلب الصفوف صفحةً صفحة عند التمرير
+        self.table_model = None
+        self.data_table = QTableView()
+        self.data_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.data_table.setSelectionMode(QAbstractItemView.ExtendedSelection)  # تحديد عدة صفوف للعمليات الجماعية
+        self.data_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.data_table.setSortingEnabled(True)
         self.layout.addWidget(self.data_table)
 
         buttons_layout = QHBoxLayout()
@@ -331,16 +650,51 @@ class MainWindow(QMainWindow):
         self.edit_data_button.clicked.connect(self.edit_data)
         self.report_button = QPushButton("إصدار تقرير الحضور")
         self.report_button.clicked.connect(self.generate_attendance_report)
+        self.bulk_edit_button = QPushButton("تعديل المحدد")
+        self.bulk_edit_button.clicked.connect(self.bulk_edit)
+        self.delete_button = QPushButton("حذف المحدد")
+        self.delete_button.clicked.connect(self.delete_selected)
+        self.paste_button = QPushButton("لصق صفوف")
+        self.paste_button.clicked.connect(self.paste_rows)
+        QShortcut(QKeySequence.Delete, self.data_table, self.delete_selected)
+        QShortcut(QKeySequence.Paste, self.data_table, self.paste_rows)
+        self.import_button = QPushButton("استيراد من Excel")
+        self.import_button.clicked.connect(self.import_from_excel)
         self.close_button = QPushButton("إغلاق")# زر الإغلاق الجديد
         self.close_button.clicked.connect(self.close_application)
         buttons_layout.addWidget(self.add_data_button)
         buttons_layout.addWidget(self.edit_data_button)
+        buttons_layout.addWidget(self.bulk_edit_button)
+        buttons_layout.addWidget(self.delete_button)
+        buttons_layout.addWidget(self.paste_button)
         buttons_layout.addWidget(self.report_button)
+        buttons_layout.addWidget(self.import_button)
         buttons_layout.addWidget(self.close_button)  # إضافة الزر إلى التخطيط
+        if DIAGNOSTICS_ENABLED:
+            self.diagnostics_button = QPushButton("التشخيص")
+            self.diagnostics_button.clicked.connect(self.show_diagnostics)
+            buttons_layout.addWidget(self.diagnostics_button)
         self.layout.addLayout(buttons_layout)
 
+    def load_initial_data(self):
+        """ترحيل المخطط وتحميل أول صفحة من الجدول بعد ظهور النافذة."""
+        from effective_history import apply_due_changes
+        from migrations import migrate
+        try:
+            migrate(engine)  # تحديث مخطط قاعدة البيانات الموجودة إن لزم
+            # تطبيق تغييرات الأسعار وخطوط السير المسجلة بتاريخ مستقبلي إذا حل موعدها
+            apply_due_changes(session)
+            session.commit()
+        except Exception as e:
+            logging.error(f"خطأ أثناء ترحيل قاعدة البيانات: {str(e)}")
+            QMessageBox.critical(self, "خطأ", f"خطأ أثناء ترحيل قاعدة البيانات: {str(e)}")
         self.display_table_data(0)
-        
+        mark_startup("first table page")
+        logging.info("زمن التشغيل:\n" + startup_report())
+
+    def show_diagnostics(self):
+        DiagnosticsDialog(self).exec_()
+
     def close_application(self):
         """دالة لإغلاق التطبيق مع إغلاق جلسة قاعدة البيانات"""
         try:
@@ -354,32 +708,34 @@ class MainWindow(QMainWindow):
         if table_name in self.model_mapping:
             model = self.model_mapping[table_name]
             try:
-                data = session.query(model).all()
-                self.populate_table(data, model)
+                with track_action('table load', table=table_name):
+                    self.table_model = LazyTableModel(session, model, parent=self)
+                self.data_table.setModel(self.table_model)
+                self.data_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+                self.filter_column_combo.blockSignals(True)
+                self.filter_column_combo.clear()
+                self.filter_column_combo.addItems(self.table_model.columns)
+                self.filter_column_combo.blockSignals(False)
+                self.filter_input.blockSignals(True)
+                self.filter_input.clear()
+                self.filter_input.blockSignals(False)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error loading data: {e}")
                 session.rollback()
         else:
             QMessageBox.warning(self, "Warning", f"No SQLAlchemy model found for table: {table_name}")
 
-    def populate_table(self, data, model):
-        self.data_table.clear()
-        self.data_table.setRowCount(0)
-        self.data_table.setColumnCount(0)
-
-        if not data:
+    def apply_filter(self):
+        if self.table_model is None:
             return
-
-        columns = [column.key for column in model.__table__.columns]
-        self.data_table.setColumnCount(len(columns))
-        self.data_table.setHorizontalHeaderLabels(columns)
-
-        for row_index, record in enumerate(data):
-            self.data_table.insertRow(row_index)
-            for col_index, column_name in enumerate(columns):
-                value = getattr(record, column_name)
-                self.data_table.setItem(row_index, col_index, QTableWidgetItem(str(value)))
-        self.data_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        try:
+            with track_action('table filter', table=self.table_combo.currentText()):
+                self.table_model.filters.clear()
+                self.table_model.set_filter(self.filter_column_combo.currentText(),
+                                            self.filter_input.text().strip())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error loading data: {e}")
+            session.rollback()
 
     def add_data(self):
         table_name = self.table_combo.currentText()
@@ -388,37 +744,44 @@ class MainWindow(QMainWindow):
             data = dialog.get_data()
             if data:
                 try:
-                    if table_name == 'employees':
-                        new_employee = Employee(
-                            employee_name=data['employee_name'],
-                            department=data['department'],
-                            station=data['station'],
-                            route_code=data['route_code'],
-                        )
-                        session.add(new_employee)
-                    elif table_name == 'routes':
-                        new_route = Route(
-                            route_name=data['route_name'],
-                            route_code=data['route_code'],
-                            vehicle_type=data['vehicle_type'],
-                            contractor_name=data['contractor_name'],
-                            supervisor_name=data['supervisor_name'],
-                            route_stations=data['route_stations'],
-                        )
-                        session.add(new_route)
-                    elif table_name == 'route_costs':
-                        new_route_cost = RouteCost(
-                            route_code=data['route_code'],
-                            vehicle_capacity=data['vehicle_capacity'],
-                            cost_5_days=data['cost_5_days'],
-                            cost_4_days=data['cost_4_days'],
-                            cost_3_days=data['cost_3_days'],
-                        )
-                        session.add(new_route_cost)
-
-                    session.commit()
+                    with track_action('add data', table=table_name):
+                        if table_name == 'employees':
+                            new_record = Employee(
+                                employee_name=data['employee_name'],
+                                department=data['department'],
+                                station=data['station'],
+                                route_code=data['route_code'],
+                            )
+                            session.add(new_record)
+                        elif table_name == 'routes':
+                            new_record = Route(
+                                route_name=data['route_name'],
+                                route_code=data['route_code'],
+                                vehicle_type=data['vehicle_type'],
+                                contractor_name=data['contractor_name'],
+                                supervisor_name=data['supervisor_name'],
+                                route_stations=data['route_stations'],
+                            )
+                            session.add(new_record)
+                            session.flush()
+                            replace_route_stations(session, {new_record.route_code: new_record.route_stations})
+                        elif table_name == 'route_costs':
+                            new_record = RouteCost(
+                                route_code=data['route_code'],
+                                vehicle_capacity=data['vehicle_capacity'],
+                                cost_5_days=data['cost_5_days'],
+                                cost_4_days=data['cost_4_days'],
+                                cost_3_days=data['cost_3_days'],
+                            )
+                            session.add(new_record)
+
+                        session.flush()
+                        new_key = new_record.__mapper__.primary_key_from_instance(new_record)[0]
+                        session.commit()
+                        # إضافة الصف الجديد فقط في موضعه بدلاً من إعادة تحميل الجدول
+                        if self.table_model is not None:
+                            self.table_model.refresh_rows([new_key])
                     QMessageBox.information(self, "Success", "Data added successfully.")
-                    self.display_table_data(self.table_combo.currentIndex())
                 except Exception as e:
                     QMessageBox.critical(self, "Error", f"Error adding data: {e}")
                     session.rollback()
@@ -426,16 +789,16 @@ class MainWindow(QMainWindow):
 
     def edit_data(self):
         table_name = self.table_combo.currentText()
-        selected_row = self.data_table.currentRow()
+        selected_row = self.data_table.currentIndex().row()
         if selected_row == -1:
             QMessageBox.warning(self, "Warning", "Please select a row to edit.")
             return
 
         model = self.model_mapping[table_name]
         primary_key_column = model.__table__.primary_key.columns.values()[0].name
-        primary_key_value = self.data_table.item(selected_row, 0).text()
+        primary_key_value = self.table_model.primary_key_at(selected_row)
 
-        record_to_edit = session.query(model).filter(getattr(model, primary_key_column) == primary_key_value).first()
+        record_to_edit = session.get(model, primary_key_value)
 
         if not record_to_edit:
             QMessageBox.warning(self, "Warning", "Record to edit not found.")
@@ -451,27 +814,141 @@ class MainWindow(QMainWindow):
             edited_data = dialog.get_data()
             if edited_data:
                 try:
-                    for key, value in edited_data.items():
-                        setattr(record_to_edit, key, value)
-                    session.commit()
+                    with track_action('edit data', table=table_name):
+                        for key, value in edited_data.items():
+                            setattr(record_to_edit, key, value)
+                        if table_name == 'routes':
+                            # محطات الرمز القديم تُحذف إذا تغير رمز خط السير
+                            session.flush()
+                            replace_route_stations(session, {primary_key_value: '',
+                                                             record_to_edit.route_code: record_to_edit.route_stations})
+                        new_key = getattr(record_to_edit, primary_key_column)
+                        session.commit()
+                        # تحديث الصف المعدل فقط (الرمز القديم يُحذف من العرض إذا تغير المفتاح)
+                        self.table_model.refresh_rows([primary_key_value, new_key])
                     QMessageBox.information(self, "Success", "Data edited successfully.")
-                    self.display_table_data(self.table_combo.currentIndex())
                 except Exception as e:
                     QMessageBox.critical(self, "Error", f"Error editing data: {e}")
                     session.rollback()
         dialog.deleteLater()
 
+    def selected_keys(self):
+        """المفاتيح الأساسية للصفوف المحددة بترتيب ظهورها."""
+        if self.table_model is None:
+            return []
+        rows = sorted({index.row() for index in self.data_table.selectionModel().selectedRows()})
+        return [self.table_model.primary_key_at(row) for row in rows]
+
+    def run_bulk_operation(self, action, operation, success_message):
+        """تنفيذ عملية جماعية (معاملة واحدة) ثم تحديث صفوفها فقط في الجدول."""
+        table_name = self.table_combo.currentText()
+        try:
+            with track_action(action, table=table_name):
+                result = operation(self.model_mapping[table_name])
+                self.table_model.refresh_rows(result.keys)
+        except BulkValidationError as e:
+            QMessageBox.warning(self, "Warning", f"No changes were saved:\n{e}")
+            return
+        except Exception as e:
+            session.rollback()
+            QMessageBox.critical(self, "Error", f"Error saving data: {e}")
+            return
+        QMessageBox.information(self, "Success", success_message.format(rows=result.rows))
+
+    def bulk_edit(self):
+        keys = self.selected_keys()
+        if not keys:
+            QMessageBox.warning(self, "Warning", "Please select the rows to edit.")
+            return
+        dialog = BulkEditDialog(self.model_mapping[self.table_combo.currentText()], len(keys), self)
+        if dialog.exec_() == QDialog.Accepted:
+            column, value = dialog.get_data()
+            self.run_bulk_operation('bulk edit', lambda model: bulk_update(session, model, keys, column, value),
+                                    "{rows} rows updated.")
+        dialog.deleteLater()
+
+    def delete_selected(self):
+        keys = self.selected_keys()
+        if not keys:
+            QMessageBox.warning(self, "Warning", "Please select the rows to delete.")
+            return
+        answer = QMessageBox.question(self, "Confirm", f"Delete {len(keys)} selected rows?",
+                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if answer == QMessageBox.Yes:
+            self.run_bulk_operation('bulk delete', lambda model: bulk_delete(session, model, keys),
+                                    "{rows} rows deleted.")
+
+    def paste_rows(self):
+        """لصق صفوف منسوخة من Excel أو جدول (مفصولة بـ Tab) كصفوف جديدة في الجدول الحالي."""
+        if self.table_model is None:
+            return
+        text = QApplication.clipboard().text()
+        if not text.strip():
+            QMessageBox.warning(self, "Warning", "The clipboard is empty.")
+            return
+        self.run_bulk_operation('paste rows', lambda model: bulk_insert_rows(session, model, text),
+                                "{rows} rows added.")
+
     def generate_attendance_report(self):
         dialog = EmployeeAttendanceDialog(self)
         dialog.exec_()
         dialog.deleteLater()
 
+    def import_from_excel(self):
+        """استيراد ملف Excel كبير على دفعات مع عرض نافذة تقدم قابلة للإلغاء"""
+        from data_import import stream_import_from_excel
+
+        file_name, _ = QFileDialog.getOpenFileName(self, "استيراد من Excel", "", "Excel Files (*.xlsx)")
+        if not file_name:
+            return
+
+        progress = QProgressDialog("جاري استيراد البيانات...", "إلغاء", 0, 100, self)
+        progress.setWindowTitle("استيراد من Excel")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def report_progress(sheet_name, rows_done, rows_total):
+            if rows_total:
+                progress.setMaximum(rows_total)
+                progress.setValue(min(rows_done, rows_total))
+            progress.setLabelText(f"جاري استيراد {sheet_name}: {rows_done} صف")
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        try:
+            with track_action('import', file=os.path.basename(file_name)):
+                summary = stream_import_from_excel(file_name, progress_callback=report_progress,
+                                                   session_factory=SessionLocal)
+            progress.close()
+            lines = [f"{table}: {counts['imported']} صف مستورد، {counts['rejected']} صف مرفوض"
+                     for table, counts in summary.items()]
+            QMessageBox.information(self, "نجاح", "تم الاستيراد بنجاح\n" + "\n".join(lines))
+        except InterruptedError:
+            progress.close()
+            QMessageBox.warning(self, "تحذير", "تم إلغاء الاستيراد")
+        except Exception as e:
+            progress.close()
+            logging.error(f"خطأ أثناء الاستيراد: {str(e)}")
+            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الاستيراد: {str(e)}")
+        self.display_table_data(self.table_combo.currentIndex())
+
     def closeEvent(self, event):
         session.close()
         event.accept()
 
 if __name__ == "__main__":
+    # --startup-timing: طباعة زمن التشغيل حتى أول نافذة وأول صفحة بيانات ثم الخروج
+    timing_only = '--startup-timing' in sys.argv
     app = QApplication(sys.argv)
+    init_app()
     main_window = MainWindow()
     main_window.show()
+    app.processEvents()  # رسم النافذة قبل أي عمل على قاعدة البيانات
+    mark_startup("first window")
+    QTimer.singleShot(0, main_window.load_initial_data)
+    if timing_only:
+        def print_startup_report():
+            print(startup_report())
+            app.quit()
+        QTimer.singleShot(0, print_startup_report)
     sys.exit(app.exec_())
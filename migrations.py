@@ -0,0 +1,204 @@
+import argparse
+
+from sqlalchemy import create_engine, select, text
+from database_setup import Base, Employee, RouteStation, DATABASE_URL
+
+# رقم إصدار المخطط محفوظ في PRAGMA user_version داخل ملف قاعدة البيانات نفسه،
+# وكل ترحيل يُطبق مرة واحدة فقط وبالترتيب داخل معاملة خاصة به.
+
+
+def _create_base_tables(connection):
+    """الجداول الأصلية (لا يغير شيئاً في قاعدة موجودة)."""
+    for table_name in ('routes', 'route_costs', 'employees'):
+        Base.metadata.tables[table_name].create(bind=connection, checkfirst=True)
+
+
+def _add_hot_query_indexes(connection):
+    """فهارس الاستعلامات الأكثر استخداماً: البحث بالاسم، الربط بخط السير، التجميع حسب القسم."""
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_employees_employee_name ON employees (employee_name)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_employees_route_code ON employees (route_code)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_employees_department_route_code "
+        "ON employees (department, route_code)"))
+    connection.execute(text("ANALYZE"))
+
+
+def _create_attendance_tables(connection):
+    """جداول الحضور والتقارير اليومية والملخصات اليومية."""
+    for table_name in ('attendance_records', 'daily_reports', 'daily_route_summaries'):
+        Base.metadata.tables[table_name].create(bind=connection, checkfirst=True)
+
+
+def _create_route_stations(connection):
+    """جدول محطات خطوط السير وتعبئته من عمود route_stations، وتنظيف أسماء محطات الموظفين."""
+    from station_index import clean_station, rebuild_route_stations
+
+    Base.metadata.tables['route_stations'].create(bind=connection, checkfirst=True)
+    rebuild_route_stations(connection)
+    for (station,) in connection.execute(text("SELECT DISTINCT station FROM employees")).all():
+        if station is not None and clean_station(station) != station:
+            connection.execute(text("UPDATE employees SET station = :new WHERE station = :old"),
+                               {"new": clean_station(station), "old": station})
+
+
+# الجداول التي يُتتبع رقم إصدار بياناتها في data_versions
+VERSIONED_TABLES = ('employees', 'routes', 'route_costs')
+
+
+def _create_data_versions(connection):
+    """جدول أرقام إصدار البيانات وtriggers تزيد رقم الجدول مع كل إضافة أو تعديل أو حذف."""
+    Base.metadata.tables['data_versions'].create(bind=connection, checkfirst=True)
+    for table_name in VERSIONED_TABLES:
+        connection.execute(text("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (:name, 0)"),
+                           {"name": table_name})
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_{event.lower()}_version "
+                f"AFTER {event} ON {table_name} BEGIN "
+                f"UPDATE data_versions SET version = version + 1 WHERE table_name = '{table_name}'; END"))
+
+
+def _create_effective_history(connection):
+    """
+    جداول السجل بتاريخ سريان لأسعار الخطوط وخطوط سير الموظفين، تُعبأ بالقيم الحالية
+    سارية منذ البداية، وtriggers تسجل كل تغيير لاحق من أي مسار (نوافذ التعديل، العمليات
+    الجماعية، الاستيراد والمزامنة) ساريًا من يوم التغيير.
+    """
+    from effective_history import SINCE_ALWAYS
+
+    for table_name in ('route_cost_history', 'employee_route_history'):
+        Base.metadata.tables[table_name].create(bind=connection, checkfirst=True)
+    since = SINCE_ALWAYS.isoformat()
+    cost_columns = "vehicle_capacity, cost_5_days, cost_4_days, cost_3_days"
+    new_costs = "NEW.vehicle_capacity, NEW.cost_5_days, NEW.cost_4_days, NEW.cost_3_days"
+    today = "date('now', 'localtime')"
+    statements = [
+        f"INSERT OR IGNORE INTO route_cost_history (route_code, effective_from, {cost_columns}) "
+        f"SELECT route_code, '{since}', {cost_columns} FROM route_costs",
+        f"INSERT OR IGNORE INTO employee_route_history (employee_id, effective_from, route_code) "
+        f"SELECT employee_id, '{since}', route_code FROM employees",
+
+        # صف جديد: قيمته سارية منذ البداية حتى تظهر في التقارير القديمة بعد أول استيراد
+        f"CREATE TRIGGER IF NOT EXISTS trg_route_costs_insert_history AFTER INSERT ON route_costs BEGIN "
+        f"INSERT OR REPLACE INTO route_cost_history (route_code, effective_from, {cost_columns}) "
+        f"VALUES (NEW.route_code, '{since}', {new_costs}); END",
+        # تعديل: يُسجل من اليوم فقط إذا اختلف عن السعر الساري اليوم في السجل
+        f"CREATE TRIGGER IF NOT EXISTS trg_route_costs_update_history "
+        f"AFTER UPDATE OF {cost_columns} ON route_costs "
+        f"WHEN NOT EXISTS (SELECT 1 FROM route_cost_history AS h WHERE h.route_code = NEW.route_code "
+        f"AND h.effective_from = (SELECT max(effective_from) FROM route_cost_history "
+        f"WHERE route_code = NEW.route_code AND effective_from <= {today}) "
+        f"AND h.vehicle_capacity IS NEW.vehicle_capacity AND h.cost_5_days IS NEW.cost_5_days "
+        f"AND h.cost_4_days IS NEW.cost_4_days AND h.cost_3_days IS NEW.cost_3_days) BEGIN "
+        f"INSERT OR REPLACE INTO route_cost_history (route_code, effective_from, {cost_columns}) "
+        f"VALUES (NEW.route_code, {today}, {new_costs}); END",
+        "CREATE TRIGGER IF NOT EXISTS trg_route_costs_rename_history AFTER UPDATE OF route_code ON route_costs "
+        "WHEN NEW.route_code IS NOT OLD.route_code BEGIN "
+        "UPDATE OR REPLACE route_cost_history SET route_code = NEW.route_code WHERE route_code = OLD.route_code; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_route_costs_delete_history AFTER DELETE ON route_costs BEGIN "
+        "DELETE FROM route_cost_history WHERE route_code = OLD.route_code; END",
+
+        f"CREATE TRIGGER IF NOT EXISTS trg_employees_insert_history AFTER INSERT ON employees BEGIN "
+        f"INSERT OR REPLACE INTO employee_route_history (employee_id, effective_from, route_code) "
+        f"VALUES (NEW.employee_id, '{since}', NEW.route_code); END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_employees_update_history AFTER UPDATE OF route_code ON employees "
+        f"WHEN NOT EXISTS (SELECT 1 FROM employee_route_history AS h WHERE h.employee_id = NEW.employee_id "
+        f"AND h.effective_from = (SELECT max(effective_from) FROM employee_route_history "
+        f"WHERE employee_id = NEW.employee_id AND effective_from <= {today}) "
+        f"AND h.route_code IS NEW.route_code) BEGIN "
+        f"INSERT OR REPLACE INTO employee_route_history (employee_id, effective_from, route_code) "
+        f"VALUES (NEW.employee_id, {today}, NEW.route_code); END",
+        # رقم الموظف المحذوف قد يُعاد استخدامه لموظف جديد فلا يرث سجله
+        "CREATE TRIGGER IF NOT EXISTS trg_employees_delete_history AFTER DELETE ON employees BEGIN "
+        "DELETE FROM employee_route_history WHERE employee_id = OLD.employee_id; END",
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def _recount_daily_report_routes(connection):
+    """
+    route_count في التقارير اليومية المحفوظة هو عدد الخطوط؛ بعض التقارير حفظت عدد السيارات
+    فيه، فيُعاد عدّه من الملخصات اليومية (خط لكل ملخص فيه ركاب).
+    """
+    connection.execute(text(
+        "UPDATE daily_reports SET route_count = (SELECT count(DISTINCT route_code) FROM daily_route_summaries "
+        "WHERE summary_date = daily_reports.report_date) "
+        "WHERE EXISTS (SELECT 1 FROM daily_route_summaries WHERE summary_date = daily_reports.report_date)"))
+
+
+# (الإصدار، الوصف، الدالة) — تُضاف الترحيلات الجديدة في النهاية فقط برقم أكبر
+MIGRATIONS = [
+    (1, "create base tables", _create_base_tables),
+    (2, "indexes for name lookup, route join and department grouping", _add_hot_query_indexes),
+    (3, "attendance records, daily reports and daily rollups", _create_attendance_tables),
+    (4, "ordered route stations with a station name index", _create_route_stations),
+    (5, "data version counters maintained by triggers", _create_data_versions),
+    (6, "effective-dated route cost and employee route history", _create_effective_history),
+    (7, "daily report route counts recounted from daily rollups", _recount_daily_report_routes),
+]
+
+
+def current_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrate(engine, verbose=False):
+    """
+    تطبيق الترحيلات التي لم تُطبق بعد على قاعدة البيانات.
+
+    Returns:
+        int: إصدار المخطط بعد الترحيل.
+    """
+    with engine.connect() as connection:
+        version = current_version(connection)
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            apply(connection)
+            connection.execute(text(f"PRAGMA user_version = {int(number)}"))
+        version = number
+        if verbose:
+            print(f"Applied migration {number}: {description}")
+    return version
+
+
+def hot_queries():
+    """الاستعلامات الأكثر تنفيذاً في التقارير والواجهة، لفحص خطة تنفيذها."""
+    from attendance_store import department_cost_summary_query
+    from report_engine import employee_details_query
+
+    return {
+        "employee by name": select(Employee).where(Employee.employee_name == 'x'),
+        "report batch (names IN ..., routes as of the report date)": employee_details_query(
+            ['x', 'y', 'z'], as_of='2025-04-01'),
+        "employees on a route": select(Employee).where(Employee.route_code == 'x'),
+        "routes serving a station": select(RouteStation.route_code).where(RouteStation.station_name == 'x'),
+        "monthly cost from daily rollups": department_cost_summary_query('2025-04-01', '2025-04-30'),
+    }
+
+
+def explain_hot_queries(engine):
+    """طباعة EXPLAIN QUERY PLAN لكل استعلام مهم للتأكد من عدم قراءة الجداول كاملة."""
+    with engine.connect() as connection:
+        for name, query in hot_queries().items():
+            sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            print(f"\n-- {name}")
+            for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+                print(f"   {row[-1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations to a transport database.")
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    parser.add_argument('--explain', action='store_true',
+                        help="print EXPLAIN QUERY PLAN for the hot queries after migrating")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    print(f"Schema version: {migrate(engine, verbose=True)}")
+    if args.explain:
+        explain_hot_queries(engine)
@@ -0,0 +1,164 @@
+import threading
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from attendance_store import as_date
+from database_setup import Route, RouteCost, RouteCostHistory, RouteStation
+
+# الجداول المرجعية: أي كتابة عليها داخل جلسة تُبطل الذاكرة المؤقتة عند تثبيت الجلسة
+REFERENCE_TABLES = frozenset(model.__tablename__ for model in (Route, RouteCost, RouteStation, RouteCostHistory))
+_DIRTY_FLAG = 'reference_data_changed'
+# عدد التواريخ التي تُحفظ أسعارها المحسوبة لكل قاعدة بيانات (شهر من إعادة الحساب وأكثر)
+MAX_DATED_ENTRIES = 64
+
+
+@dataclass(frozen=True)
+class RouteReference:
+    """بيانات خط سير وتكلفته ومحطاته كما تُقرأ من الذاكرة المؤقتة."""
+    route_code: str
+    route_name: str = None
+    vehicle_type: str = None
+    contractor_name: str = None
+    supervisor_name: str = None
+    vehicle_capacity: int = None
+    cost_5_days: float = None
+    cost_4_days: float = None
+    cost_3_days: float = None
+    stations: tuple = ()
+
+
+class ReferenceCache:
+    """
+    ذاكرة مؤقتة للقراءة (read-through) لخطوط السير وتكاليفها ومحطاتها، مفهرسة بـ route_code.
+
+    تُحمّل الجداول كاملة مع سجل الأسعار عند أول طلب (هي صغيرة ونادراً ما تتغير)، وتُبطل
+    تلقائياً بعد تثبيت أي جلسة كتبت على أحدها. تُحفظ نسخة لكل قاعدة بيانات (حسب
+    رابط الاتصال)، والتحميل آمن بين الخيوط.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dated = {}
+        self._generation = 0
+        self.hits = 0    # طلبات خُدمت من الذاكرة
+        self.misses = 0  # طلبات احتاجت تحميل الجداول من قاعدة البيانات
+
+    def routes(self, db, as_of=None):
+        """
+        Returns: قاموس {route_code: RouteReference} لقاعدة بيانات الجلسة db، بالأسعار
+        الحالية أو بالأسعار السارية في التاريخ as_of (من فهرس سجل الأسعار).
+        """
+        key = str(db.get_bind().url)
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+            if entry is not None:
+                self.hits += 1
+        if entry is None:
+            entry = self._load(db)
+            with self._lock:
+                self.misses += 1
+                # لا تُحفظ النتيجة إذا أُبطلت الذاكرة أثناء التحميل
+                if generation == self._generation:
+                    self._entries[key] = entry
+        routes, history = entry
+        if as_of is None:
+            return routes
+        from effective_history import routes_as_of
+        as_of = as_date(as_of)
+        with self._lock:
+            dated = self._dated.get((key, as_of))
+        if dated is None:
+            dated = routes_as_of(routes, history, as_of)
+            with self._lock:
+                if generation == self._generation:
+                    if len(self._dated) >= MAX_DATED_ENTRIES:
+                        self._dated.clear()
+                    self._dated[(key, as_of)] = dated
+        return dated
+
+    def lookup_many(self, db, route_codes, as_of=None):
+        """Returns: قاموس {route_code: RouteReference} للرموز الموجودة فقط."""
+        routes = self.routes(db, as_of)
+        return {code: routes[code] for code in route_codes if code in routes}
+
+    def lookup(self, db, route_code, as_of=None):
+        return self.lookup_many(db, [route_code], as_of).get(route_code)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._dated.clear()
+            self._generation += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    @staticmethod
+    def _load(db):
+        """Returns: (قاموس الخطوط بالأسعار الحالية، فهرس سجل الأسعار AsOfIndex)."""
+        from effective_history import COST_FIELDS, AsOfIndex
+
+        stations = {}
+        query = select(RouteStation.route_code, RouteStation.station_name).order_by(
+            RouteStation.route_code, RouteStation.position)
+        for route_code, station in db.execute(query):
+            stations.setdefault(route_code, []).append(station)
+
+        # سجل الأسعار يُقرأ في نفس استعلام الخطوط: صف لكل تغيير سعر، فلا يزيد عدد الاستعلامات
+        history_columns = [getattr(RouteCostHistory, name).label(f"history_{name}") for name in COST_FIELDS]
+        query = (select(Route.route_code, Route.route_name, Route.vehicle_type, Route.contractor_name,
+                        Route.supervisor_name, RouteCost.vehicle_capacity, RouteCost.cost_5_days,
+                        RouteCost.cost_4_days, RouteCost.cost_3_days,
+                        RouteCostHistory.effective_from, *history_columns)
+                 .outerjoin(RouteCost, Route.route_code == RouteCost.route_code)
+                 .outerjoin(RouteCostHistory, Route.route_code == RouteCostHistory.route_code))
+        routes = {}
+        history = AsOfIndex()
+        reference_fields = len(RouteReference.__dataclass_fields__) - 1  # بدون stations
+        for row in db.execute(query):
+            if row.route_code not in routes:
+                routes[row.route_code] = RouteReference(
+                    *row[:reference_fields], stations=tuple(stations.get(row.route_code, ())))
+            if row.effective_from is not None:
+                history.add(row.route_code, row.effective_from, tuple(row[reference_fields + 1:]))
+        return routes, history
+
+
+# الذاكرة المشتركة لكل التقارير في العملية
+reference_cache = ReferenceCache()
+
+
+def _touches_reference_tables(objects):
+    return any(getattr(obj, '__tablename__', None) in REFERENCE_TABLES for obj in objects)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_orm_changes(session, flush_context):
+    # الإضافة والتعديل والحذف عبر كائنات ORM (نوافذ الإدخال والتعديل)
+    if _touches_reference_tables([*session.new, *session.dirty, *session.deleted]):
+        session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_bulk_changes(orm_execute_state):
+    # insert/update/delete المباشرة عبر session.execute (الاستيراد والمزامنة وجدول المحطات)
+    state = orm_execute_state
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if getattr(table, 'name', None) in REFERENCE_TABLES:
+            state.session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        reference_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_DIRTY_FLAG, None)
@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from database_setup import Employee
+from effective_history import employee_route_as_of
+from reference_cache import reference_cache
+from station_index import clean_station
+from vehicle_allocation import allocate
+
+# عدد الأسماء في كل استعلام IN (أقل من حد المتغيرات في إصدارات SQLite القديمة)
+NAME_BATCH_SIZE = 900
+
+
+@dataclass
+class RouteReport:
+    """بيانات خط سير واحد في تقرير النقل اليومي."""
+    route_code: str
+    route_name: str = None
+    vehicle_type: str = None
+    contractor_name: str = None
+    supervisor_name: str = None
+    stations: list = field(default_factory=list)
+    vehicle_capacity: int = None
+    cost_5_days: float = 0.0
+    cost_4_days: float = None
+    cost_3_days: float = None
+    passengers: list = field(default_factory=list)
+    station_counts: dict = field(default_factory=dict)
+    vehicles: int = 1
+
+    @property
+    def cost(self):
+        return (self.cost_5_days or 0) * self.vehicles
+
+    def station_rows(self):
+        """(المحطة، عدد الركاب) بترتيب محطات الخط، ثم أي محطات للركاب غير مسجلة في الخط."""
+        for station in self.stations:
+            yield station, self.station_counts.get(station, 0)
+        listed = set(self.stations)
+        for station, count in self.station_counts.items():
+            if station not in listed:
+                yield station, count
+
+
+@dataclass
+class TransportReport:
+    """نتيجة تقرير النقل ليوم واحد، تعرضها الواجهة وسطر الأوامر كل بطريقته."""
+    date: str
+    routes: dict = field(default_factory=dict)
+    department_counts: dict = field(default_factory=dict)
+    employees: list = field(default_factory=list)
+    without_route: list = field(default_factory=list)
+    missing_names: list = field(default_factory=list)
+    merge_suggestions: list = field(default_factory=list)
+
+    @property
+    def total_cost(self):
+        return sum(route.cost for route in self.routes.values())
+
+    @property
+    def total_passengers(self):
+        return sum(len(route.passengers) for route in self.routes.values())
+
+    @property
+    def vehicle_count(self):
+        return sum(route.vehicles for route in self.routes.values())
+
+
+def employee_details_query(names, as_of=None):
+    """
+    استعلام الموظفين لمجموعة أسماء (بيانات خطوط السير تُقرأ من الذاكرة المؤقتة).
+    مع as_of يكون route_code خط السير الساري في ذلك التاريخ من employee_route_history.
+    """
+    route_code = Employee.route_code if as_of is None else employee_route_as_of(as_of)
+    columns = (Employee.employee_id, Employee.employee_name, Employee.department, Employee.station,
+               route_code.label('route_code'))
+    return (select(*columns)
+            .where(Employee.employee_name.in_(names))
+            .order_by(Employee.employee_id))
+
+
+def fetch_employee_details(db, employee_names, batch_size=NAME_BATCH_SIZE, progress_callback=None, as_of=None):
+    """
+    جلب الموظفين في استعلام واحد لكل دفعة أسماء (بدلاً من استعلام لكل موظف).
+
+    progress_callback(done, total) تُستدعى بعد كل دفعة؛ إذا أعادت False يتم الإلغاء
+    برفع InterruptedError.
+
+    Returns:
+        dict: {اسم الموظف: صف بيانات} لأول موظف بكل اسم (أصغر employee_id).
+    """
+    names = list(dict.fromkeys(employee_names))
+    details = {}
+    for start in range(0, len(names), batch_size):
+        for row in db.execute(employee_details_query(names[start:start + batch_size], as_of)):
+            details.setdefault(row.employee_name, row)
+        done = min(start + batch_size, len(names))
+        if progress_callback and progress_callback(done, len(names)) is False:
+            raise InterruptedError("Report cancelled by user.")
+    return details
+
+
+def build_transport_report(db, date_str, employee_names, batch_size=NAME_BATCH_SIZE,
+                           progress_callback=None, cache=reference_cache):
+    """
+    بناء تقرير النقل اليومي لقائمة أسماء الحضور بعدد ثابت من الاستعلامات.
+    progress_callback كما في fetch_employee_details. بيانات خطوط السير وتكاليفها
+    ومحطاتها تُقرأ من cache ولا تُعاد قراءتها من قاعدة البيانات في كل تقرير.
+    خط سير كل موظف وسعر كل خط هما الساريان في date_str، فيبقى تقرير يوم قديم صحيحاً
+    بعد تغيير الأسعار أو نقل الموظفين.
+
+    Returns:
+        TransportReport
+    """
+    report = TransportReport(date=date_str)
+    details = fetch_employee_details(db, employee_names, batch_size, progress_callback, as_of=date_str)
+    routes = cache.routes(db, as_of=date_str)
+
+    for name in employee_names:
+        row = details.get(name)
+        if row is None:
+            report.missing_names.append(name)
+            continue
+        report.employees.append(row)
+        report.department_counts[row.department] = report.department_counts.get(row.department, 0) + 1
+        reference = routes.get(row.route_code)
+        if reference is None:
+            report.without_route.append(row.employee_name)
+            continue
+
+        route = report.routes.get(row.route_code)
+        if route is None:
+            route = report.routes[row.route_code] = RouteReport(
+                route_code=row.route_code,
+                route_name=reference.route_name,
+                vehicle_type=reference.vehicle_type,
+                contractor_name=reference.contractor_name,
+                supervisor_name=reference.supervisor_name,
+                stations=list(reference.stations),
+                vehicle_capacity=reference.vehicle_capacity,
+                cost_5_days=float(reference.cost_5_days or 0),
+                cost_4_days=reference.cost_4_days,
+                cost_3_days=reference.cost_3_days,
+            )
+        route.passengers.append(row.employee_name)
+        station = clean_station(row.station)
+        route.station_counts[station] = route.station_counts.get(station, 0) + 1
+
+    # عدد السيارات حسب السعة واقتراحات دمج الخطوط قليلة الركاب
+    return allocate(report)
+
+
+def render_report_text(report):
+    """نص التقرير لسطر الأوامر."""
+    lines = [f"\nTransport Report for Date: {report.date}", "\nAttendance Count by Department:"]
+    for department, count in report.department_counts.items():
+        lines.append(f"Department: {department}, Attendance Count: {count}")
+
+    lines.append("\nRequired Vehicles and Costs:")
+    for route in report.routes.values():
+        lines.append(f"  Route Name: {route.route_name}")
+        lines.append(f"    Vehicle Type: {route.vehicle_type}")
+        lines.append(f"    Contractor Name: {route.contractor_name}")
+        lines.append(f"    Supervisor Name: {route.supervisor_name}")
+        lines.append(f"    Route Stations: {','.join(route.stations)}")
+        lines.append(f"    Passengers: {', '.join(route.passengers)}")
+        lines.append(f"    Vehicle Capacity: {route.vehicle_capacity}")
+        lines.append(f"    Vehicles: {route.vehicles}")
+        lines.append(f"    Cost: {route.cost:.2f}")
+
+    for name in report.missing_names:
+        lines.append(f"Employee not found: {name}")
+    for name in report.without_route:
+        lines.append(f"Employee has no route: {name}")
+    for suggestion in report.merge_suggestions:
+        lines.append(f"Suggestion: move {suggestion.passengers} passengers of route {suggestion.route_code} "
+                     f"to route {suggestion.into_route_code} (saves {suggestion.saving:.2f})")
+
+    lines.append(f"\nTotal Expected Cost for Required Vehicles: {report.total_cost:.2f}\n")
+    return "\n".join(lines)
@@ -0,0 +1,155 @@
+import csv
+import os
+
+# أعمدة كل ورقة في ملف التصدير
+SUMMARY_COLUMNS = ('التاريخ', 'عدد الحضور', 'عدد الخطوط', 'عدد السيارات', 'عدد الركاب',
+                   'إجمالي التكلفة', 'أسماء غير موجودة', 'بدون خط سير')
+ROUTE_COLUMNS = ('التاريخ', 'خط السير', 'اسم الخط', 'نوع المركبة', 'المتعاقد', 'المشرف', 'عدد الركاب',
+                 'سعة السيارة', 'عدد السيارات', 'تكلفة السيارة (5 أيام)', 'التكلفة')
+STATION_COLUMNS = ('التاريخ', 'خط السير', 'نوع المركبة', 'المحطة', 'عدد الركاب', 'عدد السيارات',
+                   'تكلفة السيارة (5 أيام)')
+
+# (المفتاح، اسم الورقة، عناوين الأعمدة)
+SHEETS = (
+    ('summary', 'الملخص', SUMMARY_COLUMNS),
+    ('routes', 'خطوط السير', ROUTE_COLUMNS),
+    ('stations', 'المحطات', STATION_COLUMNS),
+)
+
+# عدد الصفوف في كل دفعة تُكتب إلى Parquet
+PARQUET_BATCH_SIZE = 10000
+
+
+def summary_rows(report):
+    yield (report.date, len(report.employees), len(report.routes), report.vehicle_count,
+           report.total_passengers, report.total_cost, len(report.missing_names), len(report.without_route))
+
+
+def route_rows(report):
+    for route in report.routes.values():
+        yield (report.date, route.route_code, route.route_name, route.vehicle_type, route.contractor_name,
+               route.supervisor_name, len(route.passengers), route.vehicle_capacity, route.vehicles,
+               route.cost_5_days, route.cost)
+
+
+def station_rows(report):
+    for route in report.routes.values():
+        for station, count in route.station_rows():
+            yield (report.date, route.route_code, route.vehicle_type, station, count, route.vehicles,
+                   route.cost_5_days)
+
+
+ROW_GENERATORS = {'summary': summary_rows, 'routes': route_rows, 'stations': station_rows}
+
+
+def _reports_with_progress(reports, progress_callback):
+    """تمرير التقارير واحداً واحداً مع استدعاء progress_callback(done, total) وإيقاف التصدير عند الإلغاء."""
+    total = len(reports) if hasattr(reports, '__len__') else None
+    for done, report in enumerate(reports, 1):
+        yield report
+        if progress_callback and progress_callback(done, total or done) is False:
+            raise InterruptedError("Export cancelled by user.")
+
+
+def write_xlsx(reports, path, progress_callback=None):
+    """
+    كتابة التقارير إلى ملف Excel بثلاث أوراق (الملخص، خطوط السير، المحطات).
+
+    يستخدم وضع الكتابة فقط في openpyxl: تُكتب الصفوف مباشرة إلى الملف أثناء
+    المرور على التقارير مرة واحدة، فلا تُبنى الأوراق في الذاكرة.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    sheets = {}
+    header_font = Font(bold=True)
+    header_fill = PatternFill('solid', fgColor='DDEBF7')
+    for key, title, columns in SHEETS:
+        sheet = workbook.create_sheet(title)
+        sheet.sheet_view.rightToLeft = True
+        sheet.freeze_panes = 'A2'
+        for index, column in enumerate(columns):
+            sheet.column_dimensions[get_column_letter(index + 1)].width = max(12, len(column) + 4)
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(sheet, value=column)
+            cell.font = header_font
+            cell.fill = header_fill
+            header.append(cell)
+        sheet.append(header)
+        sheets[key] = sheet
+
+    total_cost = 0.0
+    for report in _reports_with_progress(reports, progress_callback):
+        for key, sheet in sheets.items():
+            for row in ROW_GENERATORS[key](report):
+                sheet.append(row)
+        total_cost += report.total_cost
+
+    total = WriteOnlyCell(sheets['summary'], value='الإجمالي')
+    total.font = header_font
+    sheets['summary'].append([total, None, None, None, None, total_cost])
+    workbook.save(path)
+    return path
+
+
+def write_csv(reports, path, sheet='stations', progress_callback=None):
+    """كتابة جدول واحد (summary أو routes أو stations) إلى CSV بترميز utf-8-sig ليفتحه Excel بالعربية."""
+    columns = dict((key, columns) for key, _, columns in SHEETS)[sheet]
+    with open(path, 'w', newline='', encoding='utf-8-sig') as output:
+        writer = csv.writer(output)
+        writer.writerow(columns)
+        for report in _reports_with_progress(reports, progress_callback):
+            writer.writerows(ROW_GENERATORS[sheet](report))
+    return path
+
+
+def write_parquet(reports, path, sheet='stations', progress_callback=None, batch_size=PARQUET_BATCH_SIZE):
+    """
+    كتابة جدول واحد إلى Parquet على دفعات (يتطلب pyarrow، وهو اختياري).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow).")
+
+    columns = dict((key, columns) for key, _, columns in SHEETS)[sheet]
+    writer = None
+    batch = []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pydict({column: [row[index] for row in batch]
+                                      for index, column in enumerate(columns)})
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        batch.clear()
+
+    try:
+        for report in _reports_with_progress(reports, progress_callback):
+            for row in ROW_GENERATORS[sheet](report):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    flush()
+        if batch or writer is None:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+WRITERS = {'.xlsx': write_xlsx, '.csv': write_csv, '.parquet': write_parquet}
+
+
+def export_reports(reports, path, progress_callback=None):
+    """تصدير تقرير أو أكثر حسب امتداد الملف (.xlsx أو .csv أو .parquet)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Unsupported export format: {extension or path}")
+    return WRITERS[extension](reports, path, progress_callback=progress_callback)
@@ -0,0 +1,435 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+DATABASE_PATH = 'transport_management.db'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# عدد اتصالات قاعدة البيانات وعدد الخيوط التي تنفذ الطلبات
+DEFAULT_POOL_SIZE = 4
+# أقصى حجم لجسم الطلب (قائمة أسماء الحضور)
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# أقصى عدد نتائج للبحث عن موظف
+SEARCH_LIMIT = 50
+
+# عنوان الخدمة الذي يستخدمه تطبيق سطح المكتب كعميل (بدون قيمة يعمل على قاعدة البيانات مباشرة)
+SERVICE_URL_ENV = 'TRANSPORT_SERVICE_URL'
+
+EmployeeRow = namedtuple('EmployeeRow', 'employee_id employee_name department station route_code')
+
+
+class ServiceError(Exception):
+    """خطأ يُعاد للعميل برمز HTTP ورسالة."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def report_to_dict(report):
+    """تحويل TransportReport إلى قاموس JSON (عدد محطات كل خط كقائمة لأن المحطة قد تكون None)."""
+    return {
+        'date': report.date,
+        'routes': [{
+            'route_code': route.route_code,
+            'route_name': route.route_name,
+            'vehicle_type': route.vehicle_type,
+            'contractor_name': route.contractor_name,
+            'supervisor_name': route.supervisor_name,
+            'stations': route.stations,
+            'vehicle_capacity': route.vehicle_capacity,
+            'cost_5_days': route.cost_5_days,
+            'cost_4_days': route.cost_4_days,
+            'cost_3_days': route.cost_3_days,
+            'passengers': route.passengers,
+            'station_counts': list(route.station_counts.items()),
+            'vehicles': route.vehicles,
+        } for route in report.routes.values()],
+        'department_counts': list(report.department_counts.items()),
+        'employees': [list(EmployeeRow(*row)) for row in report.employees],
+        'without_route': report.without_route,
+        'missing_names': report.missing_names,
+        'merge_suggestions': [asdict(suggestion) for suggestion in report.merge_suggestions],
+        'total_cost': report.total_cost,
+        'vehicle_count': report.vehicle_count,
+    }
+
+
+def report_from_dict(data):
+    """إعادة بناء TransportReport من استجابة الخدمة حتى تعرضه الواجهة وتصدره كالتقرير المحلي."""
+    from report_engine import RouteReport, TransportReport
+    from vehicle_allocation import MergeSuggestion
+
+    routes = {}
+    for route in data['routes']:
+        route = dict(route, station_counts=dict(tuple(item) for item in route['station_counts']))
+        routes[route['route_code']] = RouteReport(**route)
+    return TransportReport(
+        date=data['date'],
+        routes=routes,
+        department_counts=dict(tuple(item) for item in data['department_counts']),
+        employees=[EmployeeRow(*row) for row in data['employees']],
+        without_route=data['without_route'],
+        missing_names=data['missing_names'],
+        merge_suggestions=[MergeSuggestion(**suggestion) for suggestion in data['merge_suggestions']],
+    )
+
+
+class ReportService:
+    """
+    تنفيذ طلبات الخدمة على مجموعة اتصالات مشتركة.
+
+    كل طلب يُنفذ في خيط من ThreadPoolExecutor بجلسة مستقلة من محرك بـ pool_size
+    اتصال. الطلبات المتطابقة المتزامنة (نفس التقرير أو نفس التحليل) تنتظر نتيجة
+    حساب واحد بدلاً من تكراره.
+    """
+
+    def __init__(self, database_url, pool_size=DEFAULT_POOL_SIZE):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from instrumentation import instrument_engine
+        from migrations import migrate
+
+        self.engine = instrument_engine(create_engine(
+            database_url, pool_size=pool_size, max_overflow=0, pool_pre_ping=False,
+            connect_args={'check_same_thread': False, 'timeout': 30}))
+        migrate(self.engine)  # جداول السجل بتاريخ سريان مطلوبة لبناء التقارير
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='report-service')
+        self._inflight = {}
+        self.requests = 0
+        self.computed = 0   # طلبات نُفذت فعلاً
+        self.coalesced = 0  # طلبات انتظرت نتيجة طلب مطابق قيد التنفيذ
+
+    async def run(self, key, function, *args):
+        """تنفيذ function(db, *args) في خيط، أو انتظار تنفيذ مطابق قيد التشغيل بنفس key."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        self.computed += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._call, key[0], function, args)
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _call(self, name, function, args):
+        from instrumentation import track_action
+        db = self.SessionLocal()
+        try:
+            with track_action(f"service {name}"):
+                self._check_external_changes(db)
+                return function(db, *args)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _check_external_changes(db):
+        """
+        إبطال ذاكرة خطوط السير إذا كتبت عملية أخرى (تطبيق سطح مكتب) على قاعدة البيانات.
+        PRAGMA data_version يتغير لكل اتصال عند تثبيت أي اتصال آخر لتغيير، فتُحفظ آخر قيمة
+        في بيانات الاتصال نفسه.
+        """
+        from reference_cache import reference_cache
+        connection = db.connection()
+        version = connection.exec_driver_sql('PRAGMA data_version').scalar()
+        previous = connection.info.get('data_version')
+        connection.info['data_version'] = version
+        if previous is not None and previous != version:
+            reference_cache.invalidate()
+
+    def stats(self):
+        from reference_cache import reference_cache
+        return {'requests': self.requests, 'computed': self.computed, 'coalesced': self.coalesced,
+                'in_flight': len(self._inflight), 'pool': self.engine.pool.status(),
+                'reference_cache': reference_cache.stats()}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.engine.dispose()
+
+    # ---------- الطلبات ----------
+
+    async def handle(self, method, path, query, body):
+        self.requests += 1
+        route = (method, path)
+        if route == ('GET', '/health'):
+            return {'status': 'ok'}
+        if route == ('GET', '/stats'):
+            return self.stats()
+        if route == ('GET', '/employees'):
+            text = query.get('q', '').strip()
+            try:
+                limit = min(int(query.get('limit', SEARCH_LIMIT)), SEARCH_LIMIT)
+            except ValueError:
+                raise ServiceError(400, "limit must be an integer.")
+            return await self.run(('employees', text, limit), _search_employees, text, limit)
+        if route == ('GET', '/employee-names'):
+            return await self.run(('employee-names',), _employee_names)
+        if route == ('POST', '/report'):
+            payload = _json_body(body)
+            report_date, names = payload.get('date'), payload.get('names')
+            if (not report_date or not isinstance(report_date, str) or not isinstance(names, list)
+                    or not all(isinstance(name, str) for name in names)):
+                raise ServiceError(400, "Body must contain a 'date' string and a 'names' list of strings.")
+            save = bool(payload.get('save', False))
+            return await self.run(('report', report_date, tuple(names), save), _build_report,
+                                  report_date, names, save)
+        if route == ('GET', '/cost'):
+            start, end = _required(query, 'start'), _required(query, 'end')
+            department = query.get('department') or None
+            return await self.run(('cost', start, end, department), _department_cost, start, end, department)
+        if route == ('GET', '/weekly-cost'):
+            start, end = _required(query, 'start'), _required(query, 'end')
+            return await self.run(('weekly-cost', start, end), _weekly_cost, start, end)
+        if route == ('GET', '/roster-cost'):
+            by = query.get('by', 'department')
+            return await self.run(('roster-cost', by), _roster_cost, by)
+        raise ServiceError(404, f"Unknown endpoint: {method} {path}")
+
+
+def _json_body(body):
+    try:
+        return json.loads(body or b'{}')
+    except ValueError:
+        raise ServiceError(400, "Request body is not valid JSON.")
+
+
+def _required(query, name):
+    if not query.get(name):
+        raise ServiceError(400, f"Missing query parameter: {name}")
+    return query[name]
+
+
+def _search_employees(db, text, limit):
+    from sqlalchemy import select
+    from database_setup import Employee
+    query = select(*(getattr(Employee, column) for column in EmployeeRow._fields))
+    if text:
+        query = query.where(Employee.employee_name.contains(text, autoescape=True))
+    rows = db.execute(query.order_by(Employee.employee_name).limit(limit))
+    return [EmployeeRow(*row)._asdict() for row in rows]
+
+
+def _employee_names(db):
+    from sqlalchemy import select
+    from database_setup import Employee
+    return db.execute(select(Employee.employee_name).where(Employee.employee_name.is_not(None))).scalars().all()
+
+
+def _build_report(db, report_date, names, save):
+    from attendance_store import save_daily_attendance
+    from report_engine import build_transport_report
+    report = build_transport_report(db, report_date, names)
+    if save:
+        save_daily_attendance(db, report)
+    return report_to_dict(report)
+
+
+def _department_cost(db, start, end, department):
+    from attendance_store import department_cost_summary
+    return [{'department': name, 'days': days, 'passengers': passengers, 'total_cost': total_cost}
+            for name, days, passengers, total_cost in department_cost_summary(db, start, end, department)]
+
+
+def _weekly_cost(db, start, end):
+    from cost_engine import weekly_cost_analysis
+    result = weekly_cost_analysis(db, start, end)
+    return {'departments': {str(key): float(value) for key, value in result.departments.items()},
+            'contractors': {str(key): float(value) for key, value in result.contractors.items()},
+            'total': result.total}
+
+
+def _roster_cost(db, by):
+    from analytics_snapshot import BREAKDOWNS, cost_breakdown
+    if by not in BREAKDOWNS:
+        raise ServiceError(400, f"by must be one of: {', '.join(BREAKDOWNS)}")
+    result = cost_breakdown(db, by)
+    return [{by: key, 'employees': int(row.employees), 'routes': int(row.routes), 'vehicles': int(row.vehicles),
+             'cost': float(row.cost)} for key, row in zip(result.index, result.itertuples())]
+
+
+# ---------- خادم HTTP ----------
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+            500: 'Internal Server Error'}
+
+
+async def _read_request(reader):
+    """Returns: (method, path, query, headers, body) أو None عند إغلاق الاتصال."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ServiceError(400, "Malformed request line.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise ServiceError(400, "Invalid Content-Length header.")
+    if length < 0:
+        raise ServiceError(400, "Invalid Content-Length header.")
+    if length > MAX_BODY_BYTES:
+        raise ServiceError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b''
+    url = urllib.parse.urlsplit(target)
+    query = dict(urllib.parse.parse_qsl(url.query))
+    return method.upper(), url.path, query, headers, body
+
+
+async def _write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+def make_handler(service):
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, path, query, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = 200, await service.handle(method, path, query, body)
+                except ServiceError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    logging.exception("خطأ أثناء تنفيذ طلب الخدمة")
+                    status, payload = 500, {'error': str(e)}
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    return handle_connection
+
+
+async def serve(database_path=DATABASE_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT, pool_size=DEFAULT_POOL_SIZE,
+                ready_callback=None):
+    service = ReportService(f"sqlite:///{os.path.abspath(database_path)}", pool_size)
+    server = await asyncio.start_server(make_handler(service), host, port)
+    address = server.sockets[0].getsockname()
+    logging.info(f"خدمة التقارير تعمل على http://{address[0]}:{address[1]}")
+    if ready_callback:
+        ready_callback(address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+# ---------- العميل ----------
+
+class ReportClient:
+    """عميل HTTP بسيط للخدمة (مكتبة Python القياسية فقط)؛ يستخدمه تطبيق سطح المكتب وسكربت الحمل."""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, params=None, payload=None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urllib.parse.urlencode({key: value for key, value in params.items() if value is not None})
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            raise RuntimeError(f"Report service error ({e.code}): {message}")
+
+    def health(self):
+        return self._request('/health')
+
+    def stats(self):
+        return self._request('/stats')
+
+    def search_employees(self, text, limit=SEARCH_LIMIT):
+        return self._request('/employees', {'q': text, 'limit': limit})
+
+    def employee_names(self):
+        return self._request('/employee-names')
+
+    def report_dict(self, report_date, names, save=False):
+        return self._request('/report', payload={'date': report_date, 'names': list(names), 'save': save})
+
+    def build_report(self, report_date, names, save=False):
+        return report_from_dict(self.report_dict(report_date, names, save))
+
+    def cost_by_department(self, start, end, department=None):
+        return self._request('/cost', {'start': start, 'end': end, 'department': department})
+
+    def weekly_cost(self, start, end):
+        return self._request('/weekly-cost', {'start': start, 'end': end})
+
+    def roster_cost(self, by='department'):
+        return self._request('/roster-cost', {'by': by})
+
+
+def service_client():
+    """عميل الخدمة إذا كان TRANSPORT_SERVICE_URL مضبوطاً، وإلا None (العمل على قاعدة البيانات مباشرة)."""
+    url = os.environ.get(SERVICE_URL_ENV)
+    return ReportClient(url) if url else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve employee lookup, reports and cost analysis over HTTP on localhost.")
+    parser.add_argument('--database', default=DATABASE_PATH)
+    parser.add_argument('--host', default=DEFAULT_HOST, help="bind address (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help="database connections and worker threads")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.database):
+        parser.error(f"database not found: {args.database}")
+
+    from instrumentation import setup_logging
+    setup_logging('report_service.log')
+    print(f"Serving {args.database} on http://{args.host}:{args.port} (pool size {args.pool_size})")
+    try:
+        asyncio.run(serve(args.database, args.host, args.port, args.pool_size))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
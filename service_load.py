@@ -0,0 +1,141 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from report_service import DEFAULT_HOST, DEFAULT_PORT, ReportClient
+
+# نسبة كل نوع طلب في الحمل المختلط
+DEFAULT_MIX = {'report': 0.5, 'search': 0.4, 'cost': 0.1}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def build_requests(client, count, distinct_reports, attendees, seed, mix=DEFAULT_MIX):
+    """
+    قائمة طلبات ثابتة (بنفس البذرة): التقارير تُختار من distinct_reports تقريراً فقط
+    حتى تتكرر الطلبات المتطابقة كما يحدث عندما تطلب عدة مكاتب تقرير نفس اليوم.
+    """
+    rng = random.Random(seed)
+    names = client.employee_names()
+    if not names:
+        raise RuntimeError("The service database has no employees.")
+    reports = [(f"2025-04-{day + 1:02d}", rng.sample(names, min(attendees, len(names))))
+               for day in range(distinct_reports)]
+    kinds, weights = zip(*mix.items())
+    requests = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'report':
+            requests.append(('report', rng.choice(reports)))
+        elif kind == 'search':
+            requests.append(('search', rng.choice(names)[:rng.randint(2, 6)]))
+        else:
+            requests.append(('cost', ('2025-04-01', '2025-04-30')))
+    return requests
+
+
+def send(client, request):
+    kind, argument = request
+    if kind == 'report':
+        client.report_dict(*argument)
+    elif kind == 'search':
+        client.search_employees(argument, limit=20)
+    else:
+        client.cost_by_department(*argument)
+
+
+def run_load(base_url, clients=16, count=400, distinct_reports=4, attendees=500, seed=0):
+    """
+    إرسال count طلباً من clients عميلاً متزامناً وقياس الإنتاجية وزمن الاستجابة.
+
+    Returns:
+        dict: الإنتاجية (طلب/ثانية) ونسب زمن الاستجابة لكل نوع طلب، وإحصائيات الخدمة.
+    """
+    client = ReportClient(base_url)
+    requests = build_requests(client, count, distinct_reports, attendees, seed)
+    latencies = {}
+    errors = []
+    lock = threading.Lock()
+
+    def timed_send(request):
+        started = time.perf_counter()
+        try:
+            send(client, request)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.setdefault(request[0], []).append(elapsed)
+
+    before = client.stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(timed_send, requests))
+    seconds = time.perf_counter() - started
+    after = client.stats()
+
+    result = {
+        'clients': clients,
+        'requests': count,
+        'errors': len(errors),
+        'seconds': round(seconds, 3),
+        'throughput': round(count / seconds, 1) if seconds else 0.0,
+        'computed': after['computed'] - before['computed'],
+        'coalesced': after['coalesced'] - before['coalesced'],
+        'latency_ms': {},
+    }
+    for kind, values in sorted(latencies.items()):
+        result['latency_ms'][kind] = {
+            'count': len(values),
+            'mean': round(statistics.mean(values) * 1000, 2),
+            'p50': round(percentile(values, 0.50) * 1000, 2),
+            'p95': round(percentile(values, 0.95) * 1000, 2),
+            'p99': round(percentile(values, 0.99) * 1000, 2),
+        }
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure report service throughput and latency under concurrent load.")
+    parser.add_argument('--url', default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32],
+                        help="concurrent client counts to measure")
+    parser.add_argument('--requests', type=int, default=400, help="requests per client count")
+    parser.add_argument('--distinct-reports', type=int, default=4,
+                        help="how many different reports the clients ask for (fewer means more coalescing)")
+    parser.add_argument('--attendees', type=int, default=500, help="names per report request")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for clients in args.clients:
+        result = run_load(args.url, clients, args.requests, args.distinct_reports, args.attendees, args.seed)
+        results.append(result)
+        latency = ', '.join(f"{kind} p50 {values['p50']} / p95 {values['p95']} ms"
+                            for kind, values in result['latency_ms'].items())
+        print(f"{clients:>3} clients: {result['throughput']} req/s, computed {result['computed']}, "
+              f"coalesced {result['coalesced']}, errors {result['errors']}; {latency}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    return 1 if any(result['errors'] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
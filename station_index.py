@@ -0,0 +1,89 @@
+import re
+
+from sqlalchemy import delete, func, insert, select
+from database_setup import Employee, Route, RouteStation
+
+# الفاصل بين المحطات في عمود route_stations (فاصلة إنجليزية أو عربية)
+_SEPARATOR = re.compile('[,،]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def clean_station(name):
+    """اسم المحطة بعد حذف المسافات الزائدة؛ None للقيمة الفارغة."""
+    if name is None:
+        return None
+    name = _WHITESPACE.sub(' ', str(name)).strip()
+    return name or None
+
+
+def split_stations(text):
+    """تقسيم نص المحطات إلى قائمة مرتبة بدون مسافات زائدة أو عناصر فارغة."""
+    if not isinstance(text, str):
+        return []
+    return [station for station in map(clean_station, _SEPARATOR.split(text)) if station]
+
+
+def join_stations(stations):
+    return ','.join(stations)
+
+
+def station_records(route_code, text):
+    """صفوف جدول route_stations لخط سير واحد (المحطة المكررة تُحفظ أول مرة فقط)."""
+    stations = dict.fromkeys(split_stations(text))
+    return [{'route_code': route_code, 'position': position, 'station_name': station}
+            for position, station in enumerate(stations)]
+
+
+def replace_route_stations(db, route_stations):
+    """
+    استبدال محطات خطوط سير محددة بعد إضافتها أو تعديلها.
+
+    Args:
+        route_stations: قاموس {route_code: نص المحطات}.
+    """
+    codes = list(route_stations)
+    if not codes:
+        return 0
+    db.execute(delete(RouteStation).where(RouteStation.route_code.in_(codes)))
+    records = [record for code, text in route_stations.items() for record in station_records(code, text)]
+    if records:
+        db.execute(insert(RouteStation), records)
+    return len(records)
+
+
+def rebuild_route_stations(db):
+    """إعادة بناء جدول المحطات بالكامل من عمود route_stations (بعد الاستيراد أو المزامنة)."""
+    db.execute(delete(RouteStation))
+    rows = db.execute(select(Route.route_code, Route.route_stations)).all()
+    return replace_route_stations(db, dict(rows)) if rows else 0
+
+
+def stations_for_routes(db, route_codes):
+    """Returns: قاموس {route_code: قائمة المحطات بترتيبها في الخط} باستعلام واحد."""
+    stations = {code: [] for code in route_codes}
+    if not stations:
+        return stations
+    query = (select(RouteStation.route_code, RouteStation.station_name)
+             .where(RouteStation.route_code.in_(list(stations)))
+             .order_by(RouteStation.route_code, RouteStation.position))
+    for route_code, station in db.execute(query):
+        stations[route_code].append(station)
+    return stations
+
+
+def routes_serving(db, station):
+    """خطوط السير التي تمر بمحطة (بحث في فهرس station_name)."""
+    query = (select(RouteStation.route_code).where(RouteStation.station_name == clean_station(station))
+             .order_by(RouteStation.route_code))
+    return db.execute(query).scalars().all()
+
+
+def station_passenger_counts(db, route_code):
+    """عدد الموظفين المسجلين في كل محطة من محطات خط سير بترتيب المحطات."""
+    query = (select(RouteStation.station_name, func.count(Employee.employee_id))
+             .outerjoin(Employee, (Employee.route_code == RouteStation.route_code)
+                        & (Employee.station == RouteStation.station_name))
+             .where(RouteStation.route_code == route_code)
+             .group_by(RouteStation.position, RouteStation.station_name)
+             .order_by(RouteStation.position))
+    return db.execute(query).all()
@@ -0,0 +1,296 @@
+from datetime import date
+
+from PyQt5.QtCore import Qt, QAbstractProxyModel, QAbstractTableModel, QModelIndex
+from sqlalchemy import String, func, select, tuple_
+
+# عدد الصفوف التي تُجلب من قاعدة البيانات في كل صفحة أثناء التمرير
+PAGE_SIZE = 500
+
+
+def sqlite_order(value):
+    """مفتاح مقارنة في Python بنفس ترتيب SQLite: NULL ثم الأرقام ثم النصوص ثم البيانات الثنائية."""
+    if value is None:
+        return (0,)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, date):
+        return (2, value.isoformat())
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, bytes):
+        return (3, value)
+    return (1, float(value))
+
+
+class LazyTableModel(QAbstractTableModel):
+    """
+    نموذج جدول يجلب صفوف جدول SQLAlchemy صفحةً صفحة عند التمرير (keyset pagination)،
+    مع الترتيب والتصفية داخل قاعدة البيانات. لا يحتفظ بكائنات ORM، فقط بقيم الأعمدة.
+    """
+
+    def __init__(self, session, model, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.model = model
+        self.page_size = page_size
+        self.columns = [column.key for column in model.__table__.columns]
+        self.primary_key = model.__table__.primary_key.columns.values()[0].key
+        self.sort_column = self.primary_key
+        self.sort_order = Qt.AscendingOrder
+        self.filters = {}
+        self.rows = []
+        self._order_keys = []  # مفتاح ترتيب كل صف محمّل (لتحديد موضع الصف المعدل)
+        self._last_key = None
+        self._exhausted = False
+        self._fetching = False
+        self.reload()
+
+    # --- واجهة Qt ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self.rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        # طلب صفحة من داخل إشارات إضافة الصفوف يُتجاهل، وإلا جُلبت نفس الصفحة مرتين
+        # لأن آخر مفتاح لم يتغير بعد
+        if parent.isValid() or self._exhausted or self._fetching:
+            return
+        self._fetching = True
+        try:
+            page = self._fetch_page()
+            if len(page) < self.page_size:
+                self._exhausted = True
+            if not page:
+                return
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(tuple(row[:len(self.columns)]) for row in page)
+            self._order_keys.extend(self._order_key(row) for row in page)
+            self._last_key = tuple(page[-1][len(self.columns):])
+            self.endInsertRows()
+        finally:
+            self._fetching = False
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # العمود -1 يعني إلغاء الترتيب والعودة لترتيب المفتاح الأساسي
+        self.sort_column = self.columns[column] if column >= 0 else self.primary_key
+        self.sort_order = order
+        self.reload()
+
+    # --- واجهة التطبيق ---
+
+    def set_filter(self, column_name, text):
+        """تصفية عمود بنص جزئي داخل قاعدة البيانات (يُطابَق حرفياً، فلا تعمل % و _ كرموز LIKE)؛ النص الفارغ يلغي التصفية."""
+        if text:
+            self.filters[column_name] = text
+        else:
+            self.filters.pop(column_name, None)
+        self.reload()
+
+    def reload(self):
+        """البدء من الصفحة الأولى بعد تغيير الترتيب أو التصفية."""
+        self.beginResetModel()
+        self.rows = []
+        self._order_keys = []
+        self._last_key = None
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def primary_key_at(self, row):
+        return self.rows[row][self.columns.index(self.primary_key)]
+
+    def refresh_rows(self, keys):
+        """
+        تحديث صفوف محددة بمفتاحها الأساسي بعد إضافتها أو تعديلها أو حذفها، دون إعادة تحميل الجدول.
+
+        يُعاد جلب هذه الصفوف فقط (مع التصفية الحالية)، ثم يُحدَّث كل صف في مكانه أو يُنقل
+        إلى موضعه حسب الترتيب الحالي أو يُضاف أو يُحذف. الإشارات المرسلة لـ Qt (تحديث/نقل/
+        إضافة/حذف صف واحد) تحافظ على التحديد وموضع التمرير. الصف الذي يقع ترتيبه بعد آخر
+        صفحة محمّلة لا يُضاف الآن، وسيأتي مع الصفحات التالية عند التمرير.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        table = self.model.__table__
+        query = self._select().where(table.columns[self.primary_key].in_(keys))
+        key_index = self.columns.index(self.primary_key)
+        fetched = {row[key_index]: row for row in self.session.execute(query)}
+
+        # الصفوف المحذوفة أو الخارجة عن التصفية تُحذف أولاً من الأسفل للأعلى حتى تبقى المواضع صحيحة
+        positions = self._positions(keys)
+        self._remove_rows([row for key, row in positions.items() if key not in fetched])
+
+        positions = None
+        for key in keys:
+            row = fetched.get(key)
+            if row is None:
+                continue
+            if positions is None:
+                positions = self._positions(keys)
+            current = positions.get(key)
+            order_key = self._order_key(row)
+            target = self._position_for(order_key, current)
+            if target is None:
+                if current is not None:
+                    self._remove_rows([current])
+                    positions = None
+                continue
+            values = tuple(row[:len(self.columns)])
+            if current is None:
+                self.beginInsertRows(QModelIndex(), target, target)
+                self.rows.insert(target, values)
+                self._order_keys.insert(target, order_key)
+                self.endInsertRows()
+                positions = None
+                continue
+            if target != current:
+                # Qt يحدد الوجهة كموضع قبل الحذف، فتزيد بواحد عند النقل للأسفل
+                self.beginMoveRows(QModelIndex(), current, current, QModelIndex(),
+                                   target + 1 if target > current else target)
+                self.rows.insert(target, self.rows.pop(current))
+                self._order_keys.insert(target, self._order_keys.pop(current))
+                self.endMoveRows()
+                positions = None
+            self.rows[target] = values
+            self._order_keys[target] = order_key
+            self.dataChanged.emit(self.index(target, 0), self.index(target, len(self.columns) - 1))
+
+    def _positions(self, keys):
+        """{المفتاح: رقم الصف} للمفاتيح المحمّلة فقط، بمرور واحد على الصفوف."""
+        wanted = set(keys)
+        key_index = self.columns.index(self.primary_key)
+        return {values[key_index]: row for row, values in enumerate(self.rows) if values[key_index] in wanted}
+
+    def _remove_rows(self, rows):
+        # كل مجموعة صفوف متتالية تُحذف بإشارة واحدة، من الأسفل للأعلى
+        rows = sorted(rows, reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.rows[first:last + 1]
+            del self._order_keys[first:last + 1]
+            self.endRemoveRows()
+
+    def _order_key(self, row):
+        return tuple(sqlite_order(value) for value in row[len(self.columns):])
+
+    def _position_for(self, order_key, current=None):
+        """موضع الصف بين الصفوف المحمّلة (بعد استبعاد موضعه الحالي)، أو None إذا كان بعد آخر صفحة محمّلة."""
+        descending = self.sort_order == Qt.DescendingOrder
+        keys = self._order_keys
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            before = keys[middle] > order_key if descending else keys[middle] < order_key
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        if current is not None and current < low:
+            low -= 1
+        remaining = len(keys) - (current is not None)
+        if low >= remaining and not self._exhausted:
+            return None
+        return low
+
+    # --- الاستعلامات ---
+
+    def _sort_keys(self):
+        table = self.model.__table__
+        sort_column = table.columns[self.sort_column]
+        if self.sort_column == self.primary_key:
+            return [sort_column]
+        # القيم الفارغة تمنع مقارنة المفاتيح، لذلك تُستبدل بقيمة ثابتة في مفتاح الترتيب
+        # (الأعمدة غير القابلة للفراغ تبقى كما هي حتى يُستخدم فهرسها)
+        sort_expression = func.coalesce(sort_column, '') if sort_column.nullable else sort_column
+        return [sort_expression, table.columns[self.primary_key]]
+
+    def _select(self):
+        """قيم الأعمدة ثم مفاتيح الترتيب، مع شروط التصفية الحالية."""
+        table = self.model.__table__
+        query = select(*[table.columns[name] for name in self.columns],
+                       *[key.label(f'sort_key_{i}') for i, key in enumerate(self._sort_keys())])
+        for column_name, text in self.filters.items():
+            column = table.columns[column_name]
+            if not isinstance(column.type, String):
+                column = column.cast(String)
+            query = query.where(column.contains(text, autoescape=True))
+        return query
+
+    def _fetch_page(self):
+        keys = self._sort_keys()
+        query = self._select()
+        descending = self.sort_order == Qt.DescendingOrder
+        if self._last_key is not None:
+            key_expression = tuple_(*keys) if len(keys) > 1 else keys[0]
+            key_value = tuple_(*self._last_key) if len(keys) > 1 else self._last_key[0]
+            query = query.where(key_expression < key_value if descending else key_expression > key_value)
+        query = query.order_by(*[key.desc() if descending else key for key in keys]).limit(self.page_size)
+        return self.session.execute(query).all()
+
+
+class SearchProxyModel(QAbstractProxyModel):
+    """نموذج وسيط يعرض صفوف النموذج الأصلي المطابقة للبحث دون إعادة بناء القائمة."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._positions = None
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = rows
+        self._positions = None
+        self.endResetModel()
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        self.set_rows(range(model.rowCount()))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not 0 <= row < len(self._rows) or column != 0:
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], 0)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._positions is None:
+            # يُبنى عند الحاجة فقط حتى لا يتأخر تحديث القائمة مع كل حرف
+            self._positions = {source_row: row for row, source_row in enumerate(self._rows)}
+        row = self._positions.get(source_index.row())
+        return QModelIndex() if row is None else self.createIndex(row, 0)
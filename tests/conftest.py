@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+# وحدات المشروع في المجلد الرئيسي وليست حزمة
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import generate_roster
+from database_setup import Base, Employee, Route, RouteCost
+from instrumentation import instrument_engine
+from migrations import migrate
+from station_index import rebuild_route_stations
+
+# عدد موظفي البيانات العشوائية في الاختبارات (10 خطوط سير)
+ROSTER_SIZE = 60
+
+
+def load_roster(db, roster):
+    """إدخال بيانات generate_roster في قاعدة البيانات كما يفعل الاستيراد (بدون ملف Excel)."""
+    route_columns = ('route_code', 'route_name', 'vehicle_type', 'contractor_name', 'supervisor_name',
+                     'route_stations')
+    cost_columns = ('route_code', 'vehicle_capacity', 'cost_5_days', 'cost_4_days', 'cost_3_days')
+    db.execute(insert(Route), [dict(zip(route_columns, row)) for row in roster['Sheet2']])
+    db.execute(insert(RouteCost), [dict(zip(cost_columns, row)) for row in roster['Sheet3']])
+    route_codes = {row[0] for row in roster['Sheet2']}
+    db.execute(insert(Employee), [
+        {'employee_name': name, 'department': department, 'station': station,
+         'route_code': route_code if route_code in route_codes else None, 'notes': notes}
+        for name, department, station, _, route_code, notes in roster['Sheet1']])
+    rebuild_route_stations(db)
+    db.commit()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = instrument_engine(create_engine(f"sqlite:///{tmp_path / 'transport_management.db'}"))
+    Base.metadata.create_all(engine)
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def roster():
+    return generate_roster(ROSTER_SIZE, seed=1)
+
+
+@pytest.fixture
+def roster_db(db, roster):
+    load_roster(db, roster)
+    return db
@@ -0,0 +1,50 @@
+from datetime import date
+
+from sqlalchemy import select, text, update
+
+from attendance_store import save_daily_attendance
+from database_setup import AttendanceRecord, DailyReport, DailyRouteSummary, Employee, RouteCost
+from migrations import migrate
+from report_engine import build_transport_report
+
+DAY = date.today()  # تعديل route_costs يسري من اليوم في سجل الأسعار
+
+
+def saved_report(db, roster):
+    # سيارة لكل راكب حتى يختلف عدد السيارات عن عدد الخطوط
+    db.execute(update(RouteCost).values(vehicle_capacity=1))
+    db.commit()
+    report = build_transport_report(db, DAY.isoformat(), [row[0] for row in roster['Sheet1']])
+    save_daily_attendance(db, report)
+    return report
+
+
+def test_saved_report_counts_routes_not_vehicles(roster_db, roster):
+    report = saved_report(roster_db, roster)
+    assert report.vehicle_count > len(report.routes)
+
+    saved = roster_db.get(DailyReport, DAY)
+    assert saved.route_count == len(report.routes)
+    assert saved.employee_count == len({row.employee_id for row in report.employees})
+    assert saved.total_cost == report.total_cost
+    routes = roster_db.scalars(select(DailyRouteSummary.route_code)
+                               .where(DailyRouteSummary.summary_date == DAY).distinct()).all()
+    assert sorted(routes) == sorted(report.routes)
+
+
+def test_saving_a_day_again_replaces_it(roster_db, roster):
+    saved_report(roster_db, roster)
+    name = roster_db.scalars(select(Employee.employee_name).where(Employee.route_code.is_not(None))).first()
+    save_daily_attendance(roster_db, build_transport_report(roster_db, DAY.isoformat(), [name]))
+    assert roster_db.query(AttendanceRecord).count() == 1
+    assert roster_db.get(DailyReport, DAY).route_count == 1
+
+
+def test_migration_recounts_routes_of_saved_reports(engine, roster_db, roster):
+    report = saved_report(roster_db, roster)
+    with engine.begin() as connection:
+        connection.execute(update(DailyReport).values(route_count=report.vehicle_count))
+        connection.execute(text("PRAGMA user_version = 6"))
+    migrate(engine)
+    roster_db.expire_all()
+    assert roster_db.get(DailyReport, DAY).route_count == len(report.routes)
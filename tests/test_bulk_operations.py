@@ -0,0 +1,119 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, select
+
+import bulk_operations
+from bulk_operations import BulkValidationError, bulk_delete, bulk_insert_rows, bulk_update
+from database_setup import AttendanceRecord, Employee, Route, RouteCost, RouteStation
+
+
+def employee_ids(db, route_code):
+    return db.scalars(select(Employee.employee_id).where(Employee.route_code == route_code)
+                      .order_by(Employee.employee_id)).all()
+
+
+def test_bulk_update_sets_value_on_all_keys(roster_db):
+    codes = roster_db.scalars(select(Route.route_code).order_by(Route.route_code)).all()
+    keys = employee_ids(roster_db, codes[0])
+    result = bulk_update(roster_db, Employee, keys, 'route_code', codes[1])
+    assert result.rows == len(keys)
+    assert set(keys) <= set(employee_ids(roster_db, codes[1]))
+
+
+@pytest.mark.parametrize('model, column, value, error', [
+    (Employee, 'route_code', 'غير موجود', 'not found in routes'),
+    (Employee, 'employee_name', '  ', 'employee_name is required'),
+    (Employee, 'employee_id', 5, 'primary key'),
+    (RouteCost, 'vehicle_capacity', '14.5', 'not a whole number'),
+    (RouteCost, 'cost_5_days', '-1', 'negative'),
+    (RouteCost, 'cost_4_days', 'abc', 'not a number'),
+])
+def test_bulk_update_rejects_invalid_value_without_writing(roster_db, model, column, value, error):
+    key = bulk_operations.primary_key_column(model)
+    keys = roster_db.scalars(select(key).limit(5)).all()
+    before = roster_db.execute(select(model.__table__)).all()
+    with pytest.raises(BulkValidationError, match=error):
+        bulk_update(roster_db, model, keys, column, value)
+    assert roster_db.execute(select(model.__table__)).all() == before
+
+
+def test_bulk_update_rolls_back_when_a_later_step_fails(roster_db, monkeypatch):
+    code = roster_db.scalars(select(Route.route_code)).first()
+    stations_before = roster_db.get(Route, code).route_stations
+
+    def fail(db, route_stations):
+        raise RuntimeError('station index failed')
+    monkeypatch.setattr(bulk_operations, 'replace_route_stations', fail)
+    with pytest.raises(RuntimeError):
+        bulk_update(roster_db, Route, [code], 'route_stations', 'شبرا,المطرية')
+    roster_db.expire_all()
+    assert roster_db.get(Route, code).route_stations == stations_before
+
+
+def test_bulk_delete_blocked_by_references(roster_db):
+    used = roster_db.scalars(select(Employee.route_code).where(Employee.route_code.is_not(None))).first()
+    with pytest.raises(BulkValidationError, match=f"route {used} is still used by .* employees"):
+        bulk_delete(roster_db, Route, [used])
+    assert roster_db.get(Route, used) is not None
+
+    employee = roster_db.scalars(select(Employee)).first()
+    roster_db.execute(insert(AttendanceRecord), [{
+        'attendance_date': date(2025, 4, 1), 'employee_id': employee.employee_id,
+        'employee_name': employee.employee_name}])
+    roster_db.commit()
+    other = roster_db.scalars(select(Employee.employee_id).where(
+        Employee.employee_id != employee.employee_id)).first()
+    # حذف موظف له سجلات حضور يلغي حذف باقي الموظفين المحددين أيضاً
+    with pytest.raises(BulkValidationError, match='has 1 attendance records'):
+        bulk_delete(roster_db, Employee, [other, employee.employee_id])
+    assert roster_db.get(Employee, other) is not None
+
+
+def test_bulk_delete_route_without_references_removes_stations(roster_db):
+    code = roster_db.scalars(select(Route.route_code)).first()
+    bulk_update(roster_db, Employee, employee_ids(roster_db, code), 'route_code', 'لايوجد')
+    with pytest.raises(BulkValidationError, match='route costs'):
+        bulk_delete(roster_db, Route, [code])
+    assert bulk_delete(roster_db, RouteCost, [code]).rows == 1
+    assert bulk_delete(roster_db, Route, [code]).rows == 1
+    assert roster_db.scalars(select(RouteStation).where(RouteStation.route_code == code)).all() == []
+
+
+def test_paste_inserts_rows_and_stations(roster_db):
+    result = bulk_insert_rows(roster_db, Route, "route_code\troute_name\troute_stations\n"
+                                                "P1\tخط جديد\tشبرا ,  المطرية\n")
+    assert result.keys == ['P1']
+    assert roster_db.scalars(select(RouteStation.station_name).where(RouteStation.route_code == 'P1')
+                             .order_by(RouteStation.position)).all() == ['شبرا', 'المطرية']
+
+    result = bulk_insert_rows(roster_db, Employee, "سعد منصور\tالصيانة\tشبرا\tP1\nهاني عادل\tالصيانة\t\tلايوجد")
+    assert result.rows == 2
+    assert [roster_db.get(Employee, key).route_code for key in result.keys] == ['P1', None]
+
+
+@pytest.mark.parametrize('text, error', [
+    # تكرار داخل اللصق نفسه
+    ("سعد منصور\tالصيانة\tشبرا\nسعد منصور\tالصيانة\tشبرا", 'row 2: duplicate'),
+    # تكرار صف موجود في قاعدة البيانات (نفس الأعمدة الأربعة)
+    (None, 'row 1: duplicate'),
+    # صف صالح وصف يشير إلى خط غير موجود: لا يُدخل أي منهما
+    ("سعد منصور\tالصيانة\tشبرا\nهاني عادل\tالصيانة\tشبرا\tغير موجود", 'row 2: route_code not found'),
+    ("\tالصيانة", 'row 1: employee_name is required'),
+])
+def test_paste_rejects_whole_paste(roster_db, text, error):
+    if text is None:
+        row = roster_db.scalars(select(Employee).where(Employee.station.is_not(None))).first()
+        text = (f"{row.employee_name}\t{row.department}\t{row.station}\t{row.route_code or ''}\n"
+                f"{row.employee_name}\tقسم آخر\t{row.station}\t{row.route_code or ''}")
+    count = roster_db.query(Employee).count()
+    with pytest.raises(BulkValidationError, match=error):
+        bulk_insert_rows(roster_db, Employee, text)
+    assert roster_db.query(Employee).count() == count
+
+
+def test_paste_rejects_existing_route_code(roster_db):
+    code = roster_db.scalars(select(Route.route_code)).first()
+    with pytest.raises(BulkValidationError, match='duplicate route_code'):
+        bulk_insert_rows(roster_db, Route, f"NEW1\tخط\nNEW2\tخط\n{code}\tخط")
+    assert roster_db.get(Route, 'NEW1') is None
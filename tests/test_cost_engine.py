@@ -0,0 +1,90 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import insert, select
+
+from cost_engine import attendance_tensor, simulate_weeks, tier_rates, weekly_cost_analysis
+from database_setup import AttendanceRecord, Employee, RouteCost
+
+COST_5, COST_4, COST_3 = 1000.0, 1150.0, 1250.0
+
+
+def single_route_costs(capacity=14):
+    return pd.DataFrame({'cost_5_days': [COST_5], 'cost_4_days': [COST_4], 'cost_3_days': [COST_3],
+                         'vehicle_capacity': [capacity], 'contractor_name': ['نور']}, index=['R1'])
+
+
+def week_with_days(days):
+    """حضور موظف واحد أول days أيام من الأسبوع (السبت = 0)."""
+    week = np.zeros((1, 7), dtype=bool)
+    week[0, :days] = True
+    return week
+
+
+def test_tier_rates_per_days_needed():
+    days_needed = np.array([[6], [5], [4], [3], [2], [1], [0]])
+    rates = tier_rates(days_needed, single_route_costs())
+    assert rates[:, 0].tolist() == [COST_5, COST_5, COST_4, COST_3, COST_3, COST_3, 0.0]
+
+
+def test_tier_rates_with_a_rate_per_week():
+    days_needed = np.array([[5, 4], [3, 0]])
+    week_costs = {'cost_5_days': np.array([[10, 20], [11, 21]]),
+                  'cost_4_days': np.array([[12, 22], [13, 23]]),
+                  'cost_3_days': np.array([[14, 24], [15, 25]])}
+    assert tier_rates(days_needed, week_costs).tolist() == [[10, 22], [15, 0]]
+
+
+@pytest.mark.parametrize('days, rate', [(5, COST_5), (4, COST_4), (3, COST_3), (1, COST_3), (0, 0.0)])
+def test_week_cost_uses_the_tier_of_its_days(days, rate):
+    employees = pd.DataFrame({'route_code': ['R1'], 'department': ['الجودة']})
+    result = simulate_weeks(week_with_days(days), employees, single_route_costs())
+    route = result.routes.loc['R1']
+    assert route['days_needed'] == days
+    assert route['weeks_used'] == (days > 0)
+    assert result.total == pytest.approx(days * rate)
+    assert result.departments['الجودة'] == pytest.approx(days * rate)
+
+
+def test_weeks_are_priced_separately():
+    employees = pd.DataFrame({'route_code': ['R1'], 'department': ['الجودة']})
+    attendance = np.stack([week_with_days(days) for days in (5, 4, 3, 1, 0)])
+    result = simulate_weeks(attendance, employees, single_route_costs())
+    assert result.routes.loc['R1', 'weeks_used'] == 4
+    assert result.total == pytest.approx(5 * COST_5 + 4 * COST_4 + 3 * COST_3 + 1 * COST_3)
+
+
+def test_attendance_tensor_weeks_start_on_saturday_across_months():
+    employees = pd.DataFrame({'route_code': ['R1', 'R1']}, index=[7, 9])
+    records = pd.DataFrame({
+        'employee_id': [7, 7, 7, 9, 7, 12],
+        'attendance_date': [date(2025, 5, 29),                   # الخميس: الأسبوع السابق
+                            date(2025, 5, 31), date(2025, 6, 1),  # السبت والأحد في شهرين مختلفين
+                            date(2025, 6, 5),                     # الخميس: نفس الأسبوع
+                            date(2025, 6, 7),                     # السبت: أسبوع جديد
+                            date(2025, 6, 1)],                    # موظف غير معروف يُتجاهل
+    })
+    tensor, week_starts = attendance_tensor(records, employees)
+    assert week_starts == [date(2025, 5, 24), date(2025, 5, 31), date(2025, 6, 7)]
+    assert tensor.shape == (3, 2, 7)
+    assert np.argwhere(tensor).tolist() == [[0, 0, 5], [1, 0, 0], [1, 0, 1], [1, 1, 5], [2, 0, 0]]
+
+
+def test_week_crossing_month_boundary_is_priced_as_one_week(roster_db):
+    employee = roster_db.scalars(select(Employee).where(Employee.route_code.is_not(None)).limit(1)).one()
+    cost = roster_db.get(RouteCost, employee.route_code)
+    # السبت 31 مايو والأحد 1 يونيو والاثنين 2 يونيو: ثلاثة أيام في أسبوع واحد رغم تغير الشهر
+    days = [date(2025, 5, 31), date(2025, 6, 1), date(2025, 6, 2)]
+    roster_db.execute(insert(AttendanceRecord), [
+        {'attendance_date': day, 'employee_id': employee.employee_id, 'employee_name': employee.employee_name,
+         'department': employee.department, 'station': employee.station, 'route_code': employee.route_code}
+        for day in days])
+    roster_db.commit()
+
+    result = weekly_cost_analysis(roster_db, '2025-05-01', '2025-06-30')
+    route = result.routes.loc[employee.route_code]
+    assert route['weeks_used'] == 1
+    assert route['days_needed'] == 3
+    assert result.total == pytest.approx(3 * cost.cost_3_days)
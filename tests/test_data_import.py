@@ -0,0 +1,143 @@
+from sqlalchemy import select
+
+from benchmark import write_roster_workbook
+from data_import import stream_import_from_excel, sync_data_from_excel
+from database_setup import DataVersion, Employee, Route, RouteCost, RouteStation
+
+
+def small_roster():
+    return {
+        'Sheet1': [
+            ('أحمد علي', 'الحسابات', 'شبرا', None, 'R1', None),
+            ('محمد حسن', 'الجودة', 'المعادي', None, 'R2', None),
+            ('علي عمر', 'الجودة', 'فيصل', None, 'R2', None),
+            ('يوسف خالد', 'المخازن', 'حلوان', None, 'R3', None),
+        ],
+        'Sheet2': [
+            ('R1', 'خط شبرا', 'ميكروباص', 'نور', 'محمد', 'شبرا,المطرية'),
+            ('R2', 'خط المعادي', 'ميني باص', 'فتحي', 'علي', 'المعادي,فيصل'),
+            ('R3', 'خط حلوان', 'أتوبيس', 'هاني', 'حسن', 'حلوان'),
+        ],
+        'Sheet3': [
+            ('R1', 14, 1250, 1425, 1560),
+            ('R2', 28, 1600, 1824, 2000),
+            ('R3', 50, 2400, 2736, 3000),
+        ],
+    }
+
+
+def data_versions(db):
+    return dict(db.execute(select(DataVersion.table_name, DataVersion.version)).all())
+
+
+def sync(path, session_factory, **options):
+    return sync_data_from_excel(str(path), session_factory=session_factory, **options)
+
+
+def test_sync_same_workbook_twice_writes_nothing(tmp_path, session_factory, db):
+    path = write_roster_workbook(small_roster(), tmp_path / 'roster.xlsx')
+    first = sync(path, session_factory)
+    assert first['employees']['inserted'] == 4
+    assert first['routes']['inserted'] == 3
+    versions = data_versions(db)
+    assert versions['employees'] > 0
+
+    second = sync(path, session_factory, retire_missing=True)
+    assert second == {
+        'routes': {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 3},
+        'route_costs': {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 3},
+        'employees': {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 4},
+    }
+    # كل كتابة تزيد رقم إصدار الجدول، فبقاء الأرقام يعني أنه لم يُكتب أي صف
+    db.expire_all()
+    assert data_versions(db) == versions
+
+
+def test_sync_writes_only_the_delta(tmp_path, session_factory, db):
+    roster = small_roster()
+    sync(write_roster_workbook(roster, tmp_path / 'before.xlsx'), session_factory)
+    first_ids = dict(db.execute(select(Employee.employee_name, Employee.employee_id)).all())
+
+    # تعديل صف وإضافة صف وحذف صف في كل ورقة
+    roster['Sheet1'][0] = ('أحمد علي', 'المشتريات', 'شبرا', None, 'R1', None)
+    roster['Sheet1'][3] = ('عمر يوسف', 'المخازن', 'المطرية', None, 'R4', None)
+    roster['Sheet2'][0] = ('R1', 'خط شبرا', 'ميكروباص', 'نور', 'محمد', 'شبرا,المطرية,الهرم')
+    roster['Sheet2'][2] = ('R4', 'خط المطرية', 'ميكروباص', 'سعد', 'عمر', 'المطرية')
+    roster['Sheet3'][1] = ('R2', 28, 1700, 1938, 2125)
+    roster['Sheet3'][2] = ('R4', 14, 1300, 1482, 1625)
+    summary = sync(write_roster_workbook(roster, tmp_path / 'after.xlsx'), session_factory,
+                   retire_missing=True)
+
+    delta = {'inserted': 1, 'updated': 1, 'retired': 1}
+    assert summary == {
+        'routes': {**delta, 'unchanged': 1},
+        'route_costs': {**delta, 'unchanged': 1},
+        'employees': {**delta, 'unchanged': 2},
+    }
+    db.expire_all()
+    employees = {row.employee_name: row for row in db.scalars(select(Employee))}
+    assert set(employees) == {'أحمد علي', 'محمد حسن', 'علي عمر', 'عمر يوسف'}
+    assert employees['أحمد علي'].department == 'المشتريات'
+    # الصفوف المعدلة تحتفظ بمفتاحها الأساسي
+    assert employees['أحمد علي'].employee_id == first_ids['أحمد علي']
+    assert db.scalars(select(Route.route_code).order_by(Route.route_code)).all() == ['R1', 'R2', 'R4']
+    assert db.get(RouteCost, 'R2').cost_5_days == 1700
+
+    stations = db.execute(select(RouteStation.route_code, RouteStation.station_name)
+                          .order_by(RouteStation.route_code, RouteStation.position)).all()
+    assert stations == [('R1', 'شبرا'), ('R1', 'المطرية'), ('R1', 'الهرم'),
+                        ('R2', 'المعادي'), ('R2', 'فيصل'), ('R4', 'المطرية')]
+
+
+def test_sync_with_numeric_route_codes_is_safe_to_rerun(tmp_path, session_factory, db):
+    # رموز الخطوط تُقرأ من Excel كأرقام وتُخزن كنص
+    roster = {
+        'Sheet1': [('أحمد علي', 'الحسابات', 'شبرا', None, 101, None),
+                   ('محمد حسن', 'الجودة', None, None, 102, None)],
+        'Sheet2': [(101, 'خط شبرا', 'ميكروباص', 'نور', 'محمد', 'شبرا'),
+                   (102, 'خط المعادي', 'ميني باص', 'فتحي', 'علي', 'المعادي')],
+        'Sheet3': [(101, 14, 1250, 1425, 1560), (102, 28, 1600, 1824, 2000)],
+    }
+    path = write_roster_workbook(roster, tmp_path / 'numeric.xlsx')
+    first = sync(path, session_factory)
+    assert first['routes']['inserted'] == 2
+    assert db.scalars(select(Route.route_code).order_by(Route.route_code)).all() == ['101', '102']
+
+    second = sync(path, session_factory, retire_missing=True)
+    assert second == {
+        'routes': {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 2},
+        'route_costs': {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 2},
+        'employees': {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 2},
+    }
+
+
+def test_sync_without_retire_keeps_missing_rows(tmp_path, session_factory, db):
+    roster = small_roster()
+    sync(write_roster_workbook(roster, tmp_path / 'before.xlsx'), session_factory)
+    del roster['Sheet1'][3]
+    summary = sync(write_roster_workbook(roster, tmp_path / 'after.xlsx'), session_factory)
+    assert summary['employees'] == {'inserted': 0, 'updated': 0, 'retired': 0, 'unchanged': 3}
+    assert db.query(Employee).count() == 4
+
+
+def test_stream_import_rejects_duplicates_across_chunks(tmp_path, session_factory, db):
+    roster = small_roster()
+    roster['Sheet1'] += [
+        ('محمد حسن', 'الجودة', 'المعادي', None, 'R2', 'مكرر'),   # تكرار الصف الثاني في دفعة لاحقة
+        ('أحمد علي', 'الحسابات', 'المطرية', None, 'R1', None),   # نفس الاسم بمحطة أخرى: ليس تكراراً
+        ('سعد منصور', 'الصيانة', None, None, 'لايوجد', None),
+        ('سعد منصور', 'الصيانة', None, None, None, None),         # قيم فارغة متساوية
+    ]
+    roster['Sheet2'].append(('R1', 'خط مكرر', 'أتوبيس', 'سعد', 'عمر', 'الهرم'))
+    path = write_roster_workbook(roster, tmp_path / 'roster.xlsx')
+    reject_path = tmp_path / 'rejects.xlsx'
+
+    summary = stream_import_from_excel(str(path), chunk_size=2, session_factory=session_factory,
+                                       reject_file_path=str(reject_path))
+
+    assert summary['employees'] == {'imported': 6, 'rejected': 2}
+    assert summary['routes'] == {'imported': 3, 'rejected': 1}
+    names = db.scalars(select(Employee.employee_name).order_by(Employee.employee_id)).all()
+    assert names == ['أحمد علي', 'محمد حسن', 'علي عمر', 'يوسف خالد', 'أحمد علي', 'سعد منصور']
+    assert db.get(Route, 'R1').route_name == 'خط شبرا'
+    assert reject_path.exists()
@@ -0,0 +1,141 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from attendance_store import save_daily_attendance
+from bulk_operations import BulkValidationError
+from database_setup import DailyReport, Employee, Route, RouteCost
+from effective_history import (apply_due_changes, employee_route_as_of, recalculate_saved_days,
+                               route_cost_index, set_employee_route, set_route_cost)
+from report_engine import build_transport_report
+
+TODAY = date.today()
+
+
+def riders(db, route_code):
+    """أسماء موظفي الخط التي لا تتكرر في الجدول (حتى يطابق التقرير بالاسم الموظف نفسه)."""
+    unique = select(Employee.employee_name).group_by(Employee.employee_name).having(func.count() == 1)
+    return db.scalars(select(Employee.employee_name)
+                      .where(Employee.route_code == route_code, Employee.employee_name.in_(unique))).all()
+
+
+@pytest.fixture
+def route(roster_db):
+    code = roster_db.scalars(select(Route.route_code).order_by(Route.route_code)).first()
+    assert riders(roster_db, code)
+    return code
+
+
+def rate_on(db, day, route_code):
+    report = build_transport_report(db, day.isoformat(), riders(db, route_code))
+    return report.routes[route_code].cost_5_days
+
+
+def current_cost(db, route_code):
+    db.expire_all()
+    return db.get(RouteCost, route_code)
+
+
+def test_past_cost_change_applies_from_its_date(roster_db, route):
+    old = current_cost(roster_db, route).cost_5_days
+    since = TODAY - timedelta(days=30)
+    set_route_cost(roster_db, route, since, cost_5_days=old + 100)
+
+    assert current_cost(roster_db, route).cost_5_days == old + 100
+    assert rate_on(roster_db, since - timedelta(days=1), route) == old
+    assert rate_on(roster_db, since, route) == old + 100
+    assert rate_on(roster_db, TODAY, route) == old + 100
+
+
+def test_future_cost_change_waits_until_due(roster_db, route):
+    old = current_cost(roster_db, route)
+    old_rates = (old.vehicle_capacity, old.cost_5_days, old.cost_4_days)
+    due = TODAY + timedelta(days=30)
+    set_route_cost(roster_db, route, due, cost_5_days=old_rates[1] + 250)
+
+    assert current_cost(roster_db, route).cost_5_days == old_rates[1]
+    assert rate_on(roster_db, TODAY, route) == old_rates[1]
+    assert rate_on(roster_db, due - timedelta(days=1), route) == old_rates[1]
+    assert rate_on(roster_db, due, route) == old_rates[1] + 250
+
+    assert apply_due_changes(roster_db, today=due - timedelta(days=1)) == (0, 0)
+    assert apply_due_changes(roster_db, today=due) == (1, 0)
+    roster_db.commit()
+    cost = current_cost(roster_db, route)
+    # الأعمدة غير المذكورة في التغيير تبقى كما كانت
+    assert (cost.vehicle_capacity, cost.cost_5_days, cost.cost_4_days) == (
+        old_rates[0], old_rates[1] + 250, old_rates[2])
+
+
+def test_cost_change_dated_today_applies_immediately(roster_db, route):
+    old = current_cost(roster_db, route).cost_5_days
+    set_route_cost(roster_db, route, TODAY, vehicle_capacity=1)
+    cost = current_cost(roster_db, route)
+    assert (cost.vehicle_capacity, cost.cost_5_days) == (1, old)
+
+    report = build_transport_report(roster_db, TODAY.isoformat(), riders(roster_db, route))
+    assert report.routes[route].vehicles == len(riders(roster_db, route))
+    history = route_cost_index(roster_db).changes(route)
+    assert history[-1][0] == TODAY
+
+
+def test_set_route_cost_rejects_unknown_columns_and_routes(roster_db, route):
+    with pytest.raises(ValueError, match='unknown cost columns: cost_6_days'):
+        set_route_cost(roster_db, route, TODAY, cost_6_days=1)
+    with pytest.raises(ValueError, match='has no row in route_costs'):
+        set_route_cost(roster_db, 'غير موجود', TODAY, cost_5_days=1)
+
+
+def test_route_move_applies_when_due(roster_db, route):
+    name = riders(roster_db, route)[0]
+    employee = roster_db.scalars(select(Employee).where(Employee.employee_name == name)).one()
+    target = roster_db.scalars(select(Route.route_code).where(Route.route_code != route)
+                               .order_by(Route.route_code)).first()
+    due = TODAY + timedelta(days=7)
+
+    assert set_employee_route(roster_db, [employee.employee_id, 999999], target, due) == 1
+    roster_db.expire_all()
+    assert employee.route_code == route
+
+    def route_on(day):
+        return roster_db.scalar(select(employee_route_as_of(day))
+                                .where(Employee.employee_id == employee.employee_id))
+    assert route_on(due - timedelta(days=1)) == route
+    assert route_on(due) == target
+    assert list(build_transport_report(roster_db, TODAY.isoformat(), [name]).routes) == [route]
+    assert list(build_transport_report(roster_db, due.isoformat(), [name]).routes) == [target]
+
+    assert apply_due_changes(roster_db, today=due) == (0, 1)
+    roster_db.commit()
+    roster_db.expire_all()
+    assert employee.route_code == target
+
+
+def test_route_move_to_unknown_route_is_rejected(roster_db, route):
+    employee_id = roster_db.scalars(select(Employee.employee_id)).first()
+    with pytest.raises(BulkValidationError, match='not found in routes'):
+        set_employee_route(roster_db, [employee_id], 'غير موجود', TODAY)
+
+
+def test_recalculate_saved_days_uses_prices_of_each_day(roster_db, route):
+    names = riders(roster_db, route)
+    before, after = TODAY - timedelta(days=20), TODAY - timedelta(days=5)
+    for day in (before, after):
+        save_daily_attendance(roster_db, build_transport_report(roster_db, day.isoformat(), names))
+
+    def saved_totals():
+        roster_db.expire_all()
+        return {day: roster_db.get(DailyReport, day).total_cost for day in (before, after)}
+    saved = saved_totals()
+
+    old = current_cost(roster_db, route).cost_5_days
+    set_route_cost(roster_db, route, TODAY - timedelta(days=10), cost_5_days=old * 2)
+    # التقارير المحفوظة لا تتغير حتى تُعاد حسابها
+    assert saved_totals() == saved
+
+    summary = recalculate_saved_days(roster_db, before, TODAY)
+    assert len(summary.days) == 2
+    totals = saved_totals()
+    assert totals[before] == pytest.approx(saved[before])
+    assert totals[after] == pytest.approx(saved[after] * 2)
@@ -0,0 +1,64 @@
+import pytest
+
+from arabic_search import EmployeeSearchIndex
+from benchmark import REPORT_QUERY_BUDGET
+from database_setup import Employee
+from instrumentation import assert_query_budget
+from report_engine import build_transport_report
+
+
+def roster_names(roster):
+    return [row[0] for row in roster['Sheet1']]
+
+
+def test_transport_report_within_budget(roster_db, roster):
+    names = roster_names(roster)
+    with assert_query_budget(REPORT_QUERY_BUDGET, 'build_transport_report') as stats:
+        report = build_transport_report(roster_db, '2025-04-01', names + ['غير موجود'])
+    assert report.missing_names == ['غير موجود']
+    assert report.routes
+    assert stats.statements <= REPORT_QUERY_BUDGET
+
+
+def test_transport_report_budget_does_not_grow_with_names(roster_db, roster):
+    names = roster_names(roster)
+    build_transport_report(roster_db, '2025-04-01', names[:1])
+    with assert_query_budget(REPORT_QUERY_BUDGET) as few:
+        build_transport_report(roster_db, '2025-04-02', names[:5])
+    with assert_query_budget(REPORT_QUERY_BUDGET) as many:
+        build_transport_report(roster_db, '2025-04-02', names)
+    assert many.statements == few.statements
+
+
+def test_assert_query_budget_fails_when_exceeded(roster_db, roster):
+    with pytest.raises(AssertionError, match='budget is 0'):
+        with assert_query_budget(0, 'report'):
+            build_transport_report(roster_db, '2025-04-01', roster_names(roster))
+
+
+def test_table_load_reads_one_page_per_query(roster_db):
+    pytest.importorskip('PyQt5')
+    from table_model import LazyTableModel
+
+    with assert_query_budget(1, 'table load'):
+        model = LazyTableModel(roster_db, Employee, page_size=10)
+    assert model.rowCount() == 10
+    with assert_query_budget(3, 'table scroll'):
+        for _ in range(3):
+            model.fetchMore()
+    assert model.rowCount() == 40
+    with assert_query_budget(1, 'table sort'):
+        model.sort(model.columns.index('department'))
+    with assert_query_budget(1, 'table filter'):
+        model.set_filter('department', 'ال')
+
+
+def test_search_runs_no_queries(roster_db, roster):
+    names = roster_names(roster)
+    index = EmployeeSearchIndex(names)
+    query = names[0]
+    with assert_query_budget(0, 'search'):
+        index.search('')
+        for length in range(1, len(query) + 1):
+            rows = index.search(query[:length])
+    assert 0 in rows
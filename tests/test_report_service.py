@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from report_service import ReportService, ServiceError, make_handler
+
+
+@pytest.fixture
+def service(engine, roster_db):
+    service = ReportService(str(engine.url))
+    yield service
+    service.close()
+
+
+def exchange(service, raw):
+    """إرسال طلب HTTP خام إلى معالج الخدمة وإرجاع (الحالة، محتوى JSON)."""
+    async def send():
+        server = await asyncio.start_server(make_handler(service), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(raw)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+    head, _, body = asyncio.run(send()).partition(b'\r\n\r\n')
+    return int(head.split(b' ')[1]), json.loads(body)
+
+
+def post_report(payload):
+    body = json.dumps(payload).encode('utf-8')
+    return (b"POST /report HTTP/1.1\r\nConnection: close\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+
+@pytest.mark.parametrize('length', [b'abc', b'12x', b'-5'])
+def test_bad_content_length_is_a_bad_request(service, length):
+    status, payload = exchange(service, b"POST /report HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+    assert status == 400
+    assert payload == {'error': 'Invalid Content-Length header.'}
+
+
+@pytest.mark.parametrize('payload', [
+    {'date': '2025-04-01', 'names': [['أحمد']]},
+    {'date': '2025-04-01', 'names': [{'name': 'أحمد'}]},
+    {'date': '2025-04-01', 'names': ['أحمد', 5]},
+    {'date': '2025-04-01', 'names': 'أحمد'},
+    {'date': ['2025-04-01'], 'names': ['أحمد']},
+    {'names': ['أحمد']},
+])
+def test_report_names_must_be_a_list_of_strings(service, payload):
+    status, body = exchange(service, post_report(payload))
+    assert status == 400
+    assert 'names' in body['error']
+    assert service.computed == 0
+
+
+def test_valid_report_request(service, roster):
+    names = [row[0] for row in roster['Sheet1'][:5]]
+    status, body = exchange(service, post_report({'date': '2025-04-01', 'names': names}))
+    assert status == 200
+    assert body['date'] == '2025-04-01'
+
+
+def test_handle_rejects_unhashable_names_before_running(service):
+    async def handle():
+        return await service.handle('POST', '/report', {}, json.dumps({'date': '2025-04-01', 'names': [[1]]}))
+    with pytest.raises(ServiceError) as error:
+        asyncio.run(handle())
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize('text', ['%', '_'])
+def test_employee_search_matches_like_wildcards_literally(service, text):
+    async def search():
+        return await service.handle('GET', '/employees', {'q': text}, None)
+    assert asyncio.run(search()) == []
@@ -0,0 +1,201 @@
+import os
+
+import pytest
+from sqlalchemy import insert, update
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtCore = pytest.importorskip('PyQt5.QtCore')
+
+from database_setup import Employee
+from table_model import LazyTableModel
+
+Qt = QtCore.Qt
+PAGE_SIZE = 5
+
+
+@pytest.fixture(scope='module')
+def application():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def qt_warnings(application):
+    """رسائل qWarning أثناء الاختبار (مثل تحذيرات Qt من إشارات نقل أو حذف غير صحيحة)."""
+    messages = []
+    previous = QtCore.qInstallMessageHandler(lambda mode, context, message: messages.append(message))
+    yield messages
+    QtCore.qInstallMessageHandler(previous)
+
+
+@pytest.fixture
+def employees_db(db):
+    # 30 موظفاً نصفهم في قسم الجودة، والمحطة s00..s29 هي عمود الترتيب
+    db.execute(insert(Employee), [
+        {'employee_name': f"موظف {n:02d}", 'department': 'الجودة' if n % 2 == 0 else 'الحسابات',
+         'station': f"s{n:02d}"}
+        for n in range(30)])
+    db.commit()
+    return db
+
+
+class ViewMirror:
+    """نسخة من الصفوف كما تراها الواجهة: تتغير فقط بإشارات Qt الصادرة من النموذج."""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows = list(model.rows)
+        model.rowsInserted.connect(self.inserted)
+        model.rowsRemoved.connect(self.removed)
+        model.rowsMoved.connect(self.moved)
+        model.dataChanged.connect(self.changed)
+        model.modelReset.connect(lambda: setattr(self, 'rows', list(model.rows)))
+
+    def inserted(self, parent, first, last):
+        self.rows[first:first] = self.model.rows[first:last + 1]
+
+    def removed(self, parent, first, last):
+        del self.rows[first:last + 1]
+
+    def moved(self, parent, first, last, destination_parent, destination):
+        block = self.rows[first:last + 1]
+        del self.rows[first:last + 1]
+        if destination > last:
+            destination -= len(block)
+        self.rows[destination:destination] = block
+
+    def changed(self, top_left, bottom_right):
+        self.rows[top_left.row():bottom_right.row() + 1] = self.model.rows[top_left.row():bottom_right.row() + 1]
+
+
+def stations(rows, model):
+    column = model.columns.index('station')
+    return [row[column] for row in rows]
+
+
+def expected_stations(db, model):
+    """ترتيب الصفوف كما لو أُعيد تحميل الجدول بالكامل بنفس الترتيب والتصفية."""
+    fresh = LazyTableModel(db, Employee, page_size=1000)
+    fresh.filters = dict(model.filters)
+    fresh.sort(fresh.columns.index(model.sort_column), model.sort_order)
+    return stations(fresh.rows, fresh)
+
+
+def set_station(db, employee_name, station, department=None):
+    values = {'station': station}
+    if department:
+        values['department'] = department
+    db.execute(update(Employee).where(Employee.employee_name == employee_name).values(**values))
+    db.commit()
+    return db.query(Employee.employee_id).filter_by(employee_name=employee_name).scalar()
+
+
+@pytest.fixture
+def sorted_model(employees_db, qt_warnings):
+    model = LazyTableModel(employees_db, Employee, page_size=PAGE_SIZE)
+    model.set_filter('department', 'الجودة')
+    model.sort(model.columns.index('station'), Qt.AscendingOrder)
+    model.fetchMore()
+    model.mirror = ViewMirror(model)
+    # صفحتان محمّلتان من 15 صفاً مطابقاً للتصفية
+    assert stations(model.rows, model) == [f"s{n:02d}" for n in range(0, 20, 2)]
+    assert model.canFetchMore()
+    return model
+
+
+def check_model(db, model, qt_warnings, loaded):
+    assert model.rowCount() == loaded
+    assert model.mirror.rows == model.rows
+    assert stations(model.rows, model) == expected_stations(db, model)[:loaded]
+    assert qt_warnings == []
+
+
+def fetch_all(model):
+    while model.canFetchMore():
+        model.fetchMore()
+
+
+def test_edit_moves_row_within_loaded_page(employees_db, sorted_model, qt_warnings):
+    # من الصفحة الأولى إلى الثانية
+    key = set_station(employees_db, 'موظف 02', 's13')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 10)
+    assert stations(sorted_model.rows, sorted_model) == [
+        's00', 's04', 's06', 's08', 's10', 's12', 's13', 's14', 's16', 's18']
+
+
+def test_edit_moves_rows_across_page_boundary(employees_db, sorted_model, qt_warnings):
+    # الصف ينتقل بعد آخر صفحة محمّلة: يُحذف الآن ويأتي مع الصفحات التالية
+    key = set_station(employees_db, 'موظف 04', 's25')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 9)
+
+    # صف لم يُحمّل بعد ينتقل إلى داخل الصفحات المحمّلة: يُضاف في موضعه
+    key = set_station(employees_db, 'موظف 24', 's01')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 10)
+    assert stations(sorted_model.rows, sorted_model)[:4] == ['s00', 's01', 's02', 's06']
+
+    # الصفحات التالية تكمل الترتيب بدون تكرار أو نقص
+    fetch_all(sorted_model)
+    check_model(employees_db, sorted_model, qt_warnings, 15)
+    key = set_station(employees_db, 'موظف 00', 's99')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 15)
+    assert stations(sorted_model.rows, sorted_model)[-1] == 's99'
+
+
+def test_edit_that_leaves_the_filter_removes_row(employees_db, sorted_model, qt_warnings):
+    key = set_station(employees_db, 'موظف 06', 's06', department='الحسابات')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 9)
+
+    # صف من قسم آخر يدخل التصفية بتعديل القسم
+    key = set_station(employees_db, 'موظف 07', 's07', department='الجودة')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 10)
+    assert stations(sorted_model.rows, sorted_model)[:5] == ['s00', 's02', 's04', 's07', 's08']
+
+    fetch_all(sorted_model)
+    check_model(employees_db, sorted_model, qt_warnings, 15)
+
+
+def test_descending_sort_move_and_delete(employees_db, sorted_model, qt_warnings):
+    sorted_model.sort(sorted_model.columns.index('station'), Qt.DescendingOrder)
+    sorted_model.fetchMore()
+    assert stations(sorted_model.rows, sorted_model) == [f"s{n:02d}" for n in range(28, 8, -2)]
+    key = set_station(employees_db, 'موظف 28', 's03')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 9)
+    key = set_station(employees_db, 'موظف 02', 's27')
+    sorted_model.refresh_rows([key])
+    check_model(employees_db, sorted_model, qt_warnings, 10)
+    assert stations(sorted_model.rows, sorted_model)[:3] == ['s27', 's26', 's24']
+
+    deleted = sorted_model.primary_key_at(1)
+    employees_db.query(Employee).filter_by(employee_id=deleted).delete()
+    employees_db.commit()
+    sorted_model.refresh_rows([deleted])
+    check_model(employees_db, sorted_model, qt_warnings, 9)
+    fetch_all(sorted_model)
+    check_model(employees_db, sorted_model, qt_warnings, 14)
+
+
+def test_fetch_more_requested_while_inserting_rows_is_ignored(employees_db, application):
+    model = LazyTableModel(employees_db, Employee, page_size=PAGE_SIZE)
+    # عرض يطلب الصفحة التالية من داخل إشارة الإضافة، قبل أن يتغير آخر مفتاح محمّل
+    model.rowsAboutToBeInserted.connect(lambda parent, first, last: model.fetchMore())
+    model.fetchMore()
+    model.fetchMore()
+    keys = [model.primary_key_at(row) for row in range(model.rowCount())]
+    assert keys == sorted(set(keys))
+    assert model.rowCount() == 3 * PAGE_SIZE
+
+
+@pytest.mark.parametrize('text, expected', [('_', ['s_1']), ('%', ['s%2'])])
+def test_filter_matches_like_wildcards_literally(employees_db, application, text, expected):
+    set_station(employees_db, "موظف 01", 's_1')
+    set_station(employees_db, "موظف 02", 's%2')
+    model = LazyTableModel(employees_db, Employee, page_size=PAGE_SIZE)
+    model.set_filter('station', text)
+    fetch_all(model)
+    assert stations(model.rows, model) == expected
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+from report_engine import RouteReport, TransportReport
+from vehicle_allocation import allocate, assign_vehicles, suggest_merges, vehicles_needed
+
+
+def route(route_code, stations, capacity, passengers, cost=1000.0):
+    """خط بعدد ركاب من كل محطة {المحطة: العدد} بعد تحديد سياراته."""
+    report = RouteReport(route_code=route_code, stations=list(stations), vehicle_capacity=capacity,
+                         cost_5_days=cost)
+    for station, count in passengers.items():
+        report.passengers += [f"{route_code}-{station}-{n}" for n in range(count)]
+        report.station_counts[station] = count
+    assign_vehicles([report])
+    return report
+
+
+@pytest.mark.parametrize('passengers, capacity, expected', [
+    (0, 14, 0), (1, 14, 1), (14, 14, 1), (15, 14, 2), (28, 14, 2), (29, 14, 3), (50, 50, 1), (51, 50, 2),
+])
+def test_vehicles_needed_rounds_up(passengers, capacity, expected):
+    assert vehicles_needed(passengers, capacity) == expected
+
+
+@pytest.mark.parametrize('capacity', [None, 0, -5])
+def test_vehicles_needed_without_capacity_uses_one_vehicle(capacity):
+    assert vehicles_needed(40, capacity) == 1
+    assert vehicles_needed(0, capacity) == 0
+
+
+def test_small_route_merges_into_route_with_free_seats():
+    small = route('R1', ['شبرا'], 14, {'شبرا': 3}, cost=900)
+    large = route('R2', ['شبرا', 'المطرية'], 28, {'المطرية': 20})
+    suggestions = suggest_merges([small, large])
+    assert [(s.route_code, s.into_route_code, s.passengers, s.saving) for s in suggestions] == [
+        ('R1', 'R2', 3, 900)]
+
+
+def test_merge_requires_same_station_order():
+    small = route('R1', ['شبرا', 'المطرية', 'العباسية'], 14, {'شبرا': 2, 'العباسية': 1})
+    same_way = route('R2', ['شبرا', 'روض الفرج', 'العباسية', 'رمسيس'], 28, {'رمسيس': 5})
+    opposite = route('R3', ['رمسيس', 'العباسية', 'روض الفرج', 'شبرا'], 28, {'رمسيس': 5})
+    assert [(s.route_code, s.into_route_code) for s in suggest_merges([small, opposite])] == []
+    assert [(s.route_code, s.into_route_code) for s in suggest_merges([small, same_way])] == [('R1', 'R2')]
+
+
+@pytest.mark.parametrize('days, saving', [(5, 1000), (4, 1150), (3, 1250), (1, 1250)])
+def test_merge_saving_uses_tier_rate(days, saving):
+    small = route('R1', ['شبرا'], 14, {'شبرا': 3})
+    small.cost_4_days, small.cost_3_days = 1150, 1250
+    large = route('R2', ['شبرا'], 28, {'شبرا': 5})
+    suggestions = suggest_merges([small, large], days_per_week=days)
+    assert [(s.route_code, s.saving) for s in suggestions] == [('R1', saving)]
+
+
+def test_merge_saving_without_lower_tiers_uses_five_day_rate():
+    small = route('R1', ['شبرا'], 14, {'شبرا': 3}, cost=900)
+    large = route('R2', ['شبرا'], 28, {'شبرا': 20})
+    assert [(s.route_code, s.saving) for s in suggest_merges([small, large], days_per_week=3)] == [('R1', 900)]
+
+
+def test_no_merge_when_target_misses_a_boarding_station():
+    small = route('R1', ['شبرا', 'المعادي'], 14, {'شبرا': 2, 'المعادي': 1})
+    large = route('R2', ['شبرا', 'المطرية'], 28, {'المطرية': 5})
+    assert suggest_merges([small, large]) == []
+
+
+def test_route_without_capacity_never_receives_passengers():
+    small = route('R1', ['شبرا'], 14, {'شبرا': 2})
+    unknown = route('R2', ['شبرا'], None, {'شبرا': 1})
+    assert unknown.vehicles == 1
+    suggestions = suggest_merges([small, unknown])
+    # الخط بدون سعة لا يستقبل، لكن ركابه يمكن نقلهم إلى خط فيه مقاعد
+    assert [(s.route_code, s.into_route_code) for s in suggestions] == [('R2', 'R1')]
+
+
+def test_merges_never_exceed_target_free_seats():
+    # الخطان الصغيران لا يمر أحدهما بمحطة الآخر، فالخط R0 هو الهدف الوحيد لكليهما
+    target = route('R0', ['شبرا', 'المطرية'], 14, {'شبرا': 6})   # 8 مقاعد فارغة
+    first = route('R1', ['شبرا'], 14, {'شبرا': 5}, cost=1200)
+    second = route('R2', ['المطرية'], 14, {'المطرية': 5}, cost=1100)
+    suggestions = suggest_merges([target, first, second])
+    into_target = [s for s in suggestions if s.into_route_code == 'R0']
+    assert sum(s.passengers for s in into_target) <= 8
+    assert [(s.route_code, s.into_route_code) for s in suggestions] == [('R1', 'R0')]
+
+
+def test_random_reports_respect_capacity():
+    rng = random.Random(3)
+    stations = [f"محطة {n}" for n in range(12)]
+    for _ in range(50):
+        report = TransportReport(date='test')
+        for n in range(15):
+            counts = {}
+            for _ in range(rng.randint(1, 30)):
+                station = rng.choice(stations[:6] if n % 2 else stations)
+                counts[station] = counts.get(station, 0) + 1
+            report.routes[f"R{n}"] = route(f"R{n}", stations[n % 3::2] + list(counts),
+                                            rng.choice((None, 14, 28, 50)), counts)
+        allocate(report)
+
+        moved = {}
+        merged = set()
+        for suggestion in report.merge_suggestions:
+            assert suggestion.route_code not in merged
+            merged.add(suggestion.route_code)
+            moved[suggestion.into_route_code] = moved.get(suggestion.into_route_code, 0) + suggestion.passengers
+        assert not merged & set(moved)
+        for code, extra in moved.items():
+            target = report.routes[code]
+            assert target.vehicle_capacity
+            assert len(target.passengers) + extra <= target.vehicles * target.vehicle_capacity
@@ -0,0 +1,155 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from cost_engine import TIER_COLUMNS, tier_rates
+
+
+@dataclass
+class MergeSuggestion:
+    """اقتراح نقل ركاب خط سير قليل الركاب إلى خط آخر يمر بنفس محطاتهم."""
+    route_code: str
+    into_route_code: str
+    passengers: int
+    saving: float
+
+
+def vehicles_needed(passengers, capacity):
+    """عدد السيارات اللازمة لعدد الركاب؛ سيارة واحدة إذا كانت السعة غير معروفة."""
+    if passengers <= 0:
+        return 0
+    if not capacity or capacity <= 0:
+        return 1
+    return math.ceil(passengers / capacity)
+
+
+def assign_vehicles(routes):
+    """تحديد عدد السيارات لكل خط في التقرير حسب عدد ركابه وسعة السيارة."""
+    for route in routes:
+        route.vehicles = vehicles_needed(len(route.passengers), route.vehicle_capacity)
+
+
+def daily_rates(routes, days_per_week=5):
+    """
+    سعر يوم السيارة لكل خط بنفس شريحة cost_engine.tier_rates لعدد أيام التشغيل في الأسبوع
+    (الشريحة غير المسجلة للخط تأخذ سعر 5 أيام).
+    """
+    costs = {column: [getattr(route, column) if getattr(route, column) is not None else route.cost_5_days or 0
+                      for route in routes]
+             for column in TIER_COLUMNS}
+    return tier_rates(np.full(len(routes), days_per_week), costs)
+
+
+def _in_route_order(ordered_stations, positions):
+    """هل تمر محطات الركوب (مرتبة حسب خطهم الحالي) على الخط الآخر بنفس الترتيب؟"""
+    previous = -1
+    for station in ordered_stations:
+        position = positions[station]
+        if position <= previous:
+            return False
+        previous = position
+    return True
+
+
+def suggest_merges(routes, days_per_week=5):
+    """
+    اقتراح دمج الخطوط قليلة الاستخدام في خطوط أخرى لتقليل إجمالي التكلفة.
+
+    يمكن نقل ركاب خط إلى خط آخر إذا كان الخط الآخر يمر بكل محطات ركوبهم وبنفس ترتيبها
+    في خطهم (فلا يُنقلون إلى خط يسير في الاتجاه المعاكس) وكان في سياراته مقاعد فارغة
+    تكفيهم، فيُستغنى عن سيارات الخط الأول. التوفير هو سيارات الخط بسعر شريحة
+    days_per_week كما في cost_engine.tier_rates. تُختار الاقتراحات بطريقة جشعة من الأكبر
+    توفيراً، ولا يُدمج خط في خط سبق دمجه، ولا يُدمج في خط استقبل ركاباً أكثر من مقاعده
+    الفارغة. المرشحون لكل خط هم فقط الخطوط المشتركة معه في كل محطاته (تقاطع قوائم
+    المحطات)، فلا تُقارن كل الخطوط ببعضها.
+
+    Args:
+        routes: خطوط التقرير بعد assign_vehicles (RouteReport).
+        days_per_week: عدد أيام تشغيل السيارة في الأسبوع لاختيار شريحة السعر.
+
+    Returns:
+        list: MergeSuggestion مرتبة من الأكبر توفيراً.
+    """
+    routes = [route for route in routes if route.passengers]
+    routes_by_station = {}
+    positions = {}
+    for route in routes:
+        route_positions = positions[route.route_code] = {}
+        for position, station in enumerate(route.stations):
+            route_positions.setdefault(station, position)
+            routes_by_station.setdefault(station, set()).add(route.route_code)
+
+    by_code = {route.route_code: route for route in routes}
+    free_seats = {route.route_code: route.vehicles * route.vehicle_capacity - len(route.passengers)
+                  for route in routes if route.vehicle_capacity}
+    rates = daily_rates(routes, days_per_week)
+    candidates = []
+    for route, rate in zip(routes, rates):
+        boarding = [station for station, count in route.station_counts.items() if count]
+        targets = None
+        for station in boarding:
+            serving = routes_by_station.get(station, set())
+            targets = set(serving) if targets is None else targets & serving
+            if not targets:
+                break
+        # ترتيب الركوب على الخط الحالي (المحطات غير المسجلة في الخط لا ترتيب لها)
+        own = positions[route.route_code]
+        ordered = sorted((station for station in boarding if station in own), key=own.get)
+        saving = route.vehicles * float(rate)
+        for target in targets or ():
+            if (target != route.route_code and free_seats.get(target, 0) >= len(route.passengers)
+                    and _in_route_order(ordered, positions[target])):
+                candidates.append((saving, route.route_code, target))
+
+    suggestions = []
+    merged, receiving = set(), set()
+    for saving, route_code, target in sorted(candidates, key=lambda item: -item[0]):
+        passengers = len(by_code[route_code].passengers)
+        if (route_code in merged or route_code in receiving or target in merged
+                or free_seats[target] < passengers):
+            continue
+        free_seats[target] -= passengers
+        merged.add(route_code)
+        receiving.add(target)
+        suggestions.append(MergeSuggestion(route_code, target, passengers, saving))
+    return suggestions
+
+
+def allocate(report, days_per_week=5):
+    """تحديد سيارات كل خط في التقرير واقتراحات الدمج (تُحفظ في report.merge_suggestions)."""
+    assign_vehicles(report.routes.values())
+    report.merge_suggestions = suggest_merges(report.routes.values(), days_per_week)
+    return report
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from report_engine import RouteReport, TransportReport
+
+    # قياس زمن التخصيص على قوائم حضور عشوائية بأحجام مختلفة
+    for route_count, attendee_count in ((100, 1000), (300, 5000), (800, 20000)):
+        rng = random.Random(route_count)
+        stations = [f"محطة {i}" for i in range(route_count * 3)]
+        report = TransportReport(date="benchmark")
+        for i in range(route_count):
+            route_stations = rng.sample(stations, 8)
+            report.routes[f"R{i}"] = RouteReport(route_code=f"R{i}", stations=route_stations,
+                                                 vehicle_capacity=rng.choice((14, 28, 50)),
+                                                 cost_5_days=rng.uniform(900, 2000))
+        routes = list(report.routes.values())
+        # توزيع غير متساوٍ: بعض الخطوط مزدحمة وبعضها شبه فارغ
+        weights = [rng.paretovariate(1.2) for _ in routes]
+        for n, route in enumerate(rng.choices(routes, weights, k=attendee_count)):
+            station = rng.choice(route.stations)
+            route.passengers.append(f"موظف {n}")
+            route.station_counts[station] = route.station_counts.get(station, 0) + 1
+
+        started = time.perf_counter()
+        allocate(report)
+        elapsed = time.perf_counter() - started
+        saving = sum(suggestion.saving for suggestion in report.merge_suggestions)
+        print(f"{route_count} routes, {attendee_count} attendees: {elapsed * 1000:.1f} ms, "
+              f"{report.vehicle_count} vehicles, {len(report.merge_suggestions)} merges, "
+              f"saving {saving:,.2f} of {report.total_cost:,.2f}")